@@ -0,0 +1,52 @@
+"""Throughput of the batch grader against the local mock Gemini server.
+
+    python benchmarks/bench_batch_grading.py --images 200 --latency 0.25
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embryograding import BatchGrader, GeminiClient, MockGeminiServer, iter_jobs  # noqa: E402
+
+
+def make_images(directory: Path, count: int, size: int) -> None:
+    for i in range(count):
+        (directory / f"D5_{i:04d}.jpg").write_bytes(os.urandom(size))
+
+
+async def run(directory: Path, latency: float, concurrency: int) -> tuple[float, int]:
+    async with MockGeminiServer(latency=latency) as server:
+        async with GeminiClient("mock-key", api_root=server.api_root) as client:
+            rows = []
+            stats = await BatchGrader(client, concurrency=concurrency).run(iter_jobs(directory), rows.append)
+        return stats.images_per_second, server.stats.max_in_flight
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--image-kb", type=int, default=64)
+    parser.add_argument("--latency", type=float, default=0.25)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 64])
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        make_images(directory, args.images, args.image_kb * 1024)
+        print(f"{args.images} images x {args.image_kb} KB, mock latency {args.latency * 1000:.0f} ms")
+        print(f"{'concurrency':>12} {'images/s':>10} {'max in flight':>14}")
+        for concurrency in args.concurrency:
+            rate, in_flight = asyncio.run(run(directory, args.latency, concurrency))
+            print(f"{concurrency:>12} {rate:>10.1f} {in_flight:>14}")
+
+
+if __name__ == "__main__":
+    main()
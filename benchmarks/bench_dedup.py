@@ -0,0 +1,102 @@
+"""Near-duplicate detection: hashing speed, clustering speed and accuracy.
+
+Writes synthetic embryo frames and, for a share of them, near-duplicates:
+re-saved at a lower JPEG quality, slightly rescaled, brightened, or copied
+byte for byte. Hashes every file (pHash and dHash) with
+:func:`find_duplicates`, then checks the clusters against the known
+originals: duplicates missed, distinct embryos wrongly merged, dedup ratio
+and calls saved. Finally times clustering alone on a million synthetic
+hashes with planted near-duplicates.
+
+    python benchmarks/bench_dedup.py --originals 1000 --duplicate-share 0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import shutil
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_prefilter import make_images  # noqa: E402
+
+from embryograding import ImageJob, cluster, find_duplicates  # noqa: E402
+
+
+def make_duplicates(directory: Path, share: float, seed: int = 0) -> dict[str, str]:
+    """Add near-duplicates of ``share`` of the images; returns duplicate -> original name."""
+    rng = np.random.default_rng(seed)
+    originals = sorted(directory.iterdir())
+    truth = {}
+    for path in originals:
+        if rng.random() >= share:
+            continue
+        target = directory / f"{path.stem}_dup.jpg"
+        variant = int(rng.integers(4))
+        if variant == 3:
+            shutil.copyfile(path, target)
+        else:
+            with Image.open(path) as im:
+                if variant == 1:
+                    im = im.resize((int(im.width * 0.9), int(im.height * 0.9)), Image.LANCZOS)
+                elif variant == 2:
+                    im = ImageEnhance.Brightness(im).enhance(1.05)
+                im.save(target, quality=int(rng.integers(60, 80)))
+        truth[target.name] = path.name
+    return truth
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--originals", type=int, default=1000)
+    parser.add_argument("--duplicate-share", type=float, default=0.3)
+    parser.add_argument("--size", type=int, default=400)
+    parser.add_argument("--distance", type=int, default=4)
+    parser.add_argument("--hashes", type=int, default=1_000_000, help="synthetic hashes for the clustering timing")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        make_images(directory, args.originals, args.size, 0.1)
+        truth = make_duplicates(directory, args.duplicate_share)
+        paths = sorted(directory.iterdir())
+        jobs = [ImageJob(path, path.name) for path in paths]
+        for kind in ("phash", "dhash"):
+            result = find_duplicates(jobs, args.distance, kind, workers=1)
+            cluster_of = {job.image_name: job.image_name for job in result.representatives}
+            for representative, members in result.members.items():
+                for member, _ in members:
+                    cluster_of[member.image_name] = Path(representative).name
+            missed = sum(cluster_of[dup] != cluster_of[original] for dup, original in truth.items())
+            merged = len({cluster_of[p.name] for p in paths if p.name not in truth})
+            print(
+                f"{kind}: {len(jobs) / result.elapsed:7.0f} images/s hashed; {result.images} images -> "
+                f"{result.clusters} clusters, ratio {result.dedup_ratio:.3f}, {result.saved_calls:.1%} calls saved; "
+                f"{missed}/{len(truth)} duplicates missed, {args.originals - merged} originals wrongly merged"
+            )
+
+    rng = np.random.default_rng(1)
+    originals = rng.integers(0, 2**63, args.hashes // 2, dtype=np.uint64)
+    copies = originals[rng.integers(0, len(originals), args.hashes - len(originals))]
+    for _ in range(args.distance):
+        flip = rng.random(len(copies)) < 0.5
+        copies[flip] ^= np.uint64(1) << rng.integers(0, 64, int(flip.sum())).astype(np.uint64)
+    hashes = np.concatenate([originals, copies])
+    started = time.perf_counter()
+    labels = cluster(hashes, args.distance)
+    elapsed = time.perf_counter() - started
+    print(
+        f"clustering {len(hashes)} hashes at distance {args.distance}: {elapsed:.2f}s, "
+        f"{len(np.unique(labels))} clusters (at least {len(originals)} expected)"
+    )
+
+
+if __name__ == "__main__":
+    main()
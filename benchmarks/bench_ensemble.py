@@ -0,0 +1,89 @@
+"""Calls per image and wall time: single call vs fixed-K vs early-stopping ensembles.
+
+The mock server answers ``--noise`` of requests with a random grade, so
+repeated samples of an image disagree about as often as a sampling model
+on borderline embryos. Accuracy is agreement with the grade the mock gives
+each image without noise. Wall time is measured with requests unbounded
+and with at most ``--max-requests`` in flight, as under an API quota,
+where it follows the number of calls.
+
+    python benchmarks/bench_ensemble.py --images 300 --samples 5 --noise 0.3
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embryograding import BatchGrader, GeminiClient, MockGeminiServer, iter_jobs  # noqa: E402
+from embryograding.ensemble import EnsembleConfig  # noqa: E402
+from embryograding.scheduler import RequestScheduler  # noqa: E402
+
+
+async def run(
+    directory: Path, args: argparse.Namespace, ensemble: EnsembleConfig | None, max_requests: int | None = None
+) -> tuple[list, object]:
+    scheduler = None
+    if max_requests:
+        scheduler = RequestScheduler(initial_concurrency=max_requests, max_concurrency=max_requests)
+    async with MockGeminiServer(latency=args.latency, sample_noise=args.noise, seed=1) as server:
+        async with GeminiClient("mock-key", api_root=server.api_root) as client:
+            rows: list[dict] = []
+            grader = BatchGrader(client, concurrency=args.concurrency, scheduler=scheduler, ensemble=ensemble)
+            stats = await grader.run(iter_jobs(directory), rows.append)
+    return rows, stats
+
+
+async def reference(directory: Path) -> dict[str, str]:
+    async with MockGeminiServer() as server:
+        async with GeminiClient("mock-key", api_root=server.api_root) as client:
+            rows: list[dict] = []
+            await BatchGrader(client, concurrency=32).run(iter_jobs(directory), rows.append)
+    return {row["image_name"]: row["gardner_grade"] for row in rows}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--samples", type=int, default=5)
+    parser.add_argument("--first-wave", type=int, default=3)
+    parser.add_argument("--noise", type=float, default=0.3)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=32, help="images in flight")
+    parser.add_argument("--max-requests", type=int, default=16, help="requests in flight for the quota run")
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for i in range(args.images):
+            (directory / f"D5_{i:04d}.jpg").write_bytes(os.urandom(4096))
+        truth = asyncio.run(reference(directory))
+        print(f"{args.images} images, mock latency {args.latency * 1000:.0f} ms, {args.noise:.0%} noisy answers")
+        print(
+            f"{'mode':<30} {'calls/image':>11} {'wall s':>7} {'wall s (quota)':>15} {'correct':>8} "
+            f"{'expansion agreement':>20}"
+        )
+        modes = [
+            ("single call", None),
+            (f"fixed K={args.samples}", EnsembleConfig(args.samples, args.samples)),
+            (f"early stop K<={args.samples}, first {args.first_wave}", EnsembleConfig(args.samples, args.first_wave)),
+        ]
+        for label, ensemble in modes:
+            rows, stats = asyncio.run(run(directory, args, ensemble))
+            _, quota = asyncio.run(run(directory, args, ensemble, args.max_requests))
+            correct = sum(row["gardner_grade"] == truth[row["image_name"]] for row in rows) / len(rows)
+            agreement = sum(row.get("expansion_agreement", 1.0) for row in rows) / len(rows)
+            print(
+                f"{label:<30} {stats.samples_per_image:>11.2f} {stats.elapsed:>7.2f} {quota.elapsed:>15.2f} "
+                f"{correct:>8.1%} {agreement:>20.2f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
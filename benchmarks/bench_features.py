@@ -0,0 +1,85 @@
+"""Local feature extraction throughput, and resuming after an interruption.
+
+Writes a pool of synthetic embryo frames and a results store whose rows
+cycle through them, then measures descriptors alone (pre-decoded frames,
+one process) and the full store pass (decode + describe + write the
+memory-mapped matrix) with 1 and N worker processes. Finally interrupts a
+run halfway, resumes it, and checks the matrix matches an uninterrupted one.
+
+    python benchmarks/bench_features.py --rows 20000 --unique 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_prefilter import make_images  # noqa: E402
+
+from embryograding import FeatureConfig, FeatureMatrix, ResultStore, descriptors, extract_store_features  # noqa: E402
+from embryograding.features import load_batch  # noqa: E402
+
+
+class Interrupt(Exception):
+    pass
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=5000)
+    parser.add_argument("--unique", type=int, default=300, help="distinct images the rows cycle through")
+    parser.add_argument("--image-size", type=int, default=500)
+    parser.add_argument("--batch", type=int, default=64)
+    args = parser.parse_args()
+    config = FeatureConfig()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        images = Path(tmp) / "images"
+        images.mkdir()
+        make_images(images, args.unique, args.image_size, 0.1)
+        names = sorted(p.name for p in images.iterdir())
+        store_path = Path(tmp) / "store"
+        with ResultStore(store_path) as store:
+            for i in range(args.rows):
+                name = names[i % len(names)]
+                store.append({"image_name": name, "image_path": f"images/{name}", "gardner_grade": "4AA"})
+
+        frames, _ = load_batch([images / name for name in names], config.size)
+        started = time.perf_counter()
+        for i in range(0, len(frames), args.batch):
+            descriptors(frames[i:i + args.batch], config)
+        rate = len(frames) / (time.perf_counter() - started)
+        print(f"descriptors only, 1 core:       {rate:8.0f} images/s ({len(config.names())} features)")
+
+        for workers in sorted({1, os.cpu_count() or 1}):
+            stats = extract_store_features(store_path, tmp, config, workers, args.batch, rebuild=True)
+            print(f"decode + describe, {workers:2d} workers:  {stats.images_per_second:8.0f} images/s")
+        reference = np.array(FeatureMatrix(store_path, args.rows, config).matrix)
+
+        def stop_halfway(done: int, total: int) -> None:
+            if done >= total // 2:
+                raise Interrupt
+
+        try:
+            extract_store_features(store_path, tmp, config, batch_size=args.batch, rebuild=True, progress=stop_halfway)
+        except Interrupt:
+            pass
+        done = int((FeatureMatrix(store_path, args.rows, config).done != 0).sum())
+        stats = extract_store_features(store_path, tmp, config, batch_size=args.batch)
+        resumed = np.array(FeatureMatrix(store_path, args.rows, config).matrix)
+        print(
+            f"interrupted at {done}/{args.rows} rows; resume computed {stats.computed}, "
+            f"matrix identical: {np.array_equal(reference, resumed)}"
+        )
+
+
+if __name__ == "__main__":
+    main()
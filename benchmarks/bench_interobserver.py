@@ -0,0 +1,63 @@
+"""Inter-observer analysis at scale: many images, dozens of raters.
+
+Each of ``--raters`` raters grades a random ``--coverage`` share of
+``--images`` images, agreeing with a hidden true grade ``--agreement`` of
+the time. Times building the sparse rating matrix and the full analysis
+(kappa, alpha and both heatmaps for all three components).
+
+    python benchmarks/bench_interobserver.py --images 50000 --raters 40 --coverage 0.4
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import time
+from pathlib import Path
+
+import numpy as np
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embryograding.interobserver import RatingMatrix, analyse  # noqa: E402
+
+GRADES = ["N/A", "2", "3AA", "3AB", "3BB", "4AA", "4AB", "4BB", "4BC", "5AA", "5BB", "6AA", "3CC"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=50_000)
+    parser.add_argument("--raters", type=int, default=40)
+    parser.add_argument("--coverage", type=float, default=0.4)
+    parser.add_argument("--agreement", type=float, default=0.7)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    truth = rng.integers(0, len(GRADES), args.images)
+    rated = rng.random((args.raters, args.images)) < args.coverage
+    rater, item = np.nonzero(rated)
+    grade = np.where(rng.random(len(item)) < args.agreement, truth[item], rng.integers(0, len(GRADES), len(item)))
+    names = [f"rater {r}" for r in range(args.raters)]
+    ratings = [
+        (names[r], f"D5_{i:06d}.jpg", GRADES[g]) for r, i, g in zip(rater.tolist(), item.tolist(), grade.tolist())
+    ]
+
+    start = time.perf_counter()
+    matrix = RatingMatrix.from_ratings(ratings)
+    built = time.perf_counter() - start
+    start = time.perf_counter()
+    summary = analyse(matrix)
+    analysed = time.perf_counter() - start
+    print(f"{len(matrix)} ratings, {args.images} images, {args.raters} raters")
+    print(f"  sparse matrix {built:.2f}s, analysis {analysed:.2f}s")
+    for component in summary.components:
+        print(
+            f"  {component.component:<10} kappa {component.fleiss_kappa:.3f}  alpha {component.krippendorff_alpha:.3f}"
+        )
+    dense = args.images * args.raters
+    print(f"  a dense rater x image table would hold {dense:,} cells for {len(matrix):,} ratings")
+
+
+if __name__ == "__main__":
+    main()
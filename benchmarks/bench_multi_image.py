@@ -0,0 +1,94 @@
+"""Multi-image requests: input tokens and throughput against one image per request.
+
+Grades the same preprocessed-size frames with 1, 2, 4 and 8 images per
+``generateContent`` request at the same number of requests in flight.
+Against the mock server, input tokens count the request text plus a fixed
+cost per image, and ``--token-latency`` makes longer (multi-image) answers
+take longer. ``--drop-block-rate`` has the mock leave images out of its
+answers, to exercise the single-image fallback. With ``--api-key`` the
+real API is used.
+
+    python benchmarks/bench_multi_image.py --images 200 --latency 0.5 --token-latency 0.004
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_prefilter import make_images  # noqa: E402
+
+from embryograding import BatchGrader, GeminiClient, MockGeminiServer, iter_jobs  # noqa: E402
+from embryograding.prompt import API_ROOT  # noqa: E402
+
+
+async def run_mode(
+    source: Path, api_root: str, api_key: str, images_per_request: int, args: argparse.Namespace
+) -> None:
+    rows: list[dict] = []
+    async with GeminiClient(api_key, api_root=api_root) as client:
+        grader = BatchGrader(
+            client,
+            concurrency=args.requests * images_per_request,
+            json_mode=args.json,
+            images_per_request=images_per_request,
+        )
+        stats = await grader.run(iter_jobs(source), rows.append)
+    batched = grader.batcher.stats if grader.batcher is not None else None
+    # Images graded alone (fallbacks, a last group of one) made a request of their own.
+    alone = sum(row.get("request_images", 1) == 1 for row in rows)
+    requests = alone + (batched.requests if batched is not None else 0)
+    print(
+        f"{images_per_request} per request: {stats.images_per_second:6.1f} images/s, "
+        f"{stats.input_tokens / max(stats.completed, 1):6.1f} input / "
+        f"{stats.output_tokens / max(stats.completed, 1):5.1f} output tokens per image, "
+        f"{requests} requests, {batched.fallbacks if batched else 0} re-sent alone, {stats.failed} failed"
+    )
+
+
+async def main_async(source: Path, args: argparse.Namespace) -> None:
+    server = None
+    api_root = args.api_root
+    if not args.api_key:
+        server = MockGeminiServer(
+            latency=args.latency, token_latency=args.token_latency, drop_block_rate=args.drop_block_rate, seed=0
+        )
+        await server.start()
+        api_root = server.api_root
+    try:
+        for images_per_request in (1, 2, 4, 8):
+            await run_mode(source, api_root, args.api_key or "mock-key", images_per_request, args)
+    finally:
+        if server is not None:
+            await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", nargs="?", help="image directory or manifest (default: synthetic frames)")
+    parser.add_argument("--images", type=int, default=200)
+    parser.add_argument("--size", type=int, default=384, help="synthetic frame edge (preprocessed size)")
+    parser.add_argument("--requests", type=int, default=8, help="requests in flight")
+    parser.add_argument("--latency", type=float, default=0.5)
+    parser.add_argument("--token-latency", type=float, default=0.004)
+    parser.add_argument("--drop-block-rate", type=float, default=0.0)
+    parser.add_argument("--json", action="store_true", help="JSON mode")
+    parser.add_argument("--api-key")
+    parser.add_argument("--api-root", default=API_ROOT)
+    args = parser.parse_args()
+
+    if args.source:
+        asyncio.run(main_async(Path(args.source), args))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        make_images(Path(tmp), args.images, args.size, 0.1)
+        asyncio.run(main_async(Path(tmp), args))
+
+
+if __name__ == "__main__":
+    main()
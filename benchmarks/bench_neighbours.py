@@ -0,0 +1,74 @@
+"""Nearest-neighbour query latency and recall, exact vs. IVF-PQ.
+
+Generates clustered synthetic feature vectors (a few thousand embryo
+"types" on a low-dimensional manifold, plus noise, in the 53 dimensions of
+the default descriptors), builds both index layouts, and times single
+top-k queries with perturbed stored vectors as queries. Recall@k of IVF-PQ
+is measured against the exact results.
+
+    python benchmarks/bench_neighbours.py --rows 1000000 --queries 200
+"""
+
+from __future__ import annotations
+
+import argparse
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embryograding import FeatureConfig, NeighbourIndex  # noqa: E402
+
+
+def make_vectors(rows: int, dim: int, seed: int = 0) -> np.ndarray:
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 1, (2000, 8))
+    projection = rng.normal(0, 1, (8, dim))
+    latent = centres[rng.integers(0, len(centres), rows)] + rng.normal(0, 0.3, (rows, 8))
+    return (latent @ projection + rng.normal(0, 0.2, (rows, dim))).astype(np.float32)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("-k", type=int, default=10)
+    parser.add_argument("--nprobe", type=int, default=24)
+    args = parser.parse_args()
+
+    dim = len(FeatureConfig().names())
+    vectors = make_vectors(args.rows, dim)
+    rng = np.random.default_rng(1)
+    queries = vectors[rng.integers(0, args.rows, args.queries)] + rng.normal(0, 0.1, (args.queries, dim))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        results = {}
+        for kind in ("exact", "ivfpq"):
+            started = time.perf_counter()
+            NeighbourIndex.build(Path(tmp) / kind, vectors, kind=kind, nprobe=args.nprobe)
+            built = time.perf_counter() - started
+            index = NeighbourIndex(Path(tmp) / kind)
+            index.search(queries[0], args.k)
+            latencies = []
+            found = []
+            for query in queries:
+                started = time.perf_counter()
+                ids, _ = index.search(query, args.k)
+                latencies.append(time.perf_counter() - started)
+                found.append(set(ids.tolist()))
+            results[kind] = found
+            latencies_ms = 1000 * np.array(latencies)
+            print(
+                f"{kind:<6} {args.rows} rows: build {built:6.1f}s, query median {np.median(latencies_ms):6.2f} ms, "
+                f"p99 {np.percentile(latencies_ms, 99):6.2f} ms"
+            )
+        recall = np.mean([len(a & b) / args.k for a, b in zip(results["exact"], results["ivfpq"])])
+        print(f"ivfpq recall@{args.k} vs exact: {recall:.3f} (nprobe {args.nprobe})")
+
+
+if __name__ == "__main__":
+    main()
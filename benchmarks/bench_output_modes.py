@@ -0,0 +1,76 @@
+"""Output tokens and latency: labelled-text responses vs JSON mode.
+
+Runs the same batch through the text prompt and the JSON-schema prompt.
+Against the mock server output tokens are estimated from response length
+and ``--token-latency`` models generation time; with ``--api-key`` the real
+API's ``usageMetadata`` is used.
+
+    python benchmarks/bench_output_modes.py --images 100 --token-latency 0.004
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embryograding import BatchGrader, GeminiClient, MockGeminiServer, iter_jobs  # noqa: E402
+from embryograding.prompt import API_ROOT  # noqa: E402
+
+
+async def run_mode(source: Path, api_root: str, api_key: str, json_mode: bool) -> None:
+    rows: list[dict] = []
+    async with GeminiClient(api_key, api_root=api_root) as client:
+        grader = BatchGrader(client, concurrency=8, json_mode=json_mode)
+        stats = await grader.run(iter_jobs(source), rows.append)
+    label = "json" if json_mode else "text"
+    print(
+        f"{label:>5}: {stats.output_tokens / max(stats.completed, 1):7.1f} output tokens/image, "
+        f"{stats.input_tokens / max(stats.completed, 1):7.1f} input tokens/image, "
+        f"median latency {statistics.median(r['latency_s'] for r in rows):.3f}s, "
+        f"{stats.json_fallbacks} fallbacks, {stats.failed} failed"
+    )
+
+
+async def main_async(source: Path, args: argparse.Namespace) -> None:
+    server = None
+    api_root = args.api_root
+    if not args.api_key:
+        server = MockGeminiServer(latency=args.latency, token_latency=args.token_latency)
+        await server.start()
+        api_root = server.api_root
+    try:
+        for json_mode in (False, True):
+            await run_mode(source, api_root, args.api_key or "mock-key", json_mode)
+    finally:
+        if server is not None:
+            await server.stop()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", nargs="?", help="image directory or manifest (default: random test images)")
+    parser.add_argument("--images", type=int, default=100)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--token-latency", type=float, default=0.004)
+    parser.add_argument("--api-key")
+    parser.add_argument("--api-root", default=API_ROOT)
+    args = parser.parse_args()
+
+    if args.source:
+        asyncio.run(main_async(Path(args.source), args))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        for i in range(args.images):
+            (Path(tmp) / f"D5_{i:04d}.jpg").write_bytes(os.urandom(4096))
+        asyncio.run(main_async(Path(tmp), args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""Response parsing throughput over the stored ``full_response`` column.
+
+Replicates the responses in ``verification_results.csv`` to ``--rows`` and
+times the single-pass parser against a port of the browser's six-regex
+``parseGeminiResponse``.
+
+    python benchmarks/bench_parser.py --rows 1000000
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import itertools
+import re
+import sys
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embryograding.parser import parse_response  # noqa: E402
+
+_LEGACY = [
+    re.compile(r"Grade:\s*(.+)", re.I),
+    re.compile(r"Expansion:\s*(.+)", re.I),
+    re.compile(r"ICM:\s*(.+)", re.I),
+    re.compile(r"TE:\s*(.+)", re.I),
+    re.compile(r"Quality:\s*(.+)", re.I),
+]
+_LEGACY_EXPLANATION = re.compile(r"Explanation:\s*(.+?)(?:\n\n|\n*$)", re.I | re.S)
+
+
+def legacy_parse(text: str) -> list[str]:
+    """``parseGeminiResponse`` from app.html: six scans, no normalisation."""
+    values = [(m.group(1).strip() if (m := pattern.search(text)) else "N/A") for pattern in _LEGACY]
+    explanation = _LEGACY_EXPLANATION.search(text)
+    values.append(explanation.group(1).strip() if explanation else text)
+    return values
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--csv", default=str(ROOT / "verification_results" / "verification_results.csv"))
+    args = parser.parse_args()
+
+    with open(args.csv, newline="", encoding="utf-8") as fh:
+        responses = [row["full_response"] for row in csv.DictReader(fh)]
+    texts = list(itertools.islice(itertools.cycle(responses), args.rows))
+    print(f"{len(texts):,} responses ({len(responses)} distinct)")
+
+    for name, parse in (("six regexes (app.html)", legacy_parse), ("single pass + validation", parse_response)):
+        started = time.perf_counter()
+        for text in texts:
+            parse(text)
+        elapsed = time.perf_counter() - started
+        print(f"{name:<26} {elapsed:6.2f}s  {len(texts) / elapsed * 60:>12,.0f} per minute")
+
+    invalid = sum(not parse_response(text).valid for text in responses)
+    print(f"{invalid}/{len(responses)} distinct responses failed validation")
+
+
+if __name__ == "__main__":
+    main()
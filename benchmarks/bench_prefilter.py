@@ -0,0 +1,116 @@
+"""Local blastocyst pre-filter: speed, calls avoided and false negatives.
+
+Generates synthetic day-3 frames (a zona around a few large blastomeres)
+and day-5 frames (a zona around a smooth cavity with a thin trophectoderm
+ring and an inner cell mass), with a share of day-5 embryos still
+morula-like. Half the images train the model and the other half are held
+out. Reports features + scoring speed on pre-decoded frames, end to end
+from JPEG files, and on the held-out half the share of Gemini calls the
+filter avoids and its false-negative rate against the stage and against a
+synthetic ``actual_class``.
+
+    python benchmarks/bench_prefilter.py --images 2000 --size 500
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embryograding.prefilter import assess, batch_features, extract_features, train  # noqa: E402
+from embryograding.roi import load_frames  # noqa: E402
+
+
+def make_images(directory: Path, count: int, size: int, morula_share: float) -> list[str]:
+    """Write ``count`` frames, alternating days; returns each image's actual_class."""
+    rng = np.random.default_rng(0)
+    classes = []
+    for i in range(count):
+        day5 = i % 2 == 1
+        im = Image.fromarray(rng.normal(125, 10, (size, size)).clip(0, 255).astype(np.uint8))
+        draw = ImageDraw.Draw(im)
+        r = rng.uniform(0.28, 0.38) * size
+        cx, cy = (rng.uniform(r + 8, size - r - 8) for _ in range(2))
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), fill=150, outline=215, width=max(3, size // 80))
+        morula = day5 and rng.random() < morula_share
+        if day5 and not morula:
+            inner = 0.86 * r
+            draw.ellipse((cx - inner, cy - inner, cx + inner, cy + inner), outline=90, width=max(2, size // 150))
+            a = rng.uniform(0, 2 * np.pi)
+            ix, iy, ir = cx + 0.5 * r * np.cos(a), cy + 0.5 * r * np.sin(a), 0.3 * r
+            draw.ellipse((ix - ir, iy - ir, ix + ir, iy + ir), fill=95)
+            for _ in range(40):
+                px, py, dot = ix + rng.normal(0, ir / 2), iy + rng.normal(0, ir / 2), size // 120
+                draw.ellipse((px - dot, py - dot, px + dot, py + dot), fill=int(rng.integers(60, 130)))
+        else:
+            cells = int(rng.integers(12, 20)) if morula else int(rng.integers(4, 9))
+            for _ in range(cells):
+                a, rr = rng.uniform(0, 2 * np.pi), rng.uniform(0, 0.45 * r)
+                br = rng.uniform(0.25, 0.4) * r if not morula else rng.uniform(0.18, 0.26) * r
+                bx, by = cx + rr * np.cos(a), cy + rr * np.sin(a)
+                draw.ellipse((bx - br, by - br, bx + br, by + br), fill=int(rng.integers(110, 150)), outline=70,
+                             width=max(2, size // 200))
+        im.filter(ImageFilter.GaussianBlur(1.2)).save(directory / f"D{5 if day5 else 3}_{i:05d}.jpg", quality=90)
+        classes.append("1" if day5 and not morula and rng.random() < 0.6 else "0")
+    return classes
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=1000)
+    parser.add_argument("--size", type=int, default=500, help="synthetic frame edge in pixels")
+    parser.add_argument("--work-size", type=int, default=96, help="working frame edge for the features")
+    parser.add_argument("--morula-share", type=float, default=0.1, help="day-5 embryos that are still morulae")
+    parser.add_argument("--recall", type=float, default=0.98)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        classes = make_images(Path(tmp), args.images, args.size, args.morula_share)
+        paths = sorted(Path(tmp).iterdir(), key=lambda p: int(p.stem.split("_")[1]))
+        names = [p.name for p in paths]
+
+        frames, _ = load_frames(paths, args.work_size)
+        started = time.perf_counter()
+        for i in range(0, len(frames), 64):
+            extract_features(frames[i:i + 64])
+        elapsed = time.perf_counter() - started
+        print(f"features only, 1 core:       {1000 * elapsed / len(frames):6.2f} ms/image")
+
+        for workers in sorted({1, os.cpu_count() or 1}):
+            started = time.perf_counter()
+            features = batch_features(paths, args.work_size, workers)
+            elapsed = time.perf_counter() - started
+            print(f"decode + features, {workers:2d} workers: {1000 * elapsed / len(paths):6.2f} ms/image")
+
+        fit = np.arange(len(paths)) % 4 < 2
+        started = time.perf_counter()
+        model = train(features[fit], [name.startswith("D5") for name in np.array(names)[fit]], args.recall)
+        print(f"training on {fit.sum()} images:    {1000 * (time.perf_counter() - started):6.1f} ms")
+
+        test = ~fit
+        report = assess(
+            model.scores(features[test]), model.threshold, list(np.array(names)[test]), list(np.array(classes)[test])
+        )
+        print(f"held out {report.images} images, threshold {model.threshold:.3f}:")
+        print(f"  calls avoided                {report.skipped}/{report.images} ({report.calls_avoided:.1%})")
+        print(
+            f"  false negatives vs stage     {report.stage_false_negatives}/{report.stage_positives} "
+            f"({report.stage_false_negative_rate:.1%})"
+        )
+        print(
+            f"  false negatives vs class 1   {report.class_false_negatives}/{report.class_positives} "
+            f"({report.false_negative_rate:.1%})"
+        )
+
+
+if __name__ == "__main__":
+    main()
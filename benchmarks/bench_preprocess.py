@@ -0,0 +1,118 @@
+"""Payload size, latency and grade stability with and without preprocessing.
+
+Grades the same images twice, once as-is and once through the
+preprocessing stage, and prints per-image bytes sent, end-to-end latency
+and grade. Against the mock server only bytes and latency are meaningful;
+pass ``--api-key`` (and the default API root) to check grade stability on
+the real model.
+
+    python benchmarks/bench_preprocess.py path/to/images --max-edge 512
+    python benchmarks/bench_preprocess.py --synthetic 20
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import statistics
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embryograding import (  # noqa: E402
+    BatchGrader,
+    GeminiClient,
+    MockGeminiServer,
+    PreprocessConfig,
+    Preprocessor,
+    iter_jobs,
+)
+from embryograding.prompt import API_ROOT  # noqa: E402
+
+
+def make_synthetic(directory: Path, count: int, size: int) -> None:
+    """Write noisy full-resolution frames with a bright ring, like a zona."""
+    import random
+
+    from PIL import Image, ImageDraw, ImageFilter
+
+    rng = random.Random(0)
+    for i in range(count):
+        im = Image.effect_noise((size, size), 40).convert("RGB")
+        draw = ImageDraw.Draw(im)
+        r = size // 4 + rng.randint(-size // 16, size // 16)
+        cx, cy = size // 2 + rng.randint(-size // 8, size // 8), size // 2 + rng.randint(-size // 8, size // 8)
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline=(230, 230, 230), width=size // 80)
+        im.filter(ImageFilter.GaussianBlur(1)).save(directory / f"D5_{i:04d}.jpg", quality=95)
+
+
+async def grade_all(source: Path, api_root: str, api_key: str, preprocessor: Preprocessor | None) -> dict:
+    rows: dict = {}
+    async with GeminiClient(api_key, api_root=api_root) as client:
+        grader = BatchGrader(client, concurrency=8, preprocessor=preprocessor)
+        await grader.run(iter_jobs(source), lambda row: rows.__setitem__(row["image_name"], row))
+    return rows
+
+
+async def compare(source: Path, args: argparse.Namespace) -> None:
+    config = PreprocessConfig(max_edge=args.max_edge, grayscale=not args.color, jpeg_quality=args.jpeg_quality)
+    if args.api_key:
+        api_root, server = args.api_root, None
+    else:
+        server = MockGeminiServer(latency=args.latency)
+        await server.start()
+        api_root = server.api_root
+    try:
+        plain = await grade_all(source, api_root, args.api_key or "mock-key", None)
+        with Preprocessor(config) as preprocessor:
+            small = await grade_all(source, api_root, args.api_key or "mock-key", preprocessor)
+    finally:
+        if server is not None:
+            await server.stop()
+
+    print(f"{'image':<16} {'bytes':>10} {'prep bytes':>10} {'s':>7} {'prep s':>7}  grade -> prep grade")
+    for name in sorted(plain):
+        a, b = plain[name], small.get(name)
+        if b is None:
+            continue
+        print(
+            f"{name:<16} {a['bytes_sent']:>10} {b['bytes_sent']:>10} {a['latency_s']:>7.3f} {b['latency_s']:>7.3f}"
+            f"  {a['gardner_grade']} -> {b['gardner_grade']}"
+        )
+    names = [n for n in plain if n in small]
+    sent = sum(plain[n]["bytes_sent"] for n in names)
+    sent_small = sum(small[n]["bytes_sent"] for n in names)
+    same = sum(plain[n]["gardner_grade"] == small[n]["gardner_grade"] for n in names)
+    print(
+        f"\n{len(names)} images: {sent / 2**20:.1f} MB -> {sent_small / 2**20:.2f} MB sent "
+        f"({1 - sent_small / sent:.0%} less), median latency "
+        f"{statistics.median(plain[n]['latency_s'] for n in names):.3f}s -> "
+        f"{statistics.median(small[n]['latency_s'] for n in names):.3f}s, "
+        f"same grade for {same}/{len(names)}"
+    )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("source", nargs="?", help="image directory or manifest CSV")
+    parser.add_argument("--synthetic", type=int, default=0, help="generate this many 2048px test frames instead")
+    parser.add_argument("--max-edge", type=int, default=512)
+    parser.add_argument("--color", action="store_true")
+    parser.add_argument("--jpeg-quality", type=int, default=85)
+    parser.add_argument("--latency", type=float, default=0.2, help="mock server latency")
+    parser.add_argument("--api-key", help="grade against the real API instead of the mock server")
+    parser.add_argument("--api-root", default=API_ROOT)
+    args = parser.parse_args()
+
+    if args.source:
+        asyncio.run(compare(Path(args.source), args))
+        return
+    with tempfile.TemporaryDirectory() as tmp:
+        make_synthetic(Path(tmp), args.synthetic or 20, 2048)
+        asyncio.run(compare(Path(tmp), args))
+
+
+if __name__ == "__main__":
+    main()
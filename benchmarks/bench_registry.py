@@ -0,0 +1,69 @@
+"""Insert throughput and history-query latency of the run registry.
+
+Records ``--rows`` results (the rows of ``verification_results.csv`` with
+unique image names) across ``--runs`` runs in batches of ``--batch-size``,
+then times per-image history lookups.
+
+    python benchmarks/bench_registry.py --rows 200000 --runs 4
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embryograding.registry import RunRegistry  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=200_000)
+    parser.add_argument("--runs", type=int, default=4, help="each image is graded once per run")
+    parser.add_argument("--batch-size", type=int, default=512)
+    parser.add_argument("--lookups", type=int, default=1000)
+    parser.add_argument("--csv", default=str(ROOT / "verification_results" / "verification_results.csv"))
+    args = parser.parse_args()
+
+    with open(args.csv, newline="", encoding="utf-8") as fh:
+        sample = list(csv.DictReader(fh))
+    per_run = args.rows // args.runs
+    names = [f"D5_{i:07d}.jpg" for i in range(per_run)]
+
+    with tempfile.TemporaryDirectory() as tmp:
+        with RunRegistry(Path(tmp) / "runs.db", batch_size=args.batch_size) as registry:
+            start = time.perf_counter()
+            for run in range(args.runs):
+                run_id = registry.start_run(prompt=f"prompt version {run}")
+                record = registry.recorder(run_id)
+                for i, name in enumerate(names):
+                    row = dict(sample[(i + run) % len(sample)], image_name=name, latency_s=1.2,
+                               input_tokens=262, output_tokens=60)
+                    record(row)
+            registry.flush()
+            elapsed = time.perf_counter() - start
+            total = per_run * args.runs
+            print(f"inserted {total} gradings in {elapsed:.2f}s ({total / elapsed:,.0f}/s, batch {args.batch_size})")
+
+            rng = random.Random(0)
+            start = time.perf_counter()
+            for _ in range(args.lookups):
+                history = registry.history(rng.choice(names))
+                assert len(history) == args.runs
+            elapsed = time.perf_counter() - start
+            print(f"history lookups: {elapsed / args.lookups * 1e3:.3f} ms each ({args.runs} gradings per image)")
+
+            start = time.perf_counter()
+            counts = registry.grade_counts()
+            print(f"grade counts over all runs: {(time.perf_counter() - start) * 1e3:.1f} ms, {len(counts)} grades")
+
+
+if __name__ == "__main__":
+    main()
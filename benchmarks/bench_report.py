@@ -0,0 +1,137 @@
+"""Report generation: inline base64 images vs content-hashed assets.
+
+Builds reports of 15, 1,000 and 10,000 cards from the 15 frames embedded in
+``verification_results/verification_report.html`` (each copy is made a
+distinct file, so nothing is deduplicated) and prints generation time,
+total output size and the bytes a browser needs for first paint: the whole
+HTML for the inline report; the HTML plus the thumbnails of the first
+``--viewport-cards`` cards for the lazy-loading one. The paginated report
+is fed from a :class:`ResultStore` and also reports the size of its landing
+page plus card index and the generator's peak Python memory.
+
+    python benchmarks/bench_report.py --cards 15 1000 10000 --page-size 100
+"""
+
+from __future__ import annotations
+
+import argparse
+import base64
+import csv
+import html
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embryograding.report import (  # noqa: E402
+    ASSET_DIR,
+    FOOTER,
+    ReportConfig,
+    page_filename,
+    render_card,
+    render_header,
+    write_report,
+)
+from embryograding.store import ResultStore  # noqa: E402
+
+_DATA_URI = re.compile(r'src="data:image/jpeg;base64,([A-Za-z0-9+/=]+)" alt="([^"]+)"')
+
+
+def sample_images(report: Path) -> dict[str, bytes]:
+    text = report.read_text(encoding="utf-8")
+    return {name: base64.b64decode(data) for data, name in _DATA_URI.findall(text)}
+
+
+def make_rows(sample: list[dict[str, str]], images: dict[str, bytes], count: int, directory: Path) -> list[dict]:
+    rows = []
+    for i in range(count):
+        row = dict(sample[i % len(sample)])
+        name = f"{Path(row['image_name']).stem}_{i:05d}.jpg"
+        # Bytes after the JPEG end-of-image marker are ignored by decoders
+        # but make every copy a distinct asset.
+        (directory / name).write_bytes(images[row["image_name"]] + i.to_bytes(4, "big"))
+        row.update(image_name=name, image_path=str(directory / name))
+        rows.append(row)
+    return rows
+
+
+def inline_report(rows: list[dict], path: Path) -> None:
+    """The existing report's approach: every image inlined as base64."""
+    with path.open("w", encoding="utf-8") as fh:
+        fh.write(render_header(ReportConfig(), len(rows)))
+        for number, row in enumerate(rows, 1):
+            card = render_card(number, row, None)
+            data = base64.b64encode(Path(row["image_path"]).read_bytes()).decode("ascii")
+            img = f'<img src="data:image/jpeg;base64,{data}" alt="{html.escape(row["image_name"])}">'
+            fh.write(re.sub(r'<div class="image-missing">.*?</div>', lambda _: img, card, count=1))
+        fh.write(FOOTER)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, nargs="+", default=[15, 1000, 10000])
+    parser.add_argument("--viewport-cards", type=int, default=4)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--thumb-format", default="webp")
+    parser.add_argument("--page-size", type=int, default=100)
+    args = parser.parse_args()
+
+    images = sample_images(ROOT / "verification_results" / "verification_report.html")
+    with open(ROOT / "verification_results" / "verification_results.csv", newline="", encoding="utf-8") as fh:
+        sample = list(csv.DictReader(fh))
+
+    print(f"{'cards':>6} {'mode':<7} {'time':>8} {'total MB':>9} {'first paint KB':>15}")
+    for count in args.cards:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp_path = Path(tmp)
+            (tmp_path / "images").mkdir()
+            rows = make_rows(sample, images, count, tmp_path / "images")
+
+            start = time.perf_counter()
+            inline_report(rows, tmp_path / "inline.html")
+            elapsed = time.perf_counter() - start
+            size = (tmp_path / "inline.html").stat().st_size
+            print(f"{count:>6} {'inline':<7} {elapsed:>7.2f}s {size / 1e6:>9.1f} {size / 1e3:>15.0f}")
+
+            out = tmp_path / "report"
+            config = ReportConfig(thumb_format=args.thumb_format)
+            stats = write_report(rows, out, config, workers=args.workers)
+            assets = sorted((out / ASSET_DIR).iterdir())
+            total = stats.html_bytes + sum(f.stat().st_size for f in assets)
+            thumbs = re.findall(r'<img src="([^"]+)"', (out / "verification_report.html").read_text(encoding="utf-8"))
+            first = stats.html_bytes + sum((out / t).stat().st_size for t in thumbs[:args.viewport_cards])
+            print(f"{count:>6} {'assets':<7} {stats.elapsed:>7.2f}s {total / 1e6:>9.1f} {first / 1e3:>15.0f}")
+
+            start = time.perf_counter()
+            write_report(rows, out, config, workers=args.workers)
+            print(f"{count:>6} {'rerun':<7} {time.perf_counter() - start:>7.2f}s   (assets already present)")
+
+            with ResultStore(tmp_path / "results.store") as store:
+                store.extend(rows)
+            del rows
+            paged = tmp_path / "paged"
+            tracemalloc.start()
+            stats = write_report(
+                ResultStore(tmp_path / "results.store").rows(), paged, config, workers=args.workers,
+                page_size=args.page_size, total=count,
+            )
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            first_page = paged / page_filename(1)
+            thumbs = re.findall(r'<img src="([^"]+)"', first_page.read_text(encoding="utf-8"))
+            first = first_page.stat().st_size + sum((paged / t).stat().st_size for t in thumbs[:args.viewport_cards])
+            landing = (paged / "verification_report.html").stat().st_size + (paged / "index.js").stat().st_size
+            print(
+                f"{count:>6} {'paged':<7} {stats.elapsed:>7.2f}s {'':>9} {first / 1e3:>15.0f}"
+                f"   {stats.pages} pages; landing page + index {landing / 1e3:.0f} KB;"
+                f" peak Python memory {peak / 1e6:.1f} MB"
+            )
+
+
+if __name__ == "__main__":
+    main()
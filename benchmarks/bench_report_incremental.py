@@ -0,0 +1,74 @@
+"""Refreshing a paginated report after a small regrade run.
+
+Builds a ``--cards`` card report from a results store, changes the grade of
+``--regraded`` cards and times an incremental refresh against a full
+regeneration (with thumbnails already on disk, so the full run is only
+re-rendering and re-hashing).
+
+    python benchmarks/bench_report_incremental.py --cards 10000 --regraded 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from bench_report import make_rows, sample_images  # noqa: E402
+
+from embryograding.report import ReportConfig, write_report  # noqa: E402
+from embryograding.store import ResultStore  # noqa: E402
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, default=10_000)
+    parser.add_argument("--regraded", type=int, default=3)
+    parser.add_argument("--page-size", type=int, default=100)
+    parser.add_argument("--workers", type=int)
+    args = parser.parse_args()
+
+    images = sample_images(ROOT / "verification_results" / "verification_report.html")
+    with open(ROOT / "verification_results" / "verification_results.csv", newline="", encoding="utf-8") as fh:
+        sample = list(csv.DictReader(fh))
+    config = ReportConfig(thumb_format="jpeg")
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        (tmp_path / "images").mkdir()
+        rows = make_rows(sample, images, args.cards, tmp_path / "images")
+        before, after = tmp_path / "before.store", tmp_path / "after.store"
+        with ResultStore(before) as store:
+            store.extend(rows)
+        for i in random.Random(0).sample(range(args.cards), args.regraded):
+            rows[i] = dict(rows[i], gardner_grade="5BB", expansion="5", icm_quality="B", te_quality="B")
+        with ResultStore(after) as store:
+            store.extend(rows)
+        del rows
+
+        out = tmp_path / "report"
+        stats = write_report(ResultStore(before).rows(), out, config, args.workers, page_size=args.page_size)
+        print(f"initial build: {stats.cards} cards, {stats.pages} pages in {stats.elapsed:.2f}s")
+
+        stats = write_report(
+            ResultStore(after).rows(), out, config, args.workers, page_size=args.page_size, incremental=True
+        )
+        print(
+            f"incremental:   {stats.rendered} cards re-rendered, {stats.pages_written} pages rewritten "
+            f"in {stats.elapsed:.3f}s"
+        )
+
+        start = time.perf_counter()
+        stats = write_report(ResultStore(after).rows(), out, config, args.workers, page_size=args.page_size)
+        print(f"full rebuild:  {stats.rendered} cards re-rendered in {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
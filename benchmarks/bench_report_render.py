@@ -0,0 +1,87 @@
+"""Render 100k report cards from a results store: one string vs streaming.
+
+Fills a :class:`ResultStore` with ``--cards`` rows (the sample results with
+unique names) and renders a single-page report twice, timing each and
+tracking peak Python memory with ``tracemalloc``:
+
+* ``string``: every card built and joined into one document, then written
+  (how the original report was produced);
+* ``stream``: :func:`iter_report` chunks written as they are generated.
+
+Image assets are not generated; every card links a placeholder thumbnail.
+
+    python benchmarks/bench_report_render.py --cards 100000
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+import tempfile
+import time
+import tracemalloc
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embryograding.htmlstream import write_chunks  # noqa: E402
+from embryograding.report import FOOTER, Asset, ReportConfig, iter_report, render_card, render_header  # noqa: E402
+from embryograding.store import ResultStore  # noqa: E402
+
+ASSET = Asset("assets/0000.jpg", "assets/0000-400.webp", 400, 377)
+
+
+def cards(store: ResultStore):
+    for number, row in enumerate(store.rows(), 1):
+        yield render_card(number, row, ASSET)
+
+
+def as_string(store: ResultStore, path: Path) -> None:
+    document = render_header(ReportConfig(), len(store)) + "".join(cards(store)) + FOOTER
+    path.write_text(document, encoding="utf-8")
+
+
+def streamed(store: ResultStore, path: Path) -> None:
+    write_chunks(iter_report(cards(store), ReportConfig(), len(store)), path)
+
+
+def measure(fn, store: ResultStore, path: Path) -> tuple[float, float]:
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(store, path)
+    elapsed = time.perf_counter() - start
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--cards", type=int, nargs="+", default=[10_000, 100_000])
+    parser.add_argument("--csv", default=str(ROOT / "verification_results" / "verification_results.csv"))
+    args = parser.parse_args()
+
+    with open(args.csv, newline="", encoding="utf-8") as fh:
+        sample = list(csv.DictReader(fh))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        for count in args.cards:
+            store_path = Path(tmp) / f"store-{count}"
+            with ResultStore(store_path, flush_every=8192) as store:
+                for i in range(count):
+                    store.append(dict(sample[i % len(sample)], image_name=f"D5_{i:07d}.jpg"))
+            store = ResultStore(store_path)
+            for label, fn in (("string", as_string), ("stream", streamed)):
+                out = Path(tmp) / f"{label}.html"
+                elapsed, peak = measure(fn, store, out)
+                print(
+                    f"{count:>7} cards {label:<6}: {elapsed:6.2f}s ({count / elapsed:8,.0f} cards/s), "
+                    f"{out.stat().st_size / 1e6:6.1f} MB written, peak Python memory {peak / 1e6:7.1f} MB"
+                )
+                out.unlink()
+
+
+if __name__ == "__main__":
+    main()
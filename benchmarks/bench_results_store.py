@@ -0,0 +1,102 @@
+"""Size and load time: ``verification_results.csv`` vs :class:`ResultStore`.
+
+Replicates the rows of ``verification_results.csv`` to ``--rows`` with
+unique image names. ``--unique`` is the fraction of rows whose response is
+made distinct (a real season repeats responses only through re-runs and
+cache hits; every explanation still appears inside its response).
+
+    python benchmarks/bench_results_store.py --rows 1000000 --unique 0.1
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embryograding.engine import CSV_FIELDS  # noqa: E402
+from embryograding.store import ResultStore  # noqa: E402
+
+
+def synthetic_rows(sample: list[dict[str, str]], count: int, unique: float, seed: int = 0):
+    rng = random.Random(seed)
+    for i in range(count):
+        row = dict(sample[i % len(sample)])
+        name = f"D{rng.choice('35')}_{i:07d}.jpg"
+        row["image_name"] = name
+        row["image_path"] = f"verification_results/images/{name}"
+        if rng.random() < unique:
+            row["explanation"] += f" ({name})"
+            row["full_response"] += f" ({name})"
+        yield row
+
+
+def directory_size(path: Path) -> int:
+    return sum(file.stat().st_size for file in path.iterdir())
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--rows", type=int, default=1_000_000)
+    parser.add_argument("--unique", type=float, default=0.1, help="fraction of rows with a distinct response")
+    parser.add_argument("--csv", default=str(ROOT / "verification_results" / "verification_results.csv"))
+    args = parser.parse_args()
+
+    with open(args.csv, newline="", encoding="utf-8") as fh:
+        sample = list(csv.DictReader(fh))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        csv_path = Path(tmp) / "results.csv"
+        store_path = Path(tmp) / "results.store"
+
+        start = time.perf_counter()
+        with csv_path.open("w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=CSV_FIELDS)
+            writer.writeheader()
+            writer.writerows(synthetic_rows(sample, args.rows, args.unique))
+        csv_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with ResultStore(store_path, flush_every=8192) as store:
+            store.extend(synthetic_rows(sample, args.rows, args.unique))
+        store_write = time.perf_counter() - start
+
+        start = time.perf_counter()
+        with csv_path.open(newline="", encoding="utf-8") as fh:
+            csv_rows = list(csv.DictReader(fh))
+        csv_load = time.perf_counter() - start
+        grades_csv = sum(row["gardner_grade"] == "3AA" for row in csv_rows)
+        del csv_rows
+
+        start = time.perf_counter()
+        store = ResultStore(store_path)
+        grades = store.codes("gardner_grade")
+        grades_store = int((grades == store.categories("gardner_grade").index("3AA")).sum())
+        names = store.column("image_name")
+        columnar_load = time.perf_counter() - start
+
+        start = time.perf_counter()
+        row_count = sum(1 for _ in store.rows())
+        rows_load = time.perf_counter() - start
+        assert grades_store == grades_csv and row_count == len(names) == args.rows
+
+        csv_size = csv_path.stat().st_size
+        store_size = directory_size(store_path)
+        print(f"{args.rows} rows, {store.blob_count} distinct responses")
+        print(f"  csv:   {csv_size / 1e6:8.1f} MB  write {csv_write:6.2f}s  load all rows {csv_load:6.2f}s")
+        print(
+            f"  store: {store_size / 1e6:8.1f} MB  write {store_write:6.2f}s  "
+            f"load grade+name columns {columnar_load:6.2f}s  iterate all rows {rows_load:6.2f}s"
+        )
+        print(f"  {csv_size / store_size:.1f}x smaller, columnar load {csv_load / columnar_load:.0f}x faster")
+
+
+if __name__ == "__main__":
+    main()
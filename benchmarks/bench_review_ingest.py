@@ -0,0 +1,81 @@
+"""Bulk-loading expert review exports into a run registry.
+
+Writes ``--reviewers`` export files of ``--reviews`` reviews each (the JSON
+the report's "Export reviews" button downloads), imports them all, then
+re-imports them to time the update path.
+
+    python benchmarks/bench_review_ingest.py --reviewers 5 --reviews 20000
+"""
+
+from __future__ import annotations
+
+import argparse
+import datetime
+import json
+import random
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embryograding.registry import RunRegistry  # noqa: E402
+from embryograding.reviews import REVIEW_FORMAT, REVIEW_VERSION  # noqa: E402
+
+GRADES = ["3AA", "3AB", "3BB", "4AA", "4AB", "4BB", "5AA", "5BB", "N/A"]
+
+
+def write_export(path: Path, reviewer: str, count: int, run_id: str, rng: random.Random) -> None:
+    now = datetime.datetime.now(datetime.timezone.utc)
+    reviews = []
+    for i in range(count):
+        ai, expert = rng.choice(GRADES), rng.choice(GRADES)
+        reviews.append({
+            "image_name": f"D5_{i:07d}.jpg",
+            "run_id": run_id,
+            "ai_grade": ai,
+            "expert_grade": expert,
+            "agree": "yes" if ai == expert else rng.choice(["no", "partial"]),
+            "comments": "ICM looser than graded" if rng.random() < 0.2 else "",
+            "updated_at": (now - datetime.timedelta(seconds=count - i)).isoformat().replace("+00:00", "Z"),
+        })
+    doc = {
+        "format": REVIEW_FORMAT,
+        "version": REVIEW_VERSION,
+        "exported_at": now.isoformat().replace("+00:00", "Z"),
+        "reviewer": reviewer,
+        "reviews": reviews,
+    }
+    path.write_text(json.dumps(doc, indent=1), encoding="utf-8")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--reviewers", type=int, default=5)
+    parser.add_argument("--reviews", type=int, default=20_000, help="reviews per reviewer")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp_path = Path(tmp)
+        files = [tmp_path / f"reviews-{n}.json" for n in range(args.reviewers)]
+        for n, path in enumerate(files):
+            write_export(path, f"expert {n}", args.reviews, "run-1", rng)
+        size = sum(path.stat().st_size for path in files)
+
+        with RunRegistry(tmp_path / "registry.db") as registry:
+            for label in ("import", "re-import"):
+                start = time.perf_counter()
+                count = sum(registry.import_reviews(path) for path in files)
+                elapsed = time.perf_counter() - start
+                print(
+                    f"{label:9}: {count} reviews from {len(files)} files ({size / 1e6:.1f} MB) in {elapsed:.2f}s "
+                    f"({count / elapsed:,.0f} reviews/s)"
+                )
+            assert len(registry.reviews()) == args.reviewers * args.reviews
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""Embryo detection throughput, on one core and on all cores.
+
+Generates synthetic microscope-like frames (noisy medium, a textured disc
+inside a bright ring), then measures frames/second for detection alone
+(pre-decoded frames, one process) and end to end from JPEG files through
+RoiDetector with 1 and N worker processes. Also reports the median centre
+error against the known circles.
+
+    python benchmarks/bench_roi.py --frames 512 --size 1024
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageDraw, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embryograding import DetectorConfig, ImageJob, RoiDetector, detect_circles  # noqa: E402
+from embryograding.roi import load_frames  # noqa: E402
+
+
+def make_frames(directory: Path, count: int, size: int) -> list[tuple[int, int, int]]:
+    rng = np.random.default_rng(0)
+    truth = []
+    for i in range(count):
+        im = Image.fromarray(rng.normal(120, 12, (size, size)).clip(0, 255).astype(np.uint8))
+        draw = ImageDraw.Draw(im)
+        r = int(rng.uniform(0.2, 0.35) * size)
+        cx, cy = (int(v) for v in rng.uniform(r + 4, size - r - 4, 2))
+        draw.ellipse((cx - r, cy - r, cx + r, cy + r), outline=220, width=max(2, size // 60))
+        for _ in range(60):
+            a, rr = rng.uniform(0, 2 * np.pi), rng.uniform(0, 0.8 * r)
+            px, py, dot = cx + rr * np.cos(a), cy + rr * np.sin(a), size // 50
+            draw.ellipse((px - dot, py - dot, px + dot, py + dot), fill=int(rng.integers(60, 200)))
+        im.filter(ImageFilter.GaussianBlur(1.5)).save(directory / f"D5_{i:04d}.jpg", quality=90)
+        truth.append((cx, cy, r))
+    return truth
+
+
+async def annotate_all(detector: RoiDetector, jobs: list[ImageJob]) -> list[ImageJob]:
+    return [job async for job in detector.annotate(jobs)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--frames", type=int, default=256)
+    parser.add_argument("--size", type=int, default=1024)
+    parser.add_argument("--batch", type=int, default=32)
+    args = parser.parse_args()
+    config = DetectorConfig()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        truth = make_frames(Path(tmp), args.frames, args.size)
+        paths = sorted(Path(tmp).iterdir())
+        jobs = [ImageJob(p, p.name) for p in paths]
+
+        frames, _ = load_frames(paths, config.size)
+        started = time.perf_counter()
+        for i in range(0, len(frames), args.batch):
+            detect_circles(frames[i:i + args.batch], config)
+        print(f"detection only, 1 core:      {len(frames) / (time.perf_counter() - started):8.0f} frames/s")
+
+        for workers in sorted({1, os.cpu_count() or 1}):
+            with RoiDetector(config, workers=workers, batch_size=args.batch) as detector:
+                started = time.perf_counter()
+                annotated = asyncio.run(annotate_all(detector, jobs))
+                rate = len(jobs) / (time.perf_counter() - started)
+            print(f"decode + detect, {workers:2d} workers: {rate:8.0f} frames/s")
+
+        errors = [
+            np.hypot((job.roi[0] + job.roi[2]) / 2 - cx, (job.roi[1] + job.roi[3]) / 2 - cy) / r
+            for job, (cx, cy, r) in zip(annotated, truth)
+            if job.roi is not None
+        ]
+        median = np.median(errors) if errors else float("nan")
+        print(f"found {len(errors)}/{len(jobs)}, median centre error {median:.1%} of radius")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Adaptive scheduling against a mock server that throttles with 429s.
+
+The mock rejects anything beyond ``--server-limit`` concurrent requests and
+a random ``--throttle-rate`` of the rest. Compares a fixed concurrency with
+no retries against the adaptive scheduler, printing its live state.
+
+    python benchmarks/bench_scheduler.py --images 300
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import logging
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from embryograding import BatchGrader, GeminiClient, MockGeminiServer, RequestScheduler, iter_jobs  # noqa: E402
+
+
+async def monitor(scheduler: RequestScheduler, interval: float) -> None:
+    while True:
+        await asyncio.sleep(interval)
+        s = scheduler.stats
+        print(
+            f"  limit {s.concurrency_limit:5.1f}  in flight {s.in_flight:3d}  queued {s.queue_depth:3d}  "
+            f"rate {s.current_rate * 60:6.0f}/min  retries {s.retries:4d}  throttled {s.throttled:4d}"
+        )
+
+
+async def run(directory: Path, args: argparse.Namespace, adaptive: bool) -> None:
+    server = MockGeminiServer(
+        latency=args.latency, throttle_rate=args.throttle_rate, max_concurrent=args.server_limit, seed=1
+    )
+    async with server, GeminiClient("mock-key", api_root=server.api_root) as client:
+        scheduler = None
+        watcher = None
+        if adaptive:
+            scheduler = RequestScheduler(
+                requests_per_minute=args.rpm,
+                initial_concurrency=4,
+                max_concurrency=args.concurrency,
+                target_latency=args.latency * 4,
+                base_delay=0.05,
+                max_delay=2.0,
+            )
+            watcher = asyncio.create_task(monitor(scheduler, 0.5))
+        grader = BatchGrader(client, concurrency=args.concurrency, scheduler=scheduler)
+        stats = await grader.run(iter_jobs(directory), lambda row: None)
+        if watcher is not None:
+            watcher.cancel()
+        label = "adaptive" if adaptive else "fixed"
+        print(
+            f"{label:>8}: {stats.completed}/{stats.submitted} graded, {stats.failed} failed, "
+            f"{stats.images_per_second:.1f} images/s, server saw {server.stats.requests} requests "
+            f"({server.stats.throttled} throttled)"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=300)
+    parser.add_argument("--latency", type=float, default=0.1)
+    parser.add_argument("--concurrency", type=int, default=48)
+    parser.add_argument("--server-limit", type=int, default=16)
+    parser.add_argument("--throttle-rate", type=float, default=0.05)
+    parser.add_argument("--rpm", type=float, default=None)
+    args = parser.parse_args()
+    # The fixed run fails most requests by design; don't log each one.
+    logging.getLogger("embryograding").setLevel(logging.ERROR)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        for i in range(args.images):
+            (directory / f"D5_{i:04d}.jpg").write_bytes(os.urandom(8192))
+        asyncio.run(run(directory, args, adaptive=False))
+        asyncio.run(run(directory, args, adaptive=True))
+
+
+if __name__ == "__main__":
+    main()
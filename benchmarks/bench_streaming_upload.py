@@ -0,0 +1,99 @@
+"""Peak RSS of buffered vs streaming request bodies on large images.
+
+Each mode runs in its own interpreter (so peaks don't mix) against a mock
+server in a third process (so the server's copy of the body isn't counted):
+
+    python benchmarks/bench_streaming_upload.py --images 16 --image-mb 10 --concurrency 8
+"""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import os
+import resource
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(ROOT))
+
+from embryograding import BatchGrader, GeminiClient, iter_jobs  # noqa: E402
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in kilobytes on Linux and bytes on macOS.
+    scale = 1 if sys.platform == "darwin" else 1024
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * scale / 2**20
+
+
+async def grade(directory: Path, api_root: str, concurrency: int, streaming: bool) -> float:
+    async with GeminiClient("mock-key", api_root=api_root) as client:
+        grader = BatchGrader(client, concurrency=concurrency, streaming=streaming)
+        stats = await grader.run(iter_jobs(directory), lambda row: None)
+    assert stats.failed == 0, stats.errors
+    return stats.elapsed
+
+
+def child(args: argparse.Namespace) -> None:
+    before = peak_rss_mb()
+    if args.child != "idle":
+        elapsed = asyncio.run(grade(Path(args.dir), args.api_root, args.concurrency, args.child == "streaming"))
+    else:
+        elapsed = 0.0
+    print(f"{args.child:>10} {before:>12.1f} {peak_rss_mb():>12.1f} {elapsed:>9.2f}")
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--images", type=int, default=16)
+    parser.add_argument("--image-mb", type=float, default=10.0)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--child", choices=["idle", "buffered", "streaming"], help=argparse.SUPPRESS)
+    parser.add_argument("--dir", help=argparse.SUPPRESS)
+    parser.add_argument("--api-root", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child(args)
+        return
+
+    port = free_port()
+    server = subprocess.Popen(
+        [sys.executable, "-m", "embryograding", "mock-server", "--port", str(port), "--latency", "0.2"],
+        cwd=ROOT,
+        stdout=subprocess.DEVNULL,
+    )
+    try:
+        time.sleep(1.0)
+        with tempfile.TemporaryDirectory() as tmp:
+            size = int(args.image_mb * 2**20)
+            for i in range(args.images):
+                (Path(tmp) / f"D5_{i:04d}.jpg").write_bytes(os.urandom(size))
+            print(f"{args.images} images x {args.image_mb:g} MB, concurrency {args.concurrency}")
+            print(f"{'mode':>10} {'startup MB':>12} {'peak RSS MB':>12} {'seconds':>9}")
+            for mode in ("idle", "buffered", "streaming"):
+                subprocess.run(
+                    [
+                        sys.executable, __file__, "--child", mode, "--dir", tmp,
+                        "--api-root", f"http://127.0.0.1:{port}/v1beta",
+                        "--concurrency", str(args.concurrency),
+                    ],
+                    check=True,
+                )
+    finally:
+        server.terminate()
+        server.wait()
+
+
+if __name__ == "__main__":
+    main()
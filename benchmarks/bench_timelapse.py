@@ -0,0 +1,109 @@
+"""Time-lapse key-frame selection: scoring speed, memory and choice of frames.
+
+Writes synthetic recordings, half as multi-page TIFF stacks and half as
+directories of JPEG frames: one embryo frame per recording, drifting a
+little from frame to frame, with the focus wandering (a known Gaussian
+blur radius per frame) and the lamp flickering. Runs
+:func:`extract_key_frames` and reports frames scored per second, grading
+calls per embryo, the decode working set against holding a whole stack,
+and how close each chosen frame is to the sharpest one in its segment.
+
+    python benchmarks/bench_timelapse.py --embryos 20 --frames 300 --key-frames 3
+"""
+
+from __future__ import annotations
+
+import argparse
+import csv
+import sys
+import tempfile
+from pathlib import Path
+
+import numpy as np
+from PIL import Image, ImageChops, ImageEnhance, ImageFilter
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from bench_prefilter import make_images  # noqa: E402
+
+from embryograding import TimelapseConfig, extract_key_frames  # noqa: E402
+
+
+def make_recordings(directory: Path, embryos: int, frames: int, size: int, seed: int = 0) -> dict[str, np.ndarray]:
+    """Write ``embryos`` recordings of ``frames`` frames; returns each one's blur radius per frame."""
+    rng = np.random.default_rng(seed)
+    stills = directory / "stills"
+    stills.mkdir()
+    make_images(stills, embryos, size, 0.1)
+    recordings = directory / "recordings"
+    recordings.mkdir()
+    blur = {}
+    for i, still in enumerate(sorted(stills.iterdir())):
+        name = still.stem
+        base = Image.open(still).convert("L")
+        # Focus drifts as a clipped random walk: mostly soft, sometimes sharp.
+        radius = np.clip(np.cumsum(rng.normal(0, 0.35, frames)) % 6 - 1.5, 0, None)
+        blur[name] = radius
+        images = []
+        for t in range(frames):
+            shifted = ImageChops.offset(base, int(rng.integers(-2, 3)), int(rng.integers(-2, 3)))
+            im = shifted.filter(ImageFilter.GaussianBlur(float(radius[t])))
+            images.append(ImageEnhance.Brightness(im).enhance(float(rng.uniform(0.9, 1.1))))
+        if i % 2:
+            images[0].save(recordings / f"{name}.tif", save_all=True, append_images=images[1:])
+        else:
+            (recordings / name).mkdir()
+            for t, im in enumerate(images):
+                im.save(recordings / name / f"{t:04d}.jpg", quality=90)
+    return blur
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser()
+    parser.add_argument("--embryos", type=int, default=20)
+    parser.add_argument("--frames", type=int, default=300)
+    parser.add_argument("--size", type=int, default=500, help="recorded frame edge")
+    parser.add_argument("--key-frames", type=int, default=3)
+    parser.add_argument("--work-size", type=int, default=256, help="focus scoring frame edge")
+    parser.add_argument("--batch-size", type=int, default=32)
+    parser.add_argument("--workers", type=int, default=1)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        directory = Path(tmp)
+        blur = make_recordings(directory, args.embryos, args.frames, args.size)
+        config = TimelapseConfig(args.key_frames, args.work_size, args.batch_size)
+        stats = extract_key_frames(directory / "recordings", directory / "keys", config, args.workers)
+        with (directory / "keys" / "manifest.csv").open(newline="") as fh:
+            rows = list(csv.DictReader(fh))
+
+    excess, best = [], 0
+    for row in rows:
+        radius = blur[row["sequence"]]
+        segments = np.array_split(np.arange(len(radius)), args.key_frames)
+        index = int(row["frame_index"])
+        segment = next(s for s in segments if s[0] <= index <= s[-1])
+        excess.append(radius[index] - radius[segment].min())
+        best += bool(radius[index] <= radius[segment].min() + 1e-9)
+    working_set = args.batch_size * args.work_size**2
+    stack = args.frames * args.size**2
+    print(
+        f"{stats.sequences} recordings x {args.frames} frames: {stats.frames} frames scored in {stats.elapsed:.1f}s "
+        f"({stats.frames_per_second:.0f} frames/s, {args.workers} worker(s)); {stats.failed} failed"
+    )
+    print(
+        f"grading calls per embryo: {stats.calls_per_embryo:.1f} instead of {args.frames} "
+        f"({stats.key_frames} vs {stats.frames} total)"
+    )
+    print(
+        f"decode working set: {working_set / 2**20:.1f} MiB per recording, "
+        f"against {stack / 2**20:.1f} MiB for a whole decoded stack"
+    )
+    print(
+        f"key frames: {best}/{len(rows)} the sharpest of their segment; "
+        f"blur radius above the segment's sharpest: mean {np.mean(excess):.2f}px, max {np.max(excess):.2f}px"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""Batch Gardner Scale grading of IVF embryo images with Google Gemini.
+
+The browser app (``app.html``) grades one image per click; this package
+grades whole directories or manifests of images from Python.
+"""
+
+from .cache import CacheStats, ResponseCache, cache_key
+from .client import GeminiAPIError, GeminiClient, response_text
+from .dedup import DEDUP_FIELDS, Duplicates, cluster, dhash, fan_out, find_duplicates, phash
+from .engine import BatchGrader, BatchStats, CSVResultWriter, ImageJob, build_row, iter_jobs
+from .ensemble import ENSEMBLE_FIELDS, EnsembleConfig
+from .evaluation import Agreement, Estimate, Evaluation, evaluate, grade_agreement, parse_grade
+from .features import FeatureConfig, FeatureMatrix, descriptors, extract_store_features
+from .focusstack import FusedStack, FusionConfig, fuse, fuse_stacks
+from .interobserver import InterObserverSummary, RatingMatrix, analyse, fleiss_kappa, krippendorff_alpha
+from .mockserver import MockGeminiServer
+from .multiimage import MULTI_IMAGE_FIELDS, ImageBatcher
+from .neighbours import Neighbour, NeighbourIndex, similar
+from .parser import (
+    CellGrade,
+    GardnerResult,
+    Quality,
+    ResponseValidationError,
+    parse_gemini_response,
+    parse_json_response,
+    parse_response,
+    split_response,
+)
+from .prefilter import BlastocystFilter, BlastocystModel, PrefilterReport, extract_features, stage_label
+from .preprocess import PreprocessConfig, Preprocessor, preprocess_image
+from .prompt import (
+    GARDNER_PROMPT,
+    GENERATION_CONFIG,
+    JSON_PROMPT,
+    MODEL,
+    MULTI_IMAGE_PROMPT,
+    RESPONSE_SCHEMA,
+    build_multi_image_request_body,
+    build_request_body,
+    json_generation_config,
+)
+from .registry import RunRegistry
+from .report import ReportConfig, iter_report, write_report
+from .reviews import read_reviews
+from .roi import Detection, DetectorConfig, RoiDetector, detect_circles, detect_rois
+from .scheduler import RequestScheduler, SchedulerStats, TokenBucket
+from .store import ResultStore
+from .streaming import MappedImage, StreamingBody, streaming_request_body
+from .timelapse import KeyFrames, Timelapse, TimelapseConfig, extract_key_frames, focus_scores, select_key_frames
+
+__all__ = [
+    "DEDUP_FIELDS",
+    "ENSEMBLE_FIELDS",
+    "GARDNER_PROMPT",
+    "GENERATION_CONFIG",
+    "JSON_PROMPT",
+    "MODEL",
+    "MULTI_IMAGE_FIELDS",
+    "MULTI_IMAGE_PROMPT",
+    "RESPONSE_SCHEMA",
+    "Agreement",
+    "BatchGrader",
+    "BatchStats",
+    "BlastocystFilter",
+    "BlastocystModel",
+    "CSVResultWriter",
+    "CacheStats",
+    "CellGrade",
+    "Detection",
+    "DetectorConfig",
+    "Duplicates",
+    "EnsembleConfig",
+    "Estimate",
+    "Evaluation",
+    "FeatureConfig",
+    "FeatureMatrix",
+    "FusedStack",
+    "FusionConfig",
+    "GardnerResult",
+    "GeminiAPIError",
+    "GeminiClient",
+    "ImageBatcher",
+    "ImageJob",
+    "InterObserverSummary",
+    "KeyFrames",
+    "MappedImage",
+    "MockGeminiServer",
+    "Neighbour",
+    "NeighbourIndex",
+    "PrefilterReport",
+    "PreprocessConfig",
+    "Preprocessor",
+    "Quality",
+    "RatingMatrix",
+    "ReportConfig",
+    "RequestScheduler",
+    "ResponseCache",
+    "ResponseValidationError",
+    "ResultStore",
+    "RoiDetector",
+    "RunRegistry",
+    "SchedulerStats",
+    "StreamingBody",
+    "Timelapse",
+    "TimelapseConfig",
+    "TokenBucket",
+    "analyse",
+    "build_multi_image_request_body",
+    "build_request_body",
+    "build_row",
+    "cache_key",
+    "cluster",
+    "descriptors",
+    "detect_circles",
+    "detect_rois",
+    "dhash",
+    "evaluate",
+    "extract_features",
+    "extract_key_frames",
+    "extract_store_features",
+    "fan_out",
+    "find_duplicates",
+    "fleiss_kappa",
+    "focus_scores",
+    "fuse",
+    "fuse_stacks",
+    "grade_agreement",
+    "iter_jobs",
+    "iter_report",
+    "json_generation_config",
+    "krippendorff_alpha",
+    "parse_gemini_response",
+    "parse_grade",
+    "parse_json_response",
+    "parse_response",
+    "phash",
+    "preprocess_image",
+    "read_reviews",
+    "response_text",
+    "select_key_frames",
+    "similar",
+    "split_response",
+    "stage_label",
+    "streaming_request_body",
+    "write_report",
+]
@@ -0,0 +1,716 @@
+"""Command line entry point: ``python -m embryograding <command>``."""
+
+from __future__ import annotations
+
+import argparse
+import asyncio
+import collections
+import csv
+import json
+import logging
+import os
+import random
+import sys
+import time
+from pathlib import Path
+
+from .cache import ResponseCache
+from .client import GeminiClient
+from .dedup import DEDUP_FIELDS, HASH_KINDS, fan_out, find_duplicates
+from .engine import CSV_FIELDS, METRIC_FIELDS, PREFILTER_FIELDS, BatchGrader, CSVResultWriter, iter_jobs
+from .ensemble import ENSEMBLE_FIELDS, EnsembleConfig
+from .evaluation import encode_grades, evaluate, grade_agreement, load_results
+from .features import FeatureConfig, FeatureMatrix, describe_images, extract_store_features
+from .focusstack import FusionConfig, fuse_stacks
+from .interobserver import RatingMatrix, analyse, registry_ratings, render_section
+from .mockserver import MockGeminiServer
+from .multiimage import MULTI_IMAGE_FIELDS
+from .neighbours import NeighbourIndex, similar
+from .prefilter import BlastocystFilter, BlastocystModel, assess, batch_features, stage_label, train
+from .preprocess import PreprocessConfig, Preprocessor
+from .prompt import API_ROOT, MODEL
+from .registry import RunRegistry
+from .report import ReportConfig, count_rows, read_rows, write_report
+from .roi import RoiDetector
+from .scheduler import RequestScheduler
+from .store import ResultStore
+from .timelapse import TimelapseConfig, extract_key_frames
+
+
+async def _grade(args: argparse.Namespace) -> int:
+    api_key = args.api_key or os.environ.get("GEMINI_API_KEY", "")
+    if not api_key:
+        print("error: pass --api-key or set GEMINI_API_KEY", file=sys.stderr)
+        return 2
+    if args.ensemble > 1 and args.cache:
+        print("error: --ensemble samples every image afresh and cannot use --cache", file=sys.stderr)
+        return 2
+    if args.images_per_request > 1 and (args.ensemble > 1 or args.stream):
+        print("error: --images-per-request cannot be combined with --ensemble or --stream", file=sys.stderr)
+        return 2
+    scheduler = None
+    if args.rpm or args.tpm or args.adaptive:
+        scheduler = RequestScheduler(
+            requests_per_minute=args.rpm,
+            tokens_per_minute=args.tpm,
+            initial_concurrency=min(args.concurrency, args.max_concurrency),
+            max_concurrency=args.max_concurrency,
+        )
+    preprocessor = detector = None
+    if args.preprocess or args.detect_roi:
+        config = PreprocessConfig(
+            max_edge=args.max_edge or None, grayscale=not args.color, jpeg_quality=args.jpeg_quality
+        )
+        preprocessor = Preprocessor(config, workers=args.workers)
+    if args.detect_roi:
+        detector = RoiDetector(workers=args.workers)
+    prefilter = BlastocystFilter.load(args.prefilter, workers=args.workers) if args.prefilter else None
+    cache = ResponseCache(args.cache, max_bytes=args.cache_size_mb * 1024 * 1024) if args.cache else None
+    fields = CSV_FIELDS + METRIC_FIELDS if args.metrics else CSV_FIELDS
+    ensemble = None
+    if args.ensemble > 1:
+        ensemble = EnsembleConfig(args.ensemble, min(args.ensemble_first, args.ensemble))
+        fields = fields + ENSEMBLE_FIELDS
+    if prefilter is not None:
+        fields = fields + PREFILTER_FIELDS
+    if args.images_per_request > 1 and args.metrics:
+        fields = fields + MULTI_IMAGE_FIELDS
+    duplicates = None
+    if args.dedup:
+        duplicates = find_duplicates(list(iter_jobs(args.source)), args.dedup_distance, args.dedup_hash, args.workers)
+        fields = fields + DEDUP_FIELDS
+        print(
+            f"dedup: {duplicates.images} images in {duplicates.clusters} clusters "
+            f"(ratio {duplicates.dedup_ratio:.2f}), {duplicates.duplicates} calls saved "
+            f"({duplicates.saved_calls:.0%}), hashed in {duplicates.elapsed:.1f}s"
+        )
+    store = ResultStore(args.store) if args.store else None
+    registry = RunRegistry(args.registry) if args.registry else None
+    try:
+        async with GeminiClient(api_key, model=args.model, api_root=args.api_root) as client:
+            # Concurrency counts requests; the grader admits images. A scheduler
+            # decides how many requests are in flight (at most --max-concurrency),
+            # so admission allows twice that many requests' worth of images,
+            # whatever the current limit, to keep the queue ahead of it.
+            admitted = args.concurrency if scheduler is None else 2 * args.max_concurrency
+            admitted *= args.images_per_request
+            grader = BatchGrader(
+                client,
+                concurrency=admitted,
+                cache=cache,
+                scheduler=scheduler,
+                streaming=args.stream,
+                preprocessor=preprocessor,
+                json_mode=args.json,
+                ensemble=ensemble,
+                prefilter_threshold=prefilter.threshold if prefilter is not None else None,
+                images_per_request=args.images_per_request,
+            )
+            jobs = iter_jobs(args.source) if duplicates is None else duplicates.representatives
+            if prefilter is not None:
+                jobs = prefilter.annotate(jobs)
+            with CSVResultWriter(args.out, fields) as writer:
+                sinks = [writer]
+                if store is not None:
+                    sinks.append(store)
+                if registry is not None:
+                    # Record what was actually sent: the multi-image prompt when images are packed.
+                    sent = grader.batcher if grader.batcher is not None else grader
+                    run_id = registry.start_run(args.model, sent.prompt, sent.generation_config, str(args.source))
+                    sinks.append(registry.recorder(run_id))
+                    print(f"registry run {run_id}")
+
+                def sink(row: dict) -> None:
+                    for each in sinks:
+                        each(row)
+                    if duplicates is not None:
+                        for member, gap in duplicates.members.pop(row["image_path"], []):
+                            sink(fan_out(row, member, gap))
+
+                stats = await grader.run(jobs if detector is None else detector.annotate(jobs), sink)
+    finally:
+        if store is not None:
+            store.close()
+        if registry is not None:
+            registry.close()
+        if cache is not None:
+            cache.close()
+        if preprocessor is not None:
+            preprocessor.close()
+        if detector is not None:
+            detector.close()
+        if prefilter is not None:
+            prefilter.close()
+    print(
+        f"graded {stats.completed}/{stats.submitted} images in {stats.elapsed:.1f}s "
+        f"({stats.images_per_second:.1f}/s), {stats.failed} failed; "
+        f"{stats.input_tokens} input / {stats.output_tokens} output tokens"
+    )
+    if ensemble is not None:
+        print(f"ensemble: {stats.samples} calls, {stats.samples_per_image:.2f} per image (at most {args.ensemble})")
+    if grader.batcher is not None:
+        batched = grader.batcher.stats
+        print(
+            f"multi-image: {batched.images} images in {batched.requests} requests "
+            f"({batched.images_per_request:.1f} per request), {batched.fallbacks} re-sent alone"
+        )
+    if duplicates is not None and duplicates.members:
+        orphans = sum(len(members) for members in duplicates.members.values())
+        print(f"dedup: {orphans} duplicates of images that failed were not graded")
+    if prefilter is not None:
+        print(
+            f"pre-filter: {stats.prefiltered} of {stats.completed} images ({stats.calls_avoided:.0%}) "
+            f"not sent, threshold {prefilter.threshold:.3f}"
+        )
+    if args.json:
+        print(f"JSON mode: {stats.json_fallbacks} responses fell back to text parsing")
+    if scheduler is not None:
+        sched = scheduler.stats
+        print(
+            f"scheduler: {sched.requests} requests, {sched.retries} retries, {sched.throttled} throttled, "
+            f"final concurrency {sched.concurrency_limit:.1f}, mean latency {sched.mean_latency:.2f}s"
+        )
+    if cache is not None:
+        print(
+            f"cache: {cache.stats.hits} hits, {cache.stats.misses} misses "
+            f"({cache.stats.hit_rate:.0%}), {cache.stats.evictions} evicted"
+        )
+    return 1 if stats.failed else 0
+
+
+def _store(args: argparse.Namespace) -> int:
+    with ResultStore(args.store) as store:
+        if args.action == "import":
+            count = store.import_csv(args.csv)
+            print(f"imported {count} rows; store now holds {len(store)} rows, {store.blob_count} distinct responses")
+        else:
+            count = store.export_csv(args.csv)
+            print(f"exported {count} rows to {args.csv}")
+    return 0
+
+
+def _registry(args: argparse.Namespace) -> int:
+    with RunRegistry(args.registry) as registry:
+        if args.action == "import":
+            run_id, count = registry.import_csv(args.target, model=args.model)
+            print(f"imported {count} rows as run {run_id}")
+        elif args.action == "runs":
+            for run in registry.runs():
+                started = time.strftime("%Y-%m-%d %H:%M", time.localtime(run["started_at"]))
+                print(f"{run['run_id']}  {started}  {run['model']}  prompt {run['prompt_hash']}  "
+                      f"{run['gradings']} gradings  {run['source']}")
+        else:
+            history = registry.history(args.target)
+            if not history:
+                print(f"no gradings recorded for {args.target}")
+            for entry in history:
+                started = time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["started_at"]))
+                print(f"{started}  {entry['grade']:<8} {entry['quality'] or '':<12} {entry['model']}  "
+                      f"prompt {entry['prompt_hash']}  run {entry['run_id']}")
+    return 0
+
+
+def _dedup(args: argparse.Namespace) -> int:
+    jobs = list(iter_jobs(args.source))
+    duplicates = find_duplicates(jobs, args.distance, args.hash, args.workers)
+    print(
+        f"{duplicates.images} images in {duplicates.clusters} clusters (dedup ratio {duplicates.dedup_ratio:.2f}); "
+        f"grading one per cluster saves {duplicates.duplicates} calls ({duplicates.saved_calls:.1%}); "
+        f"{duplicates.unreadable} unreadable; hashed in {duplicates.elapsed:.1f}s"
+    )
+    if args.csv:
+        with open(args.csv, "w", newline="", encoding="utf-8") as fh:
+            writer = csv.writer(fh)
+            writer.writerow(["image_name", "image_path", "duplicate_of", "hash_distance"])
+            for job in duplicates.representatives:
+                writer.writerow([job.image_name, job.image_path, "", 0])
+                for member, gap in duplicates.members.get(str(job.image_path), []):
+                    writer.writerow([member.image_name, member.image_path, job.image_name, gap])
+    return 0
+
+
+def _features(args: argparse.Namespace) -> int:
+    config = FeatureConfig(size=args.size)
+    try:
+        stats = extract_store_features(
+            args.store, args.base_dir, config, args.workers, args.batch_size, rebuild=args.rebuild
+        )
+    except ValueError as exc:
+        print(f"error: {exc}; pass --rebuild to start over", file=sys.stderr)
+        return 2
+    print(
+        f"features for {stats.computed} images in {stats.elapsed:.1f}s ({stats.images_per_second:.0f}/s), "
+        f"{stats.missing} missing, {stats.already_done} already done; "
+        f"{stats.rows} x {len(config.names())} float32 in {Path(args.store) / 'features.f32'}"
+    )
+    return 0
+
+
+def _keyframes(args: argparse.Namespace) -> int:
+    config = TimelapseConfig(key_frames=args.frames, size=args.size, batch_size=args.batch_size)
+
+    def report(result) -> None:
+        if result.error:
+            print(f"error: {result.name}: {result.error}", file=sys.stderr)
+        else:
+            logging.debug("%s: %d frames, key frames %s", result.name, result.frames, result.indices)
+
+    stats = extract_key_frames(args.source, args.out_dir, config, args.workers, report)
+    print(
+        f"{stats.sequences} sequences, {stats.frames} frames scored in {stats.elapsed:.1f}s "
+        f"({stats.frames_per_second:.0f} frames/s); {stats.key_frames} key frames, "
+        f"{stats.calls_per_embryo:.1f} calls per embryo instead of "
+        f"{stats.frames / max(stats.sequences - stats.failed, 1):.0f}; {stats.failed} failed"
+    )
+    print(f"grade them with: python -m embryograding grade {Path(args.out_dir) / 'manifest.csv'}")
+    return 1 if stats.failed else 0
+
+
+def _fuse(args: argparse.Namespace) -> int:
+    config = FusionConfig(window=args.window, tile_rows=args.tile_rows)
+
+    def report(result) -> None:
+        if result.error:
+            print(f"error: {result.name}: {result.error}", file=sys.stderr)
+
+    stats = fuse_stacks(args.source, args.out_dir, config, args.workers, report)
+    print(
+        f"fused {stats.stacks - stats.failed}/{stats.stacks} stacks ({stats.planes} planes) in {stats.elapsed:.1f}s "
+        f"({stats.stacks_per_second:.1f} stacks/s); {stats.failed} failed"
+    )
+    print(f"grade them with: python -m embryograding grade {Path(args.out_dir) / 'manifest.csv'}")
+    return 1 if stats.failed else 0
+
+
+def _index(args: argparse.Namespace) -> int:
+    started = time.perf_counter()
+    index = NeighbourIndex.build_from_store(args.store, args.kind, lists=args.lists, nprobe=args.nprobe)
+    print(f"indexed {len(index)} images ({index.kind}) in {time.perf_counter() - started:.1f}s into {index.path}")
+    return 0
+
+
+def _similar(args: argparse.Namespace) -> int:
+    exclude = None
+    if Path(args.query).is_file():
+        values, ok = describe_images([args.query], FeatureMatrix.open(args.store).config)
+        if not ok[0]:
+            print(f"error: cannot read {args.query}", file=sys.stderr)
+            return 2
+        query = values[0]
+    else:
+        with ResultStore(args.store) as store:
+            names = store.column("image_name")
+        if args.query not in names:
+            print(f"error: {args.query} is neither an image file nor an image in {args.store}", file=sys.stderr)
+            return 2
+        exclude = names.index(args.query)
+        query = FeatureMatrix.open(args.store).matrix[exclude]
+    index = NeighbourIndex(Path(args.store) / "index", nprobe=args.nprobe)
+    registry = RunRegistry(args.registry) if args.registry else None
+    try:
+        started = time.perf_counter()
+        neighbours = similar(args.store, query, args.k, index, exclude, registry)
+        elapsed = time.perf_counter() - started
+    finally:
+        if registry is not None:
+            registry.close()
+    for neighbour in neighbours:
+        experts = f"  expert {', '.join(neighbour.expert_grades)}" if neighbour.expert_grades else ""
+        print(f"{neighbour.distance:8.3f}  {neighbour.gardner_grade:<8} {neighbour.image_name}{experts}")
+    print(f"{len(neighbours)} neighbours in {1000 * elapsed:.1f} ms")
+    if args.json:
+        data = [neighbour.to_dict() for neighbour in neighbours]
+        Path(args.json).write_text(json.dumps(data, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+def _prefilter(args: argparse.Namespace) -> int:
+    jobs = list(iter_jobs(args.source))
+    if args.action == "train":
+        jobs = [job for job in jobs if stage_label(job.image_name) is not None]
+        if not jobs:
+            print("error: no D3_/D5_ style image names to take stage labels from", file=sys.stderr)
+            return 2
+        size = args.size
+    else:
+        model = BlastocystModel.load(args.model)
+        size = model.size
+    started = time.perf_counter()
+    features = batch_features([job.image_path for job in jobs], size, args.workers)
+    elapsed = time.perf_counter() - started
+    print(f"features for {len(jobs)} images in {elapsed:.1f}s ({1000 * elapsed / max(len(jobs), 1):.2f} ms/image)")
+    if args.action == "train":
+        rng = random.Random(0)
+        held_out = [i for i in range(len(jobs)) if rng.random() < args.holdout]
+        fit = sorted(set(range(len(jobs))) - set(held_out))
+        model = train(features[fit], [stage_label(jobs[i].image_name) for i in fit], args.recall, size=size)
+        model.save(args.model)
+        print(f"trained on {model.trained_on} images, threshold {model.threshold:.3f}; saved {args.model}")
+        if not held_out:
+            return 0
+        jobs = [jobs[i] for i in held_out]
+        features = features[held_out]
+        print(f"held out {len(jobs)} images:")
+    names = [job.image_name for job in jobs]
+    report = assess(model.scores(features), model.threshold, names, [job.actual_class for job in jobs])
+    print(f"  calls avoided          {report.skipped}/{report.images} ({report.calls_avoided:.1%})")
+    if report.unreadable:
+        print(f"  unreadable, sent       {report.unreadable}")
+    print(
+        f"  false negatives, stage {report.stage_false_negatives}/{report.stage_positives} day-5 images "
+        f"({report.stage_false_negative_rate:.1%})"
+    )
+    print(
+        f"  false negatives, class {report.class_false_negatives}/{report.class_positives} with actual_class 1 "
+        f"({report.false_negative_rate:.1%})"
+    )
+    if args.json:
+        Path(args.json).write_text(json.dumps(report.to_dict(), indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+def _reviews(args: argparse.Namespace) -> int:
+    with RunRegistry(args.registry) as registry:
+        for path in args.files:
+            count = registry.import_reviews(path)
+            print(f"imported {count} reviews from {path}")
+        agreement = collections.Counter(review["agree"] or "-" for review in registry.reviews())
+    summary = ", ".join(f"{agree} {count}" for agree, count in sorted(agreement.items()))
+    print(f"registry holds {sum(agreement.values())} reviews (agree: {summary or 'none'})")
+    return 0
+
+
+def _evaluate(args: argparse.Namespace) -> int:
+    labels, grades = load_results(args.results)
+    result = evaluate(labels, grades, args.min_expansion, args.replicates)
+    summary: dict = {"ground_truth": result.to_dict()}
+    (tn, fp), (fn, tp) = result.confusion
+    print(
+        f"{result.rows} rows with actual_class ({result.excluded} without), "
+        f"positive = expansion >= {args.min_expansion}; {result.confidence:.0%} bootstrap CIs"
+    )
+    print(f"  confusion    tn {tn}  fp {fp}  fn {fn}  tp {tp}")
+    for name in ("accuracy", "sensitivity", "specificity", "kappa", "auc"):
+        print(f"  {name:<12} {getattr(result, name)}")
+    if args.registry:
+        with RunRegistry(args.registry) as registry:
+            reviews = [review for review in registry.reviews(args.run_id) if review["expert_grade"]]
+        ai = encode_grades(review["ai_grade"] or "" for review in reviews)
+        expert = encode_grades(review["expert_grade"] for review in reviews)
+        agreements = grade_agreement(ai, expert, args.replicates)
+        summary["expert_agreement"] = [agreement.to_dict() for agreement in agreements]
+        print(f"AI vs expert grades, {len(reviews)} reviews")
+        for agreement in agreements:
+            print(
+                f"  {agreement.component:<10} {agreement.pairs} pairs  exact {agreement.exact}  "
+                f"kappa {agreement.kappa}  quadratic {agreement.quadratic_kappa}"
+            )
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary, indent=2) + "\n", encoding="utf-8")
+    return 0
+
+
+def _interobserver_summary(path: str, run_ids: list[str] | None, experts: bool):
+    with RunRegistry(path) as registry:
+        matrix = RatingMatrix.from_ratings(registry_ratings(registry, run_ids, experts))
+    return analyse(matrix)
+
+
+def _interobserver(args: argparse.Namespace) -> int:
+    summary = _interobserver_summary(args.registry, args.run, not args.no_experts)
+    print(f"{len(summary.raters)} raters, {summary.items} images, {summary.ratings} grades")
+    for component in summary.components:
+        print(
+            f"  {component.component:<10} Fleiss' kappa {component.fleiss_kappa:6.3f}  "
+            f"Krippendorff's alpha (ordinal) {component.krippendorff_alpha:6.3f}  "
+            f"{component.items} images rated twice or more"
+        )
+    if args.json:
+        Path(args.json).write_text(json.dumps(summary.to_dict(), indent=2) + "\n", encoding="utf-8")
+    if args.html:
+        Path(args.html).write_text(render_section(summary), encoding="utf-8")
+    return 0
+
+
+def _report(args: argparse.Namespace) -> int:
+    config = ReportConfig(thumb_edge=args.thumb_edge, thumb_format=args.thumb_format, run_id=args.run_id)
+    rows = read_rows(args.results)
+    sections = []
+    if args.interobserver:
+        sections.append(render_section(_interobserver_summary(args.interobserver, None, True)))
+    stats = write_report(
+        rows,
+        args.out,
+        config,
+        workers=args.workers,
+        base_dir=args.base_dir,
+        total=count_rows(args.results),
+        page_size=args.page_size or None,
+        incremental=args.incremental,
+        sections=sections,
+    )
+    pages = f" on {stats.pages} pages" if stats.pages else ""
+    if stats.rendered < stats.cards:
+        pages += f" ({stats.rendered} re-rendered, {stats.pages_written} pages rewritten)"
+    print(
+        f"wrote {stats.cards} cards{pages} to {args.out} in {stats.elapsed:.1f}s "
+        f"({stats.html_bytes / 1024:.0f} KB HTML, {stats.missing_images} images missing)"
+    )
+    return 0
+
+
+async def _mock_server(args: argparse.Namespace) -> int:
+    server = MockGeminiServer(
+        args.host,
+        args.port,
+        latency=args.latency,
+        throttle_rate=args.throttle_rate,
+        max_concurrent=args.max_concurrent,
+        retry_after=args.retry_after,
+        token_latency=args.token_latency,
+        sample_noise=args.sample_noise,
+        drop_block_rate=args.drop_block_rate,
+    )
+    await server.start()
+    print(f"mock Gemini API listening on {server.api_root}")
+    try:
+        await server.serve_forever()
+    finally:
+        await server.stop()
+    return 0
+
+
+def main(argv: list[str] | None = None) -> int:
+    parser = argparse.ArgumentParser(prog="python -m embryograding")
+    parser.add_argument("-v", "--verbose", action="store_true")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    grade = commands.add_parser("grade", help="grade a directory or manifest CSV of images")
+    grade.add_argument("source", help="image directory or CSV manifest with an image_path column")
+    grade.add_argument("-o", "--out", default="verification_results.csv")
+    grade.add_argument("-c", "--concurrency", type=int, default=8)
+    grade.add_argument("--api-key")
+    grade.add_argument("--api-root", default=API_ROOT)
+    grade.add_argument("--model", default=MODEL)
+    grade.add_argument("--cache", help="path of an on-disk response cache (SQLite) to reuse across runs")
+    grade.add_argument("--cache-size-mb", type=int, default=256)
+    grade.add_argument("--rpm", type=float, help="requests-per-minute budget")
+    grade.add_argument("--tpm", type=float, help="input tokens-per-minute budget")
+    grade.add_argument(
+        "--adaptive", action="store_true", help="adapt concurrency and retry 429/503 even without budgets"
+    )
+    grade.add_argument(
+        "--max-concurrency",
+        type=int,
+        default=64,
+        help="with a scheduler, most requests in flight; twice this many requests' images are admitted",
+    )
+    grade.add_argument(
+        "--stream", action="store_true", help="stream large images into the request body instead of buffering"
+    )
+    grade.add_argument("--store", help="also append results to a columnar results store directory")
+    grade.add_argument("--registry", help="record this run in a SQLite run registry")
+    grade.add_argument("--json", action="store_true", help="request structured JSON output instead of labelled text")
+    grade.add_argument(
+        "--ensemble", type=int, default=1, metavar="K", help="sample each image up to K times and vote per component"
+    )
+    grade.add_argument(
+        "--ensemble-first", type=int, default=3, help="samples sent at once before checking whether the vote is decided"
+    )
+    grade.add_argument("--metrics", action="store_true", help="add per-image bytes, latency and token columns")
+    grade.add_argument("--preprocess", action="store_true", help="downsize and re-encode images before upload")
+    grade.add_argument("--max-edge", type=int, default=512, help="target long edge in pixels (0 keeps size)")
+    grade.add_argument("--color", action="store_true", help="keep colour instead of converting to grayscale")
+    grade.add_argument("--jpeg-quality", type=int, default=85)
+    grade.add_argument(
+        "--detect-roi",
+        action="store_true",
+        help="find the embryo in each frame and crop to it (implies --preprocess; needs NumPy)",
+    )
+    grade.add_argument(
+        "--prefilter", metavar="MODEL", help="skip images a local pre-filter model scores as non-blastocysts"
+    )
+    grade.add_argument(
+        "--dedup", action="store_true", help="grade one image per cluster of near-duplicates and copy its row"
+    )
+    grade.add_argument("--dedup-distance", type=int, default=4, help="max differing hash bits for a near-duplicate")
+    grade.add_argument("--dedup-hash", choices=HASH_KINDS, default="phash")
+    grade.add_argument(
+        "--images-per-request",
+        type=int,
+        default=1,
+        metavar="N",
+        help="pack N images into each request (the prompt is sent once); -c then counts requests",
+    )
+    grade.add_argument("--workers", type=int, help="preprocessing processes (default: CPU count)")
+
+    store = commands.add_parser("store", help="import a results CSV into a results store, or export one")
+    store.add_argument("action", choices=["import", "export"])
+    store.add_argument("store", help="results store directory")
+    store.add_argument("csv", help="results CSV to read (import) or write (export)")
+
+    registry = commands.add_parser("registry", help="import results into, or query, a run registry")
+    registry.add_argument("action", choices=["import", "runs", "history"])
+    registry.add_argument("registry", help="run registry database")
+    registry.add_argument("target", nargs="?", help="results CSV (import) or image name / SHA-256 (history)")
+    registry.add_argument("--model", default=MODEL, help="model that produced an imported CSV")
+
+    report = commands.add_parser("report", help="write an expert verification report with image thumbnails")
+    report.add_argument("results", help="results CSV or results store directory")
+    report.add_argument("-o", "--out", default="report", help="output directory")
+    report.add_argument("--base-dir", default=".", help="directory relative image paths are resolved against")
+    report.add_argument(
+        "--page-size", type=int, default=100, help="cards per page, with a searchable index page (0: one page)"
+    )
+    report.add_argument(
+        "--incremental", action="store_true", help="only re-render cards that changed since the last report"
+    )
+    report.add_argument("--run-id", default="", help="registry run the results belong to, recorded with reviews")
+    report.add_argument(
+        "--interobserver", metavar="REGISTRY", help="add inter-observer agreement from a run registry to the summary"
+    )
+    report.add_argument("--thumb-edge", type=int, default=400)
+    report.add_argument("--thumb-format", choices=["webp", "jpeg"], default="webp")
+    report.add_argument("--workers", type=int, help="thumbnail processes (default: CPU count)")
+
+    evaluation = commands.add_parser("evaluate", help="agreement of AI grades with actual_class and expert reviews")
+    evaluation.add_argument("results", help="results CSV or results store directory")
+    evaluation.add_argument("--replicates", type=int, default=1000, help="bootstrap replicates for the CIs")
+    evaluation.add_argument(
+        "--min-expansion", type=int, default=3, help="grades with at least this expansion predict actual_class 1"
+    )
+    evaluation.add_argument("--registry", help="also compare AI and expert grades reviewed in this run registry")
+    evaluation.add_argument("--run-id", help="only reviews of this run")
+    evaluation.add_argument("--json", help="also write the metrics to this JSON file")
+
+    observers = commands.add_parser(
+        "interobserver", help="agreement among experts and repeated AI runs recorded in a run registry"
+    )
+    observers.add_argument("registry", help="run registry database")
+    observers.add_argument("--run", action="append", help="only these runs as AI raters (repeatable; default all)")
+    observers.add_argument("--no-experts", action="store_true", help="leave out expert reviews")
+    observers.add_argument("--json", help="write the summary, with both heatmaps, to this JSON file")
+    observers.add_argument("--html", help="write the report section to this HTML file")
+
+    dedup = commands.add_parser("dedup", help="find near-duplicate images by perceptual hash")
+    dedup.add_argument("source", help="image directory or CSV manifest")
+    dedup.add_argument("--distance", type=int, default=4, help="max differing hash bits for a near-duplicate")
+    dedup.add_argument("--hash", choices=HASH_KINDS, default="phash")
+    dedup.add_argument("--csv", help="write every image with the representative it duplicates to this CSV")
+    dedup.add_argument("--workers", type=int, help="hashing processes (default: CPU count)")
+
+    features = commands.add_parser(
+        "features", help="compute image descriptors for every row of a results store (resumable)"
+    )
+    features.add_argument("store", help="results store directory; features are written next to its rows")
+    features.add_argument("--base-dir", default=".", help="directory relative image paths are resolved against")
+    features.add_argument("--size", type=int, default=128, help="working frame edge for the descriptors")
+    features.add_argument("--batch-size", type=int, default=64, help="images per worker task")
+    features.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    features.add_argument("--rebuild", action="store_true", help="discard existing features and start over")
+
+    keyframes = commands.add_parser(
+        "keyframes", help="pick the sharpest frames of time-lapse recordings and write a manifest for grade"
+    )
+    keyframes.add_argument("source", help="directory of recordings: frame sub-directories, stack files or videos")
+    keyframes.add_argument("out_dir", help="where key frames and manifest.csv are written")
+    keyframes.add_argument("--frames", type=int, default=3, help="key frames (grading calls) per embryo")
+    keyframes.add_argument("--size", type=int, default=256, help="working frame edge for focus scoring")
+    keyframes.add_argument("--batch-size", type=int, default=32, help="frames scored together")
+    keyframes.add_argument("--workers", type=int, help="recordings processed in parallel (default: CPU count)")
+
+    fuse = commands.add_parser("fuse", help="fuse focal-plane stacks into all-in-focus images for grade")
+    fuse.add_argument("source", help="directory of stacks: plane sub-directories or multi-page TIFFs")
+    fuse.add_argument("out_dir", help="where fused images and manifest.csv are written")
+    fuse.add_argument("--window", type=int, default=9, help="focus comparison window in pixels")
+    fuse.add_argument("--tile-rows", type=int, default=256, help="rows of every plane held in memory at once")
+    fuse.add_argument("--workers", type=int, help="stacks fused in parallel (default: CPU count)")
+
+    index = commands.add_parser("index", help="build a nearest-neighbour index over a results store's features")
+    index.add_argument("store", help="results store directory with computed features")
+    index.add_argument(
+        "--kind", choices=["auto", "exact", "ivfpq"], default="auto", help="exact brute force, or approximate IVF-PQ"
+    )
+    index.add_argument("--lists", type=int, help="IVF cells (default: about 4 * sqrt(rows))")
+    index.add_argument("--nprobe", type=int, default=24, help="IVF cells scanned per query by default")
+
+    neighbours = commands.add_parser("similar", help="the most similar previously graded embryos")
+    neighbours.add_argument("store", help="results store directory with a built index")
+    neighbours.add_argument("query", help="image name in the store, or an image file")
+    neighbours.add_argument("-k", type=int, default=10, help="neighbours to return")
+    neighbours.add_argument("--nprobe", type=int, help="IVF cells to scan (default: as built)")
+    neighbours.add_argument("--registry", help="add expert grades from this run registry")
+    neighbours.add_argument("--json", help="also write the neighbours to this JSON file")
+
+    prefilter = commands.add_parser(
+        "prefilter", help="train or evaluate the local blastocyst pre-filter on D3_/D5_ named images"
+    )
+    prefilter.add_argument("action", choices=["train", "evaluate"])
+    prefilter.add_argument("source", help="image directory or CSV manifest (actual_class is used when present)")
+    prefilter.add_argument("model", help="model JSON file to write (train) or read (evaluate)")
+    prefilter.add_argument(
+        "--recall", type=float, default=0.98, help="share of training blastocysts the threshold must keep"
+    )
+    prefilter.add_argument("--holdout", type=float, default=0.2, help="fraction of images kept out of training")
+    prefilter.add_argument("--size", type=int, default=96, help="working frame edge for the features")
+    prefilter.add_argument("--workers", type=int, help="feature extraction processes (default: CPU count)")
+    prefilter.add_argument("--json", help="also write the routing metrics to this JSON file")
+
+    reviews = commands.add_parser("reviews", help="load expert reviews exported from a report into a run registry")
+    reviews.add_argument("registry", help="run registry database")
+    reviews.add_argument("files", nargs="+", help="review JSON files downloaded from the report")
+
+    mock = commands.add_parser("mock-server", help="run a local stand-in for the Gemini API")
+    mock.add_argument("--host", default="127.0.0.1")
+    mock.add_argument("--port", type=int, default=8765)
+    mock.add_argument("--latency", type=float, default=0.5, help="seconds to wait before answering")
+    mock.add_argument("--token-latency", type=float, default=0.0, help="extra seconds per output token")
+    mock.add_argument("--throttle-rate", type=float, default=0.0, help="fraction of requests answered with 429")
+    mock.add_argument("--max-concurrent", type=int, help="answer 429 beyond this many requests in flight")
+    mock.add_argument(
+        "--sample-noise", type=float, default=0.0, help="fraction of answers replaced by a random grade"
+    )
+    mock.add_argument("--retry-after", type=float, help="Retry-After seconds sent with 429s")
+    mock.add_argument(
+        "--drop-block-rate", type=float, default=0.0, help="fraction of images left out of multi-image answers"
+    )
+
+    args = parser.parse_args(argv)
+    logging.basicConfig(level=logging.DEBUG if args.verbose else logging.INFO, format="%(levelname)s %(message)s")
+    if args.command == "store":
+        return _store(args)
+    if args.command == "report":
+        return _report(args)
+    if args.command == "interobserver":
+        return _interobserver(args)
+    if args.command == "evaluate":
+        return _evaluate(args)
+    if args.command == "reviews":
+        return _reviews(args)
+    if args.command == "dedup":
+        return _dedup(args)
+    if args.command == "features":
+        return _features(args)
+    if args.command == "keyframes":
+        return _keyframes(args)
+    if args.command == "fuse":
+        return _fuse(args)
+    if args.command == "index":
+        return _index(args)
+    if args.command == "similar":
+        return _similar(args)
+    if args.command == "prefilter":
+        return _prefilter(args)
+    if args.command == "registry":
+        if args.action != "runs" and not args.target:
+            parser.error(f"registry {args.action} needs a target")
+        return _registry(args)
+    handler = {"grade": _grade, "mock-server": _mock_server}[args.command]
+    try:
+        return asyncio.run(handler(args))
+    except KeyboardInterrupt:
+        return 130
+
+
+if __name__ == "__main__":
+    sys.exit(main())
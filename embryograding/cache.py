@@ -0,0 +1,164 @@
+"""Content-addressed on-disk cache of Gemini responses.
+
+Entries are keyed by a hash of the raw image bytes, the exact prompt text,
+the model name and the ``generationConfig``, so re-running a batch with an
+unchanged prompt never touches the network, while any change to the prompt
+or sampling settings misses and regrades.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import json
+import sqlite3
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Sequence
+
+from .prompt import GENERATION_CONFIG
+
+
+def cache_key(
+    image_bytes: bytes | memoryview,
+    prompt: str,
+    model: str,
+    generation_config: dict[str, Any] | None = None,
+    variant: str = "",
+) -> str:
+    """Return the hex cache key for one grading request.
+
+    ``variant`` distinguishes different transforms of the same source image
+    (see :meth:`PreprocessConfig.fingerprint`), so changing the
+    preprocessing settings does not return stale responses.
+    """
+    config = GENERATION_CONFIG if generation_config is None else generation_config
+    parts = [
+        hashlib.sha256(image_bytes).digest(),
+        prompt.encode("utf-8"),
+        model.encode("utf-8"),
+        json.dumps(config, sort_keys=True, separators=(",", ":")).encode("utf-8"),
+    ]
+    if variant:
+        parts.append(variant.encode("utf-8"))
+    digest = hashlib.sha256()
+    for part in parts:
+        # Length-prefix each component so no two inputs can collide by
+        # shifting bytes across a boundary.
+        digest.update(len(part).to_bytes(8, "big"))
+        digest.update(part)
+    return digest.hexdigest()
+
+
+@dataclass
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    entries: int = 0
+    size_bytes: int = 0
+
+    @property
+    def hit_rate(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+class ResponseCache:
+    """A size-bounded LRU cache of ``full_response`` text stored in SQLite.
+
+    ``max_bytes`` bounds the total size of stored responses; once exceeded,
+    the least recently used entries are evicted.
+    """
+
+    def __init__(self, path: str | Path, max_bytes: int = 256 * 1024 * 1024) -> None:
+        self.path = Path(path)
+        self.max_bytes = max_bytes
+        self.stats = CacheStats()
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY,"
+            " response TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " last_used REAL NOT NULL)"
+        )
+        self._db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses(last_used)")
+        entries, size = self._db.execute("SELECT COUNT(*), COALESCE(SUM(size), 0) FROM responses").fetchone()
+        self.stats.entries = entries
+        self.stats.size_bytes = size
+
+    def __enter__(self) -> "ResponseCache":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._db.close()
+
+    def get(self, key: str) -> str | None:
+        """Return the cached response for ``key``, or ``None`` on a miss."""
+        row = self._db.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return row[0]
+
+    def get_first(self, keys: Sequence[str]) -> str | None:
+        """Return the response for the first of ``keys`` that is cached; one hit or miss either way."""
+        placeholders = ",".join("?" * len(keys))
+        found = dict(self._db.execute(f"SELECT key, response FROM responses WHERE key IN ({placeholders})", keys))
+        key = next((key for key in keys if key in found), None)
+        if key is None:
+            self.stats.misses += 1
+            return None
+        self.stats.hits += 1
+        self._db.execute("UPDATE responses SET last_used = ? WHERE key = ?", (time.time(), key))
+        return found[key]
+
+    def put(self, key: str, response: str) -> None:
+        """Store ``response`` under ``key`` and evict down to ``max_bytes``."""
+        size = len(response.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._db:
+            self._db.execute("BEGIN")
+            old = self._db.execute("SELECT size FROM responses WHERE key = ?", (key,)).fetchone()
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, response, size, last_used) VALUES (?, ?, ?, ?)",
+                (key, response, size, time.time()),
+            )
+            if old is None:
+                self.stats.entries += 1
+                self.stats.size_bytes += size
+            else:
+                self.stats.size_bytes += size - old[0]
+            if self.stats.size_bytes > self.max_bytes:
+                self._evict()
+
+    def _evict(self) -> None:
+        excess = self.stats.size_bytes - self.max_bytes
+        freed = evicted = 0
+        while freed < excess:
+            oldest = self._db.execute("SELECT key, size FROM responses ORDER BY last_used LIMIT 64").fetchall()
+            if not oldest:
+                break
+            for key, size in oldest:
+                if freed >= excess:
+                    break
+                self._db.execute("DELETE FROM responses WHERE key = ?", (key,))
+                freed += size
+                evicted += 1
+        self.stats.size_bytes -= freed
+        self.stats.entries -= evicted
+        self.stats.evictions += evicted
+
+    def clear(self) -> None:
+        self._db.execute("DELETE FROM responses")
+        self.stats.entries = self.stats.size_bytes = 0
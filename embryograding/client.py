@@ -0,0 +1,89 @@
+"""Async Gemini ``generateContent`` client."""
+
+from __future__ import annotations
+
+import json
+from typing import Any
+
+from .prompt import API_ROOT, MODEL, generate_content_url
+from .streaming import StreamingBody
+from .transport import Body, ConnectionPool, Response
+
+
+class GeminiAPIError(Exception):
+    """A non-2xx response from the Gemini API.
+
+    ``message`` carries ``error.message`` from the response body, which is
+    what the browser app surfaces to the user.
+    """
+
+    def __init__(self, status: int, message: str, headers: dict[str, str] | None = None) -> None:
+        super().__init__(f"HTTP {status}: {message}")
+        self.status = status
+        self.message = message
+        self.headers = headers or {}
+
+
+def response_text(data: dict[str, Any]) -> str:
+    """Return ``candidates[0].content.parts[0].text`` from a response."""
+    try:
+        return data["candidates"][0]["content"]["parts"][0]["text"]
+    except (KeyError, IndexError, TypeError):
+        raise GeminiAPIError(200, "response has no candidate text") from None
+
+
+def encode_request(body: dict[str, Any]) -> bytes:
+    """Serialise a request body the way it is sent on the wire."""
+    return json.dumps(body, separators=(",", ":")).encode("utf-8")
+
+
+class GeminiClient:
+    """Thin async wrapper around the ``generateContent`` endpoint."""
+
+    def __init__(
+        self,
+        api_key: str,
+        model: str = MODEL,
+        api_root: str = API_ROOT,
+        pool: ConnectionPool | None = None,
+        timeout: float = 120.0,
+    ) -> None:
+        self.api_key = api_key
+        self.model = model
+        self.url = generate_content_url(model, api_root)
+        self._owns_pool = pool is None
+        self.pool = pool if pool is not None else ConnectionPool(timeout=timeout)
+
+    async def __aenter__(self) -> "GeminiClient":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        if self._owns_pool:
+            await self.pool.close()
+
+    def _headers(self) -> dict[str, str]:
+        return {"Content-Type": "application/json", "x-goog-api-key": self.api_key}
+
+    async def generate_content(self, body: dict[str, Any] | bytes | StreamingBody) -> dict[str, Any]:
+        """POST ``body`` and return the decoded JSON response.
+
+        ``body`` is the request as a dict, already-encoded JSON bytes, or a
+        :class:`StreamingBody` written to the socket without being
+        serialised up front.
+        """
+        payload: Body = encode_request(body) if isinstance(body, dict) else body
+        response = await self.pool.request("POST", self.url, payload, self._headers())
+        return _decode(response)
+
+
+def _decode(response: Response) -> dict[str, Any]:
+    if not response.ok:
+        try:
+            message = response.json()["error"]["message"]
+        except (ValueError, KeyError, TypeError):
+            message = "API request failed"
+        raise GeminiAPIError(response.status, message, response.headers)
+    return response.json()
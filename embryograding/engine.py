@@ -0,0 +1,487 @@
+"""Asyncio batch grading engine.
+
+Grades a directory or manifest of embryo images with up to ``concurrency``
+``generateContent`` requests in flight, handing each row to a sink as soon
+as its response arrives. Rows use the same columns as
+``verification_results/verification_results.csv``.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import csv
+import hashlib
+import logging
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, AsyncIterable, AsyncIterator, Callable, Iterable, Iterator, TextIO
+
+from .cache import ResponseCache, cache_key
+from .client import GeminiAPIError, GeminiClient, encode_request, response_text
+from .ensemble import EnsembleConfig, combine, decided, tally
+from .multiimage import ImageBatcher
+from .parser import ResponseValidationError, parse_json_response, parse_response
+from .preprocess import Box, Preprocessor
+from .prompt import (
+    GARDNER_PROMPT,
+    JSON_PROMPT,
+    MIME_TYPES,
+    build_request_body,
+    estimate_input_tokens,
+    json_generation_config,
+    mime_type_for,
+)
+from .scheduler import RequestScheduler
+from .streaming import MappedImage, StreamingBody, streaming_request_body
+from .transport import TransportError
+
+log = logging.getLogger(__name__)
+
+CSV_FIELDS = [
+    "image_name",
+    "actual_class",
+    "gardner_grade",
+    "expansion",
+    "icm_quality",
+    "te_quality",
+    "quality_score",
+    "explanation",
+    "full_response",
+    "image_path",
+]
+
+# Per-image measurements added by BatchGrader.grade; written only when a
+# CSVResultWriter is asked for them.
+METRIC_FIELDS = ["bytes_sent", "latency_s", "cached", "input_tokens", "output_tokens", "parsed_as", "image_sha256"]
+
+# Added when a local pre-filter scored the images (see embryograding.prefilter).
+PREFILTER_FIELDS = ["blastocyst_score"]
+
+Row = dict[str, Any]
+
+
+@dataclass(frozen=True)
+class ImageJob:
+    image_path: Path
+    image_name: str
+    actual_class: str = ""
+    roi: Box | None = None
+    blastocyst_score: float | None = None
+
+
+def parse_roi(value: str | None) -> Box | None:
+    """Parse an ``"x0 y0 x1 y1"`` manifest cell into a box."""
+    if not value:
+        return None
+    x0, y0, x1, y1 = (int(float(v)) for v in value.replace(",", " ").split())
+    return x0, y0, x1, y1
+
+
+def iter_jobs(source: str | Path) -> Iterator[ImageJob]:
+    """Yield jobs for every image in a directory or listed in a CSV manifest.
+
+    A manifest needs an ``image_path`` column; ``image_name``,
+    ``actual_class`` and ``roi`` (``"x0 y0 x1 y1"`` embryo bounding box) are
+    used when present, so a previous results CSV can be fed straight back
+    in. Relative paths are tried against the current directory first and
+    then the manifest's own directory.
+    """
+    source = Path(source)
+    if source.is_dir():
+        for path in sorted(source.iterdir()):
+            if path.suffix.lower() in MIME_TYPES:
+                yield ImageJob(path, path.name)
+        return
+
+    with source.open(newline="", encoding="utf-8") as fh:
+        for record in csv.DictReader(fh):
+            path = Path(record["image_path"])
+            if not path.is_absolute() and not path.exists():
+                path = source.parent / path
+            yield ImageJob(
+                path,
+                record.get("image_name") or path.name,
+                record.get("actual_class", ""),
+                parse_roi(record.get("roi")),
+            )
+
+
+class CSVResultWriter:
+    """Append rows to a results CSV, flushing after every row."""
+
+    def __init__(self, path: str | Path, fields: list[str] | None = None) -> None:
+        self.path = Path(path)
+        self.fields = fields or CSV_FIELDS
+        self._fh: TextIO | None = None
+        self._writer: csv.DictWriter | None = None
+
+    def __enter__(self) -> "CSVResultWriter":
+        self._fh = self.path.open("w", newline="", encoding="utf-8")
+        self._writer = csv.DictWriter(self._fh, fieldnames=self.fields, extrasaction="ignore")
+        self._writer.writeheader()
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._fh = None
+
+    def __call__(self, row: Row) -> None:
+        assert self._writer is not None and self._fh is not None, "writer is not open"
+        self._writer.writerow(row)
+        self._fh.flush()
+
+
+@dataclass
+class BatchStats:
+    submitted: int = 0
+    completed: int = 0
+    failed: int = 0
+    elapsed: float = 0.0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    json_fallbacks: int = 0
+    samples: int = 0
+    prefiltered: int = 0
+    errors: list[tuple[str, str]] = field(default_factory=list)
+
+    @property
+    def images_per_second(self) -> float:
+        return self.completed / self.elapsed if self.elapsed else 0.0
+
+    @property
+    def samples_per_image(self) -> float:
+        return self.samples / self.completed if self.completed else 0.0
+
+    @property
+    def calls_avoided(self) -> float:
+        return self.prefiltered / self.completed if self.completed else 0.0
+
+
+def build_row(job: ImageJob, text: str, json_mode: bool = False) -> Row:
+    """Turn a model response into a results row.
+
+    In JSON mode the response is decoded as JSON, falling back to the text
+    parser when that fails; ``parsed_as`` records which one was used.
+    """
+    result = None
+    parsed_as = "text"
+    if json_mode:
+        try:
+            result = parse_json_response(text)
+            parsed_as = "json"
+        except ResponseValidationError as exc:
+            log.debug("%s: JSON response unusable (%s), falling back to text parsing", job.image_name, exc)
+    if result is None:
+        result = parse_response(text)
+    parsed = result.as_fields()
+    return {
+        "image_name": job.image_name,
+        "actual_class": job.actual_class,
+        "gardner_grade": parsed["grade"],
+        "expansion": parsed["expansion"],
+        "icm_quality": parsed["icm"],
+        "te_quality": parsed["te"],
+        "quality_score": parsed["quality"],
+        "explanation": parsed["explanation"],
+        "full_response": text,
+        "image_path": str(job.image_path),
+        "parsed_as": parsed_as,
+    }
+
+
+def prefiltered_row(job: ImageJob, threshold: float) -> Row:
+    """The results row of an image the local pre-filter kept from the grader."""
+    return {
+        "image_name": job.image_name,
+        "actual_class": job.actual_class,
+        "gardner_grade": "N/A",
+        "expansion": "N/A",
+        "icm_quality": "N/A",
+        "te_quality": "N/A",
+        "quality_score": "Not assessed",
+        "explanation": (
+            f"Not sent for grading: local pre-filter blastocyst score {job.blastocyst_score:.3f} "
+            f"is below {threshold:.3f}."
+        ),
+        "full_response": "",
+        "image_path": str(job.image_path),
+        "parsed_as": "prefilter",
+        "bytes_sent": 0,
+        "cached": False,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "image_sha256": "",
+        "samples": 0,
+        "blastocyst_score": job.blastocyst_score,
+    }
+
+
+class BatchGrader:
+    """Grade many images concurrently through one :class:`GeminiClient`.
+
+    With ``ensemble`` each image is sampled several times and graded by a
+    per-component vote (see :mod:`embryograding.ensemble`). ``concurrency``
+    still counts images; a scheduler bounds the requests themselves.
+
+    With ``prefilter_threshold``, jobs whose ``blastocyst_score`` (from
+    :class:`~embryograding.prefilter.BlastocystFilter`) is below it are
+    not sent; they get an ``N/A`` row from :func:`prefiltered_row`.
+
+    With ``images_per_request`` above 1, images are packed that many to a
+    request by an :class:`~embryograding.multiimage.ImageBatcher`, and any
+    image whose answer block is unusable is re-sent on its own.
+    ``concurrency`` still counts images, so it should be a multiple of
+    ``images_per_request`` for requests to fill up.
+    """
+
+    def __init__(
+        self,
+        client: GeminiClient,
+        concurrency: int = 8,
+        prompt: str = GARDNER_PROMPT,
+        generation_config: dict[str, Any] | None = None,
+        cache: ResponseCache | None = None,
+        scheduler: RequestScheduler | None = None,
+        streaming: bool = False,
+        preprocessor: Preprocessor | None = None,
+        json_mode: bool = False,
+        ensemble: EnsembleConfig | None = None,
+        prefilter_threshold: float | None = None,
+        images_per_request: int = 1,
+    ) -> None:
+        if concurrency < 1:
+            raise ValueError("concurrency must be at least 1")
+        if ensemble is not None and cache is not None:
+            # A cached response would come back as every sample.
+            raise ValueError("the response cache cannot be combined with ensemble sampling")
+        if images_per_request > 1 and (ensemble is not None or streaming):
+            raise ValueError("ensemble sampling and streaming uploads send one image per request")
+        self.client = client
+        self.concurrency = concurrency
+        self.json_mode = json_mode
+        if json_mode:
+            # Swap in the JSON prompt unless the caller chose their own.
+            self.prompt = JSON_PROMPT if prompt is GARDNER_PROMPT else prompt
+            self.generation_config = json_generation_config(generation_config)
+        else:
+            self.prompt = prompt
+            self.generation_config = generation_config
+        self.cache = cache
+        self.scheduler = scheduler
+        self.streaming = streaming
+        self.preprocessor = preprocessor
+        self.ensemble = ensemble
+        self.prefilter_threshold = prefilter_threshold
+        self.batcher = None
+        if images_per_request > 1:
+            self.batcher = ImageBatcher(self._send, images_per_request, generation_config, json_mode)
+
+    async def grade(self, job: ImageJob) -> Row:
+        """Grade a single image and return its results row.
+
+        Besides the CSV columns the row carries ``bytes_sent`` (request body
+        size, 0 on a cache hit), ``latency_s`` (end to end, including
+        preprocessing), ``cached``, token usage and ``image_sha256`` of the
+        source file. In ensemble mode ``bytes_sent`` and the token counts
+        add up all samples, and the row has the :data:`ENSEMBLE_FIELDS`. In
+        multi-image mode they are the image's share of its request, and
+        ``request_images`` says how many images shared it.
+        """
+        started = time.perf_counter()
+        threshold = self.prefilter_threshold
+        if threshold is not None and job.blastocyst_score is not None and job.blastocyst_score < threshold:
+            row = prefiltered_row(job, threshold)
+            row["latency_s"] = round(time.perf_counter() - started, 4)
+            return row
+        if self.streaming and self.preprocessor is None:
+            with MappedImage(job.image_path) as mapped:
+                row = await self._grade_image(job, mapped.buffer, mapped.release_pages)
+        else:
+            image_bytes = await asyncio.to_thread(job.image_path.read_bytes)
+            row = await self._grade_image(job, image_bytes)
+        row["latency_s"] = round(time.perf_counter() - started, 4)
+        if job.blastocyst_score is not None:
+            row["blastocyst_score"] = job.blastocyst_score
+        return row
+
+    async def _grade_image(
+        self,
+        job: ImageJob,
+        image: bytes | memoryview,
+        release: Callable[[int, int], None] | None = None,
+    ) -> Row:
+        image_hash = hashlib.sha256(image).hexdigest()
+        key = block_key = None
+        if self.cache is not None:
+            variant = self.preprocessor.fingerprint(job.roi) if self.preprocessor is not None else ""
+            key = cache_key(image, self.prompt, self.client.model, self.generation_config, variant)
+            keys = [key]
+            if self.batcher is not None:
+                # Answer blocks come from a different request, so they are kept
+                # apart from single-image answers.
+                block_key = cache_key(
+                    image, self.batcher.prompt, self.client.model, self.batcher.generation_config, variant
+                )
+                keys.append(block_key)
+            cached = self.cache.get_first(keys)
+            if cached is not None:
+                row = build_row(job, cached, self.json_mode)
+                row.update(bytes_sent=0, cached=True, input_tokens=0, output_tokens=0, image_sha256=image_hash)
+                return row
+
+        mime_type = mime_type_for(job.image_name)
+        if self.preprocessor is not None:
+            image = await self.preprocessor(job.image_path, job.roi)
+            mime_type = "image/jpeg"
+        answer = None
+        if self.batcher is not None:
+            answer = await self.batcher.submit(image, mime_type)
+            if answer.text is not None:
+                if block_key is not None:
+                    self.cache.put(block_key, answer.text)
+                row = build_row(job, answer.text, self.json_mode)
+                row.update(
+                    bytes_sent=answer.bytes_sent,
+                    cached=False,
+                    input_tokens=answer.input_tokens,
+                    output_tokens=answer.output_tokens,
+                    image_sha256=image_hash,
+                    request_images=answer.request_images,
+                    samples=1,
+                )
+                return row
+        body: bytes | StreamingBody
+        if self.streaming and self.preprocessor is None:
+            body = streaming_request_body(memoryview(image), mime_type, self.prompt, self.generation_config, release)
+        else:
+            body = encode_request(build_request_body(image, mime_type, self.prompt, self.generation_config))
+        if self.ensemble is not None:
+            row = await self._grade_ensemble(job, body)
+            row["image_sha256"] = image_hash
+            return row
+        data = await self._send(body)
+        text = response_text(data)
+        if key is not None:
+            self.cache.put(key, text)
+        usage = data.get("usageMetadata", {})
+        row = build_row(job, text, self.json_mode)
+        row.update(
+            bytes_sent=len(body),
+            cached=False,
+            input_tokens=usage.get("promptTokenCount", 0),
+            output_tokens=usage.get("candidatesTokenCount", 0),
+            image_sha256=image_hash,
+        )
+        row["samples"] = 1
+        if answer is not None:
+            # Graded alone after its multi-image block was unusable.
+            row["bytes_sent"] += answer.bytes_sent
+            row["input_tokens"] += answer.input_tokens
+            row["output_tokens"] += answer.output_tokens
+            row["request_images"] = 1
+        return row
+
+    async def _sample(self, job: ImageJob, body: bytes | StreamingBody) -> Row:
+        data = await self._send(body)
+        usage = data.get("usageMetadata", {})
+        row = build_row(job, response_text(data), self.json_mode)
+        row.update(input_tokens=usage.get("promptTokenCount", 0), output_tokens=usage.get("candidatesTokenCount", 0))
+        return row
+
+    async def _grade_ensemble(self, job: ImageJob, body: bytes | StreamingBody) -> Row:
+        """Sample in waves until the vote is decided, then combine the samples."""
+        assert self.ensemble is not None
+        config = self.ensemble
+        samples: list[Row] = []
+        wave = config.first_wave
+        while True:
+            samples += await asyncio.gather(*(self._sample(job, body) for _ in range(wave)))
+            votes = tally(samples)
+            remaining = config.max_samples - len(samples)
+            if not remaining or decided(votes, remaining):
+                break
+            wave = min(config.step, remaining)
+        row = combine(samples, votes)
+        row.update(
+            bytes_sent=len(body) * len(samples),
+            cached=False,
+            input_tokens=sum(sample["input_tokens"] for sample in samples),
+            output_tokens=sum(sample["output_tokens"] for sample in samples),
+        )
+        if self.json_mode and any(sample["parsed_as"] != "json" for sample in samples):
+            row["parsed_as"] = "text"
+        return row
+
+    async def _send(self, body: bytes | StreamingBody, prompt: str | None = None, images: int = 1) -> dict[str, Any]:
+        if self.scheduler is None:
+            return await self.client.generate_content(body)
+        estimate = estimate_input_tokens(self.prompt if prompt is None else prompt, images)
+        data = await self.scheduler.submit(lambda: self.client.generate_content(body), tokens=estimate)
+        self.scheduler.settle_tokens(estimate, data.get("usageMetadata", {}).get("promptTokenCount", 0))
+        return data
+
+    async def run(
+        self,
+        jobs: Iterable[ImageJob] | AsyncIterable[ImageJob],
+        sink: Callable[[Row], None],
+    ) -> BatchStats:
+        """Grade every job, calling ``sink`` with each row as it completes.
+
+        Jobs are pulled lazily, so ``jobs`` may be an unbounded (async)
+        iterator such as :meth:`RoiDetector.annotate`;
+        at most ``concurrency`` of them are in flight at any time. With a
+        scheduler, ``concurrency`` only bounds how many jobs are admitted and
+        the scheduler decides how many requests are actually sent. Failed
+        images are logged and recorded in :attr:`BatchStats.errors` rather
+        than aborting the batch.
+        """
+        stats = BatchStats()
+        slots = asyncio.BoundedSemaphore(self.concurrency)
+        running: set[asyncio.Task[None]] = set()
+        started = time.perf_counter()
+
+        async def worker(job: ImageJob) -> None:
+            try:
+                row = await self.grade(job)
+            except (GeminiAPIError, TransportError, OSError, asyncio.TimeoutError, ValueError) as exc:
+                stats.failed += 1
+                stats.errors.append((job.image_name, str(exc)))
+                log.warning("grading %s failed: %s", job.image_name, exc)
+            else:
+                sink(row)
+                stats.completed += 1
+                stats.samples += row.get("samples", 0)
+                stats.input_tokens += row["input_tokens"]
+                stats.output_tokens += row["output_tokens"]
+                if row["parsed_as"] == "prefilter":
+                    stats.prefiltered += 1
+                elif self.json_mode and row["parsed_as"] != "json":
+                    stats.json_fallbacks += 1
+            finally:
+                slots.release()
+
+        try:
+            async for job in _aiter(jobs):
+                await slots.acquire()
+                stats.submitted += 1
+                task = asyncio.create_task(worker(job))
+                running.add(task)
+                task.add_done_callback(running.discard)
+            if running:
+                await asyncio.gather(*running)
+        finally:
+            for task in running:
+                task.cancel()
+            stats.elapsed = time.perf_counter() - started
+        return stats
+
+
+async def _aiter(jobs: Iterable[ImageJob] | AsyncIterable[ImageJob]) -> AsyncIterator[ImageJob]:
+    if isinstance(jobs, AsyncIterable):
+        async for job in jobs:
+            yield job
+    else:
+        for job in jobs:
+            yield job
@@ -0,0 +1,108 @@
+"""Self-consistency voting over several samples of the same image.
+
+One call at ``temperature: 0.2`` gives one grade and no idea how stable it
+is; borderline embryos flip between grades from run to run. In ensemble
+mode :class:`~embryograding.engine.BatchGrader` samples an image several
+times, votes on each Gardner component (expansion, ICM, TE) separately and
+reports the share of samples that agreed with each winner.
+
+Samples are requested in waves: ``first_wave`` in parallel, then
+``step`` more at a time until the vote is decided or ``max_samples`` is
+reached. A vote is decided when no component's winner could be overtaken
+by the samples still allowed, so stopping early always gives the same
+grade as drawing all ``max_samples`` would have given with the same
+answers, and a unanimous first wave settles an image with no extra calls.
+"""
+
+from __future__ import annotations
+
+import collections
+import re
+from dataclasses import dataclass
+from typing import Any, Sequence
+
+# Row columns voted on, and the agreement column reported for each.
+VOTED_FIELDS = {"expansion": "expansion_agreement", "icm_quality": "icm_agreement", "te_quality": "te_agreement"}
+ENSEMBLE_FIELDS = ["samples", *VOTED_FIELDS.values()]
+
+_VALID = {
+    "expansion": re.compile(r"^[1-6]$"),
+    "icm_quality": re.compile(r"^[ABC]$"),
+    "te_quality": re.compile(r"^[ABC]$"),
+}
+
+
+@dataclass(frozen=True)
+class EnsembleConfig:
+    """How many samples to draw per image.
+
+    With the defaults (a first wave of 3, at most 5) an image whose three
+    samples agree costs 3 calls, and a 2-1 split is settled by a fourth
+    sample that sides with the majority.
+    """
+
+    max_samples: int = 5
+    first_wave: int = 3
+    step: int = 1
+
+    def __post_init__(self) -> None:
+        if not 1 <= self.first_wave <= self.max_samples or self.step < 1:
+            raise ValueError("need 1 <= first_wave <= max_samples and step >= 1")
+
+
+def vote_value(field: str, value: Any) -> str:
+    """A component value as voted on: "3", "A" ..., or "N/A" for anything ungraded."""
+    text = str(value or "").strip().upper()
+    return text if _VALID[field].match(text) else "N/A"
+
+
+def tally(samples: Sequence[dict[str, Any]]) -> dict[str, collections.Counter[str]]:
+    """Votes per component; counters keep first-seen order, which breaks ties."""
+    return {field: collections.Counter(vote_value(field, row.get(field)) for row in samples) for field in VOTED_FIELDS}
+
+
+def decided(votes: dict[str, collections.Counter[str]], remaining: int) -> bool:
+    """Whether ``remaining`` more samples could not change any component's winner."""
+    for counter in votes.values():
+        counts = [count for _, count in counter.most_common(2)] + [0]
+        if counts[0] - counts[1] <= remaining:
+            return False
+    return True
+
+
+def combine(samples: Sequence[dict[str, Any]], votes: dict[str, collections.Counter[str]]) -> dict[str, Any]:
+    """One results row from the samples of an image.
+
+    The row is the sample that agrees with the most winning components
+    (the earliest on ties), with the winners filled in and the grade
+    rebuilt if it disagreed on any. A rebuilt grade takes the explanation
+    and quality of a sample that gave that grade when there is one;
+    otherwise the explanation is marked as describing another grade.
+    ``samples`` and the per-component agreement shares are added.
+    """
+    winners = {field: counter.most_common(1)[0][0] for field, counter in votes.items()}
+
+    def matches(row: dict[str, Any]) -> int:
+        return sum(vote_value(field, row.get(field)) == winner for field, winner in winners.items())
+
+    best = max(samples, key=matches)
+    row = dict(best)
+    if matches(best) < len(winners):
+        expansion, icm, te = winners["expansion"], winners["icm_quality"], winners["te_quality"]
+        if expansion == "N/A":
+            grade = "N/A"
+        else:
+            grade = expansion + (icm if icm != "N/A" else "") + (te if te != "N/A" else "")
+        agreeing = next((s for s in samples if str(s.get("gardner_grade") or "").strip().upper() == grade), None)
+        if agreeing is not None:
+            row = dict(agreeing)
+        else:
+            row["explanation"] = (
+                f"[Explanation from a sample graded {best.get('gardner_grade') or 'N/A'}; "
+                f"the vote gave {grade}.] {row.get('explanation') or ''}"
+            ).rstrip()
+        row.update(winners, gardner_grade=grade)
+    row["samples"] = len(samples)
+    for field, column in VOTED_FIELDS.items():
+        row[column] = round(votes[field][winners[field]] / len(samples), 3)
+    return row
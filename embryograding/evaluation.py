@@ -0,0 +1,386 @@
+"""Agreement between AI grades and ground truth, vectorized with NumPy.
+
+Gardner grades are mapped to numbers once per *distinct* grade string
+(a results store already keeps them as dictionary codes), then every metric
+is computed from a small contingency table of counts:
+
+* ``parse_grade`` turns "4AB" into expansion 4, ICM 3 and TE 2 (A=3, B=2,
+  C=1); anything that is not a grade ("N/A", "Not applicable ...") is 0.
+* ``grade_score`` orders grades on one ordinal scale from 1 (1CC) to 54
+  (6AA), 0 for ungradable, for ROC analysis against ``actual_class``.
+* A grade predicts the positive class when its expansion is at least
+  ``min_expansion`` (3, a full blastocyst, by default).
+
+Bootstrap confidence intervals are batched. Resampling N rows with
+replacement only changes how often each distinct (truth, score) cell
+occurs, and those cell counts follow a multinomial distribution. So the
+replicates are drawn as one ``(replicates, cells)`` multinomial matrix and
+each metric is evaluated on all of them at once. The result has the same
+distribution as drawing N row indices per replicate (10^9 indices for 1M
+rows x 1,000 replicates), at a cost that does not depend on N.
+
+Requires NumPy.
+"""
+
+from __future__ import annotations
+
+import csv
+import re
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Any, Callable, Iterable, Sequence
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+QUALITY_POINTS = {"A": 3, "B": 2, "C": 1}
+MAX_SCORE = 54
+
+COMPONENTS = ["expansion", "icm", "te"]
+# Classes of each component, 0 being "not graded".
+COMPONENT_CLASSES = {"expansion": 7, "icm": 4, "te": 4}
+
+_GRADE = re.compile(r"^\s*([1-6])\s*([ABC])?\s*([ABC])?(?![A-Za-z])", re.I)
+
+_DISAGREEMENT = {
+    None: lambda i, j, k: (i != j).astype(float),
+    "linear": lambda i, j, k: np.abs(i - j) / max(k - 1, 1),
+    "quadratic": lambda i, j, k: ((i - j) / max(k - 1, 1)) ** 2,
+}
+
+
+def _require() -> None:
+    if np is None:
+        raise ImportError("evaluation requires NumPy (pip install numpy)")
+
+
+def parse_grade(grade: str) -> tuple[int, int, int]:
+    """``(expansion, icm, te)`` of a Gardner grade; ``(0, 0, 0)`` when ungradable.
+
+    Expansion is 1-6, ICM and TE are points with A=3, B=2, C=1, and 0 when
+    the grade leaves them out (e.g. "2" for an early blastocyst).
+    """
+    match = _GRADE.match(grade or "")
+    if not match:
+        return 0, 0, 0
+    icm, te = (QUALITY_POINTS.get((letter or "").upper(), 0) for letter in match.group(2, 3))
+    return int(match.group(1)), icm, te
+
+
+def grade_score(expansion: int, icm: int, te: int) -> int:
+    """Position of a grade on one ordinal scale: 0 ungradable, 1 (1CC) to 54 (6AA)."""
+    if not expansion:
+        return 0
+    return 9 * (expansion - 1) + 3 * max(icm - 1, 0) + max(te - 1, 0) + 1
+
+
+def factorize(values: Iterable[Any]) -> tuple[np.ndarray, list[Any]]:
+    """Dictionary-encode ``values``: ``(codes, categories)`` in order of first appearance."""
+    _require()
+    index: dict[Any, int] = {}
+    codes = np.fromiter((index.setdefault(value, len(index)) for value in values), dtype=np.int64)
+    return codes, list(index)
+
+
+@dataclass
+class GradeArrays:
+    """Numeric components of a column of grades, one entry per row."""
+
+    expansion: np.ndarray
+    icm: np.ndarray
+    te: np.ndarray
+    score: np.ndarray
+
+    def __len__(self) -> int:
+        return len(self.score)
+
+    def component(self, name: str) -> np.ndarray:
+        return getattr(self, name)
+
+
+def grade_arrays(codes: np.ndarray, categories: Sequence[str]) -> GradeArrays:
+    """Map dictionary-coded grades to components, parsing each category once."""
+    _require()
+    parsed = [parse_grade(str(value)) for value in categories] or [(0, 0, 0)]
+    table = np.array([(*p, grade_score(*p)) for p in parsed], dtype=np.int16).reshape(-1, 4)
+    rows = table[np.asarray(codes)]
+    return GradeArrays(*(rows[:, i] for i in range(4)))
+
+
+def encode_grades(grades: Iterable[str]) -> GradeArrays:
+    """Components of an iterable of grade strings."""
+    codes, categories = factorize(grades)
+    return grade_arrays(codes, categories)
+
+
+def encode_labels(codes: np.ndarray, categories: Sequence[str]) -> np.ndarray:
+    """``actual_class`` as 0/1, or -1 where it is missing or not binary."""
+    table = np.array([{"0": 0, "1": 1}.get(str(value).strip(), -1) for value in categories] or [-1], dtype=np.int8)
+    return table[np.asarray(codes)]
+
+
+def load_results(source: str | Path) -> tuple[np.ndarray, GradeArrays]:
+    """``(labels, grades)`` of a results CSV or results store directory.
+
+    A store is read from its categorical code columns without decoding
+    rows; a CSV is streamed and dictionary-encoded.
+    """
+    _require()
+    source = Path(source)
+    if source.is_dir():
+        from .store import ResultStore
+
+        store = ResultStore(source)
+        labels = encode_labels(store.codes("actual_class"), store.categories("actual_class"))
+        return labels, grade_arrays(store.codes("gardner_grade"), store.categories("gardner_grade"))
+    actual, grades = [], []
+    with source.open(newline="", encoding="utf-8") as fh:
+        for row in csv.DictReader(fh):
+            actual.append(row.get("actual_class", ""))
+            grades.append(row.get("gardner_grade", ""))
+    label_codes, label_categories = factorize(actual)
+    return encode_labels(label_codes, label_categories), encode_grades(grades)
+
+
+# Metrics on (..., k, k) count tables; leading axes are bootstrap replicates.
+
+def _kappa(tables: np.ndarray, weights: str | None = None) -> np.ndarray:
+    k = tables.shape[-1]
+    i, j = np.indices((k, k))
+    disagreement = _DISAGREEMENT[weights](i, j, k)
+    total = tables.sum(axis=(-2, -1), keepdims=True)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        observed = tables / total
+        expected = observed.sum(axis=-1, keepdims=True) * observed.sum(axis=-2, keepdims=True)
+        return 1.0 - (disagreement * observed).sum(axis=(-2, -1)) / (disagreement * expected).sum(axis=(-2, -1))
+
+
+def _accuracy(tables: np.ndarray) -> np.ndarray:
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return np.trace(tables, axis1=-2, axis2=-1) / tables.sum(axis=(-2, -1))
+
+
+def _auc(tables: np.ndarray) -> np.ndarray:
+    """AUC from (..., 2, levels) tables of negative/positive counts per ascending score level.
+
+    The Mann-Whitney statistic, with ties counted as one half.
+    """
+    negatives, positives = tables[..., 0, :], tables[..., 1, :]
+    below = np.cumsum(negatives, axis=-1) - negatives
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return (positives * (below + 0.5 * negatives)).sum(axis=-1) / (
+            positives.sum(axis=-1) * negatives.sum(axis=-1)
+        )
+
+
+def confusion_matrix(truth: np.ndarray, predicted: np.ndarray, classes: int | None = None) -> np.ndarray:
+    """``classes x classes`` counts; rows are ``truth``, columns ``predicted``."""
+    _require()
+    truth, predicted = np.asarray(truth, dtype=np.int64), np.asarray(predicted, dtype=np.int64)
+    k = classes or int(max(truth.max(initial=0), predicted.max(initial=0))) + 1
+    return np.bincount(truth * k + predicted, minlength=k * k).reshape(k, k)
+
+
+def accuracy(truth: np.ndarray, predicted: np.ndarray) -> float:
+    return float(_accuracy(confusion_matrix(truth, predicted)))
+
+
+def cohen_kappa(a: np.ndarray, b: np.ndarray, weights: str | None = None, classes: int | None = None) -> float:
+    """Cohen's kappa of two ratings coded 0..k-1; ``weights`` is None, "linear" or "quadratic"."""
+    return float(_kappa(confusion_matrix(a, b, classes), weights))
+
+
+def _score_table(labels: np.ndarray, scores: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """(2, levels) counts of negatives/positives per distinct score, and the levels."""
+    labels = np.asarray(labels, dtype=np.int64)
+    levels, inverse = np.unique(np.asarray(scores), return_inverse=True)
+    table = np.bincount(labels * len(levels) + inverse.ravel(), minlength=2 * len(levels)).reshape(2, len(levels))
+    return table, levels
+
+
+def roc_curve(labels: np.ndarray, scores: np.ndarray) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """``(fpr, tpr, thresholds)`` with one point per distinct score, from strictest to loosest."""
+    _require()
+    table, levels = _score_table(labels, scores)
+    negatives, positives = table[0, ::-1].cumsum(), table[1, ::-1].cumsum()
+    with np.errstate(invalid="ignore", divide="ignore"):
+        fpr = np.concatenate([[0.0], negatives / negatives[-1]])
+        tpr = np.concatenate([[0.0], positives / positives[-1]])
+    return fpr, tpr, np.concatenate([[np.inf], levels[::-1]])
+
+
+def roc_auc(labels: np.ndarray, scores: np.ndarray) -> float:
+    _require()
+    return float(_auc(_score_table(labels, scores)[0]))
+
+
+@dataclass
+class Estimate:
+    """A point estimate with a bootstrap confidence interval."""
+
+    value: float
+    low: float
+    high: float
+
+    def __str__(self) -> str:
+        return f"{self.value:.3f} [{self.low:.3f}, {self.high:.3f}]"
+
+
+def bootstrap_counts(
+    counts: np.ndarray,
+    statistic: Callable[[np.ndarray], np.ndarray],
+    replicates: int = 1000,
+    confidence: float = 0.95,
+    seed: int | None = 0,
+    max_cells: int = 1 << 22,
+) -> Estimate:
+    """Percentile bootstrap of ``statistic`` over a table of counts.
+
+    ``statistic`` takes an array of tables shaped ``(replicates, *counts.shape)``
+    and returns one value per replicate. Replicate tables are drawn as
+    multinomial counts, ``max_cells`` table cells at a time.
+    """
+    _require()
+    counts = np.asarray(counts)
+    value = float(statistic(counts[None].astype(float))[0])
+    total = int(counts.sum())
+    if not replicates or not total:
+        return Estimate(value, np.nan, np.nan)
+    rng = np.random.default_rng(seed)
+    probabilities = counts.ravel() / total
+    batch = max(1, max_cells // probabilities.size)
+    values = []
+    for start in range(0, replicates, batch):
+        draws = rng.multinomial(total, probabilities, size=min(batch, replicates - start))
+        values.append(statistic(draws.reshape(-1, *counts.shape).astype(float)))
+    samples = np.concatenate(values)
+    samples = samples[~np.isnan(samples)]
+    if not samples.size:
+        return Estimate(value, np.nan, np.nan)
+    alpha = (1.0 - confidence) / 2
+    low, high = np.quantile(samples, [alpha, 1.0 - alpha])
+    return Estimate(value, float(low), float(high))
+
+
+@dataclass
+class Evaluation:
+    """AI grades against the binary ``actual_class`` ground truth.
+
+    ``confusion`` is ``[[tn, fp], [fn, tp]]`` for "expansion >=
+    ``min_expansion``" as the prediction; ``auc`` ranks by :func:`grade_score`.
+    """
+
+    rows: int
+    excluded: int
+    min_expansion: int
+    confusion: list[list[int]]
+    accuracy: Estimate
+    sensitivity: Estimate
+    specificity: Estimate
+    kappa: Estimate
+    auc: Estimate
+    replicates: int
+    confidence: float
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def evaluate(
+    labels: np.ndarray,
+    grades: GradeArrays,
+    min_expansion: int = 3,
+    replicates: int = 1000,
+    confidence: float = 0.95,
+    seed: int | None = 0,
+) -> Evaluation:
+    """Accuracy, sensitivity, specificity, Cohen's kappa and AUC with bootstrap CIs.
+
+    Rows whose label is not 0/1 are excluded. Every metric is a function of
+    the (label x score) table, so all of them share one set of replicates.
+    """
+    _require()
+    labels = np.asarray(labels)
+    keep = labels >= 0
+    levels = MAX_SCORE + 1
+    table = np.bincount(
+        labels[keep].astype(np.int64) * levels + grades.score[keep], minlength=2 * levels
+    ).reshape(2, levels)
+    # Scores of expansion >= min_expansion start at 9 * (min_expansion - 1) + 1.
+    positive_from = 9 * (max(min_expansion, 1) - 1) + 1
+
+    def confusion(tables: np.ndarray) -> np.ndarray:
+        return np.stack([tables[..., :positive_from].sum(-1), tables[..., positive_from:].sum(-1)], axis=-1)
+
+    def rate(row: int, column: int) -> Callable[[np.ndarray], np.ndarray]:
+        def statistic(tables: np.ndarray) -> np.ndarray:
+            matrix = confusion(tables)
+            with np.errstate(invalid="ignore", divide="ignore"):
+                return matrix[..., row, column] / matrix[..., row, :].sum(-1)
+        return statistic
+
+    def estimate(statistic: Callable[[np.ndarray], np.ndarray]) -> Estimate:
+        return bootstrap_counts(table, statistic, replicates, confidence, seed)
+
+    return Evaluation(
+        rows=int(keep.sum()),
+        excluded=int((~keep).sum()),
+        min_expansion=min_expansion,
+        confusion=confusion(table).tolist(),
+        accuracy=estimate(lambda tables: _accuracy(confusion(tables))),
+        sensitivity=estimate(rate(1, 1)),
+        specificity=estimate(rate(0, 0)),
+        kappa=estimate(lambda tables: _kappa(confusion(tables))),
+        auc=estimate(_auc),
+        replicates=replicates,
+        confidence=confidence,
+    )
+
+
+@dataclass
+class Agreement:
+    """Agreement of two raters on one Gardner component, over pairs both graded."""
+
+    component: str
+    pairs: int
+    exact: Estimate
+    kappa: Estimate
+    linear_kappa: Estimate
+    quadratic_kappa: Estimate
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def grade_agreement(
+    a: GradeArrays,
+    b: GradeArrays,
+    replicates: int = 1000,
+    confidence: float = 0.95,
+    seed: int | None = 0,
+) -> list[Agreement]:
+    """Exact agreement and unweighted, linear and quadratic Cohen's kappa per component.
+
+    For comparing the AI with an expert (or two experts) on the same images.
+    """
+    _require()
+    results = []
+    for name in COMPONENTS:
+        x, y = a.component(name), b.component(name)
+        both = (x > 0) & (y > 0)
+        table = confusion_matrix(x[both], y[both], COMPONENT_CLASSES[name])[1:, 1:]
+
+        def estimate(statistic: Callable[[np.ndarray], np.ndarray]) -> Estimate:
+            return bootstrap_counts(table, statistic, replicates, confidence, seed)
+
+        results.append(Agreement(
+            component=name,
+            pairs=int(both.sum()),
+            exact=estimate(_accuracy),
+            kappa=estimate(_kappa),
+            linear_kappa=estimate(lambda tables: _kappa(tables, "linear")),
+            quadratic_kappa=estimate(lambda tables: _kappa(tables, "quadratic")),
+        ))
+    return results
@@ -0,0 +1,409 @@
+"""Local image descriptors for every image in a results store.
+
+Search, triage and QA want numbers describing each image, not just its
+grade. :func:`descriptors` computes them in NumPy for a whole batch of
+downscaled grayscale frames at once, relative to the embryo found by
+:func:`~embryograding.roi.detect_circles`:
+
+* an intensity histogram over the embryo disc;
+* grey-level co-occurrence (GLCM) texture statistics inside the disc,
+  averaged over four directions at each distance;
+* a radial profile of mean (normalised) intensity out from the centre;
+* gradient and edge density in the trophectoderm ring, and inside it.
+
+:class:`FeatureMatrix` keeps the results as a memory-mapped float32 matrix
+in the store directory, one row per store record in the same order:
+
+``features.f32``
+    ``rows x dim`` float32, row ``i`` describing record ``i``.
+``features.done``
+    One byte per row: 0 pending, 1 computed, 2 image missing/unreadable.
+``features.json``
+    Format version, :class:`FeatureConfig` and the column names.
+
+A row is only marked done after its values are flushed, so
+:func:`extract_store_features` can be interrupted at any point and run
+again to pick up where it stopped; rows appended to the store since the
+last run are added as pending.
+
+Requires NumPy and Pillow.
+"""
+
+from __future__ import annotations
+
+import json
+import os
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Callable, Sequence
+
+from .roi import DetectorConfig, detect_circles
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+try:
+    from PIL import Image
+except ImportError:  # pragma: no cover - optional dependency
+    Image = None
+
+FEATURES_FORMAT = "embryograding-features"
+FEATURES_VERSION = 1
+
+PENDING, DONE, MISSING = 0, 1, 2
+
+_GLCM_STATS = ("contrast", "dissimilarity", "homogeneity", "energy", "correlation", "entropy")
+
+
+@dataclass(frozen=True)
+class FeatureConfig:
+    """Descriptor settings.
+
+    Frames are reduced to ``size`` x ``size``; the embryo is located on a
+    ``detect_size`` copy. The radial profile covers ``radial_extent``
+    zona radii in ``radial_bins`` steps, and the trophectoderm ring runs
+    from ``te_inner`` radii to the zona. A pixel is an edge when its
+    gradient is in the frame's top ``edge_fraction``.
+    """
+
+    size: int = 128
+    detect_size: int = 64
+    histogram_bins: int = 16
+    glcm_levels: int = 16
+    glcm_distances: tuple[int, ...] = (1, 2)
+    radial_bins: int = 16
+    radial_extent: float = 1.5
+    te_inner: float = 0.75
+    edge_fraction: float = 0.1
+
+    def names(self) -> list[str]:
+        """Column names of the feature matrix, in order."""
+        return [
+            "centre_x",
+            "centre_y",
+            "radius",
+            "circle_score",
+            "brightness",
+            "contrast",
+            *(f"histogram_{i}" for i in range(self.histogram_bins)),
+            *(f"glcm_{stat}_d{d}" for d in self.glcm_distances for stat in _GLCM_STATS),
+            *(f"radial_{i}" for i in range(self.radial_bins)),
+            "te_gradient",
+            "te_edge_density",
+            "inner_edge_density",
+        ]
+
+
+def _require() -> None:
+    if np is None or Image is None:
+        raise ImportError("feature extraction requires NumPy and Pillow (pip install numpy Pillow)")
+
+
+def _per_frame(index: np.ndarray, weights: np.ndarray | None, batch: int, bins: int) -> np.ndarray:
+    return np.bincount(index, weights=weights, minlength=batch * bins).reshape(batch, bins)
+
+
+def _glcm_stats(pairs: np.ndarray) -> np.ndarray:
+    """The :data:`_GLCM_STATS` of ``(batch, levels, levels)`` co-occurrence counts."""
+    p = pairs + pairs.transpose(0, 2, 1)
+    total = p.sum(axis=(1, 2), keepdims=True)
+    p = np.divide(p, total, out=np.zeros_like(p), where=total > 0)
+    levels = p.shape[1]
+    i = np.arange(levels, dtype=np.float64)[:, None]
+    j = np.arange(levels, dtype=np.float64)[None, :]
+    diff = i - j
+    mu = (p * i).sum(axis=(1, 2))
+    var = (p * (i - mu[:, None, None]) ** 2).sum(axis=(1, 2))
+    cov = (p * (i - mu[:, None, None]) * (j - mu[:, None, None])).sum(axis=(1, 2))
+    logs = np.log(p, out=np.zeros_like(p), where=p > 0)
+    return np.stack(
+        [
+            (p * diff**2).sum(axis=(1, 2)),
+            (p * np.abs(diff)).sum(axis=(1, 2)),
+            (p / (1 + diff**2)).sum(axis=(1, 2)),
+            np.sqrt((p * p).sum(axis=(1, 2))),
+            np.divide(cov, var, out=np.zeros_like(cov), where=var > 0),
+            -(p * logs).sum(axis=(1, 2)),
+        ],
+        axis=1,
+    )
+
+
+def descriptors(frames: np.ndarray, config: FeatureConfig | None = None) -> np.ndarray:
+    """A ``(batch, len(config.names()))`` float32 matrix for ``(batch, size, size)`` grayscale frames."""
+    _require()
+    config = config or FeatureConfig()
+    f = np.asarray(frames, dtype=np.float32)
+    if f.ndim == 2:
+        f = f[None]
+    batch, height, width = f.shape
+    rows = np.arange(batch)
+
+    # Locate the embryo on a block-averaged copy; detection cost grows
+    # with the square of the frame edge.
+    k = max(1, min(height, width) // config.detect_size)
+    small = f[:, : height // k * k, : width // k * k].reshape(batch, height // k, k, width // k, k).mean(axis=(2, 4))
+    detections = detect_circles(small, DetectorConfig(size=min(small.shape[1:])))
+    cx = np.array([d.cx for d in detections], dtype=np.float32) * k + (k - 1) / 2
+    cy = np.array([d.cy for d in detections], dtype=np.float32) * k + (k - 1) / 2
+    radius = np.maximum(np.array([d.radius for d in detections], dtype=np.float32) * k, 2.0)
+    score = np.array([d.score for d in detections], dtype=np.float32)
+
+    flat = f.reshape(batch, -1)
+    brightness = flat.mean(axis=1)
+    contrast = flat.std(axis=1)
+    z = (f - brightness[:, None, None]) / np.maximum(contrast, 1e-3)[:, None, None]
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    dist = np.hypot(xx - cx[:, None, None], yy - cy[:, None, None]) / radius[:, None, None]
+    disc = dist <= 1.0
+    disc_area = np.maximum(disc.sum(axis=(1, 2)), 1)
+    frame_of = np.broadcast_to(rows[:, None, None], f.shape)
+
+    # Intensity histogram over the disc.
+    bins = config.histogram_bins
+    level = np.minimum((f * (bins / 256.0)).astype(np.int64), bins - 1)
+    histogram = _per_frame((frame_of * bins + level)[disc], None, batch, bins) / disc_area[:, None]
+
+    # GLCM on contrast-normalised grey levels, pairs with both ends in the disc.
+    levels = config.glcm_levels
+    q = np.clip(((z + 2.5) * (levels / 5.0)).astype(np.int64), 0, levels - 1)
+    base = frame_of * (levels * levels) + q * levels
+    texture = []
+    for d in config.glcm_distances:
+        counts = np.zeros((batch, levels, levels))
+        for dy, dx in ((0, d), (d, d), (d, 0), (d, -d)):
+            ys = slice(0, height - dy)
+            yt = slice(dy, height)
+            xs = slice(max(0, -dx), width - max(0, dx))
+            xt = slice(max(0, dx), width - max(0, -dx))
+            both = disc[:, ys, xs] & disc[:, yt, xt]
+            index = (base[:, ys, xs] + q[:, yt, xt])[both]
+            counts += _per_frame(index, None, batch, levels * levels).reshape(batch, levels, levels)
+        texture.append(_glcm_stats(counts))
+
+    # Radial profile of normalised intensity.
+    radial = config.radial_bins
+    ring = np.minimum((dist * (radial / config.radial_extent)).astype(np.int64), radial)
+    inside = ring < radial
+    index = (frame_of * radial + ring)[inside]
+    ring_count = _per_frame(index, None, batch, radial)
+    profile = np.divide(
+        _per_frame(index, z[inside], batch, radial), ring_count, out=np.zeros((batch, radial)), where=ring_count > 0
+    )
+
+    # Edges: trophectoderm ring vs. the interior it encloses.
+    gy, gx = np.gradient(z, axis=(1, 2))
+    grad = np.hypot(gx, gy).reshape(batch, -1)
+    kth = int(grad.shape[1] * (1 - config.edge_fraction))
+    threshold = np.partition(grad, kth, axis=1)[:, kth]
+    edges = (grad > threshold[:, None]).reshape(f.shape)
+    grad = grad.reshape(f.shape)
+    te = disc & (dist >= config.te_inner)
+    inner = dist < config.te_inner
+    te_area = np.maximum(te.sum(axis=(1, 2)), 1)
+    inner_area = np.maximum(inner.sum(axis=(1, 2)), 1)
+    edge_stats = np.stack(
+        [
+            (grad * te).sum(axis=(1, 2)) / te_area,
+            (edges & te).sum(axis=(1, 2)) / te_area,
+            (edges & inner).sum(axis=(1, 2)) / inner_area,
+        ],
+        axis=1,
+    )
+
+    geometry = np.stack(
+        [cx / width, cy / height, radius / min(height, width), score, brightness / 255.0, contrast / 255.0], axis=1
+    )
+    out = np.concatenate([geometry, histogram, *texture, profile, edge_stats], axis=1)
+    return np.nan_to_num(out).astype(np.float32)
+
+
+def load_batch(paths: Sequence[str | Path], size: int) -> tuple[np.ndarray, np.ndarray]:
+    """Decode images as ``size`` x ``size`` grayscale; unreadable ones are left blank and flagged."""
+    _require()
+    frames = np.zeros((len(paths), size, size), dtype=np.uint8)
+    ok = np.zeros(len(paths), dtype=bool)
+    for i, path in enumerate(paths):
+        try:
+            with Image.open(path) as im:
+                if im.format == "JPEG":
+                    im.draft("L", (size, size))
+                frames[i] = np.asarray(im.convert("L").resize((size, size), Image.BILINEAR))
+        except (OSError, ValueError):
+            continue
+        ok[i] = True
+    return frames, ok
+
+
+def describe_images(paths: Sequence[str | Path], config: FeatureConfig) -> tuple[np.ndarray, np.ndarray]:
+    """Descriptors of a batch of image files and which of them could be read (runs in a worker)."""
+    frames, ok = load_batch(paths, config.size)
+    return descriptors(frames, config), ok
+
+
+class FeatureMatrix:
+    """The feature files of a results store directory.
+
+    Opening grows the matrix to ``rows`` (new rows pending). A matrix
+    computed with a different :class:`FeatureConfig` is refused unless
+    ``rebuild`` is set, which starts it over.
+    """
+
+    def __init__(self, path: str | Path, rows: int, config: FeatureConfig | None = None, rebuild: bool = False) -> None:
+        _require()
+        self.path = Path(path)
+        self.config = config or FeatureConfig()
+        self.names = self.config.names()
+        self.path.mkdir(parents=True, exist_ok=True)
+        header = {
+            "format": FEATURES_FORMAT,
+            "version": FEATURES_VERSION,
+            "config": asdict(self.config),
+            "names": self.names,
+        }
+        header_path = self.path / "features.json"
+        files = (self.path / "features.f32", self.path / "features.done")
+        if header_path.exists() and not rebuild:
+            # Round-trip through JSON so tuples compare equal to lists.
+            if json.loads(header_path.read_text(encoding="utf-8")) != json.loads(json.dumps(header)):
+                raise ValueError(f"{self.path}: features were computed with other settings")
+        else:
+            for file in files:
+                file.unlink(missing_ok=True)
+            header_path.write_text(json.dumps(header, indent=1) + "\n", encoding="utf-8")
+
+        self.dim = len(self.names)
+        widths = (self.dim * 4, 1)
+        for file, width in zip(files, widths):
+            with file.open("a+b") as fh:
+                # Grow (zero-filled, i.e. pending) to the store's length; never shrink.
+                if fh.seek(0, os.SEEK_END) < rows * width:
+                    fh.truncate(rows * width)
+        self.rows = files[1].stat().st_size
+        self.matrix = _map(files[0], np.float32, (self.rows, self.dim))
+        self.done = _map(files[1], np.uint8, (self.rows,))
+        self._marks: list[tuple[np.ndarray, np.ndarray]] = []
+
+    @classmethod
+    def open(cls, path: str | Path) -> "FeatureMatrix":
+        """Open existing features with the settings they were computed with."""
+        settings = json.loads((Path(path) / "features.json").read_text(encoding="utf-8"))["config"]
+        settings["glcm_distances"] = tuple(settings["glcm_distances"])
+        return cls(path, 0, FeatureConfig(**settings))
+
+    def __enter__(self) -> "FeatureMatrix":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.flush()
+
+    def pending(self) -> np.ndarray:
+        """Indices of rows not yet computed."""
+        return np.flatnonzero(self.done == PENDING)
+
+    def write(self, indices: np.ndarray, values: np.ndarray, ok: np.ndarray) -> None:
+        """Store a batch; its rows are marked done by the next :meth:`flush`."""
+        values = values.copy()
+        values[~ok] = np.nan
+        self.matrix[indices] = values
+        self._marks.append((indices, np.where(ok, DONE, MISSING).astype(np.uint8)))
+
+    def flush(self) -> None:
+        """Flush the values written, then mark their rows done and flush that."""
+        if not self._marks:
+            return
+        self.matrix.flush()
+        for indices, status in self._marks:
+            self.done[indices] = status
+        self._marks.clear()
+        self.done.flush()
+
+    def column(self, name: str) -> np.ndarray:
+        """One feature for every row (NaN where the image was missing, 0 where pending)."""
+        return self.matrix[:, self.names.index(name)]
+
+
+def _map(path: Path, dtype: type, shape: tuple[int, ...]) -> np.ndarray:
+    if not shape[0]:
+        return np.zeros(shape, dtype=dtype)
+    return np.memmap(path, dtype=dtype, mode="r+", shape=shape)
+
+
+@dataclass
+class FeatureStats:
+    rows: int = 0
+    computed: int = 0
+    missing: int = 0
+    already_done: int = 0
+    elapsed: float = 0.0
+
+    @property
+    def images_per_second(self) -> float:
+        return (self.computed + self.missing) / self.elapsed if self.elapsed else 0.0
+
+
+def extract_store_features(
+    store_path: str | Path,
+    base_dir: str | Path = ".",
+    config: FeatureConfig | None = None,
+    workers: int | None = None,
+    batch_size: int = 64,
+    flush_every: int = 16,
+    rebuild: bool = False,
+    progress: Callable[[int, int], None] | None = None,
+) -> FeatureStats:
+    """Compute descriptors for every pending row of a results store.
+
+    Batches of ``batch_size`` images are described in a pool of
+    ``workers`` processes, at most two batches per worker in flight, and
+    written into the :class:`FeatureMatrix` as they finish; finished rows
+    are marked done every ``flush_every`` batches and at the end, including
+    on interruption. Relative image paths are resolved against
+    ``base_dir``. ``progress`` is called with (rows done, rows pending).
+    """
+    from .store import ResultStore
+
+    _require()
+    config = config or FeatureConfig()
+    with ResultStore(store_path) as store:
+        paths = store.column("image_path")
+    base = Path(base_dir)
+    stats = FeatureStats(rows=len(paths))
+    started = time.perf_counter()
+    with FeatureMatrix(store_path, len(paths), config, rebuild) as features:
+        pending = features.pending()
+        stats.already_done = len(paths) - len(pending)
+        chunks = [pending[i:i + batch_size] for i in range(0, len(pending), batch_size)]
+        workers = workers or os.cpu_count() or 1
+        in_flight: dict[Future[tuple[np.ndarray, np.ndarray]], np.ndarray] = {}
+        written = 0
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            try:
+                queue = list(reversed(chunks))
+                while queue or in_flight:
+                    while queue and len(in_flight) < 2 * workers:
+                        chunk = queue.pop()
+                        batch = [base / paths[i] if not Path(paths[i]).is_absolute() else paths[i] for i in chunk]
+                        in_flight[pool.submit(describe_images, batch, config)] = chunk
+                    done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        chunk = in_flight.pop(future)
+                        values, ok = future.result()
+                        features.write(chunk, values, ok)
+                        stats.computed += int(ok.sum())
+                        stats.missing += int((~ok).sum())
+                        written += 1
+                        if written % flush_every == 0:
+                            features.flush()
+                        if progress is not None:
+                            progress(stats.computed + stats.missing, len(pending))
+            finally:
+                for future in in_flight:
+                    future.cancel()
+                features.flush()
+                stats.elapsed = time.perf_counter() - started
+    return stats
@@ -0,0 +1,106 @@
+"""Generator-based HTML rendering with constant memory.
+
+A :class:`Template` is compiled once into alternating static text and
+``{field}`` slots. Rendering escapes each value as it is substituted, so a
+document is produced as a stream of chunks (one card at a time) that can go
+straight to a file or an HTTP response without the whole page ever
+existing as one string.
+
+Slots are ``{name}`` (HTML-escaped) or ``{name!raw}`` (inserted as is, for
+values that are already markup). Literal braces are ``{{`` and ``}}``.
+"""
+
+from __future__ import annotations
+
+import html
+import os
+import re
+from pathlib import Path
+from typing import Any, Iterable, Iterator, Mapping
+
+_SLOT = re.compile(r"\{\{|\}\}|\{(\w+)(!raw)?\}")
+
+CHUNK_SIZE = 64 * 1024
+
+
+def escape(value: Any) -> str:
+    """Escape text for HTML element content and quoted attributes."""
+    return html.escape(value if isinstance(value, str) else str(value), quote=True)
+
+
+class Template:
+    """A compiled ``{field}`` template."""
+
+    def __init__(self, source: str) -> None:
+        self.source = source
+        # (static text, slot name or None, raw?) triples.
+        self._segments: list[tuple[str, str | None, bool]] = []
+        static: list[str] = []
+        position = 0
+        for match in _SLOT.finditer(source):
+            static.append(source[position:match.start()])
+            position = match.end()
+            if match.group(1) is None:
+                static.append(match.group(0)[0])
+                continue
+            self._segments.append(("".join(static), match.group(1), bool(match.group(2))))
+            static = []
+        static.append(source[position:])
+        self._tail = "".join(static)
+        self.fields = frozenset(name for _, name, _ in self._segments)
+
+    def stream(self, values: Mapping[str, Any]) -> Iterator[str]:
+        """Yield the rendered template piece by piece."""
+        for static, name, raw in self._segments:
+            yield static
+            value = values[name]
+            yield value if raw else escape(value)
+        yield self._tail
+
+    def render(self, values: Mapping[str, Any] | None = None, /, **kwargs: Any) -> str:
+        """Render to one string; meant for small fragments such as a card."""
+        if values is None:
+            values = kwargs
+        elif kwargs:
+            values = {**values, **kwargs}
+        return "".join(self.stream(values))
+
+
+def encode_chunks(chunks: Iterable[str], chunk_size: int = CHUNK_SIZE, encoding: str = "utf-8") -> Iterator[bytes]:
+    """Coalesce text chunks into encoded blocks of about ``chunk_size`` bytes.
+
+    Suitable as a WSGI response body or for writing to a socket: many small
+    writes become a few large ones while only one block is held at a time.
+    """
+    pending: list[str] = []
+    size = 0
+    for chunk in chunks:
+        pending.append(chunk)
+        size += len(chunk)
+        if size >= chunk_size:
+            yield "".join(pending).encode(encoding)
+            pending.clear()
+            size = 0
+    if pending:
+        yield "".join(pending).encode(encoding)
+
+
+def write_chunks(chunks: Iterable[str], path: str | Path, chunk_size: int = CHUNK_SIZE) -> int:
+    """Stream ``chunks`` into ``path`` atomically; returns bytes written.
+
+    The file is written under a temporary name and moved into place at the
+    end, so readers never see a half-written document.
+    """
+    path = Path(path)
+    tmp = path.with_name(f".{path.name}.tmp")
+    written = 0
+    try:
+        with tmp.open("wb") as fh:
+            for block in encode_chunks(chunks, chunk_size):
+                fh.write(block)
+                written += len(block)
+    except BaseException:
+        tmp.unlink(missing_ok=True)
+        raise
+    os.replace(tmp, path)
+    return written
@@ -0,0 +1,322 @@
+"""Inter-observer variability across experts and repeated AI runs.
+
+Every rater (an expert from the reviews table, or one grading run of the
+model) gives some of the images a Gardner grade. For each component
+(expansion, ICM, TE) this computes:
+
+* Fleiss' kappa, generalised to a varying number of raters per image;
+* Krippendorff's alpha with the ordinal metric (1 < 2 < ... < 6, C < B < A),
+  which tolerates missing ratings by construction;
+* a category coincidence heatmap (which grades get confused with which);
+* a rater x rater heatmap of how often two raters disagree on the images
+  they both graded.
+
+Ratings are held as a sparse rater x item matrix in coordinate form (three
+parallel arrays), never as a dense table of every (item, rater) cell. The
+kappa and alpha only need each item's count of ratings per category, an
+(items x categories) matrix made with one ``bincount``; the rater heatmap is
+accumulated over blocks of items.
+
+Expansion "0" means "not a blastocyst" and is the lowest expansion
+category; ungraded ICM/TE (N/A, or early blastocysts graded "2") are
+missing ratings.
+
+Requires NumPy.
+"""
+
+from __future__ import annotations
+
+from dataclasses import asdict, dataclass
+from typing import TYPE_CHECKING, Any, Iterable
+
+from .evaluation import COMPONENTS, GradeArrays, encode_grades, factorize
+from .htmlstream import escape
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+if TYPE_CHECKING:
+    from .registry import RunRegistry
+
+# Category labels in ordinal order; expansion keeps 0 ("none") as a category.
+CATEGORY_LABELS = {
+    "expansion": ["none", "1", "2", "3", "4", "5", "6"],
+    "icm": ["C", "B", "A"],
+    "te": ["C", "B", "A"],
+}
+COMPONENT_TITLES = {"expansion": "Expansion", "icm": "ICM", "te": "TE"}
+
+_BLOCK_CELLS = 1 << 22
+
+
+def _require() -> None:
+    if np is None:
+        raise ImportError("inter-observer analysis requires NumPy (pip install numpy)")
+
+
+@dataclass
+class RatingMatrix:
+    """Sparse rater x item grades: ``item[i]`` was graded ``grades[i]`` by ``rater[i]``."""
+
+    items: list[str]
+    raters: list[str]
+    item: np.ndarray
+    rater: np.ndarray
+    grades: GradeArrays
+
+    @classmethod
+    def from_ratings(cls, ratings: Iterable[tuple[str, str, str]]) -> "RatingMatrix":
+        """Build from ``(rater, item, grade)`` triples; a rater's last grade of an item wins."""
+        _require()
+        raters, items, grades = [], [], []
+        for rater, item, grade in ratings:
+            raters.append(rater)
+            items.append(item)
+            grades.append(grade or "")
+        rater_codes, rater_names = factorize(raters)
+        item_codes, item_names = factorize(items)
+        # Keep the last rating of each (item, rater) cell.
+        cell = item_codes * max(len(rater_names), 1) + rater_codes
+        _, last = np.unique(cell[::-1], return_index=True)
+        keep = np.sort(len(cell) - 1 - last)
+        encoded = encode_grades(grades)
+        return cls(
+            item_names,
+            rater_names,
+            item_codes[keep],
+            rater_codes[keep],
+            GradeArrays(*(getattr(encoded, name)[keep] for name in ("expansion", "icm", "te", "score"))),
+        )
+
+    def __len__(self) -> int:
+        return len(self.item)
+
+    def component(self, name: str) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """``(item, rater, category)`` of the ratings that grade ``name``; categories count from 0."""
+        values = self.grades.component(name).astype(np.int64)
+        if name == "expansion":
+            return self.item, self.rater, values
+        graded = values > 0
+        return self.item[graded], self.rater[graded], values[graded] - 1
+
+    def category_counts(self, name: str) -> np.ndarray:
+        """``(items, categories)`` number of ratings per category, for items rated at least once."""
+        item, _, category = self.component(name)
+        k = len(CATEGORY_LABELS[name])
+        counts = np.bincount(item * k + category, minlength=len(self.items) * k).reshape(len(self.items), k)
+        return counts[counts.sum(axis=1) > 0]
+
+
+def fleiss_kappa(counts: np.ndarray) -> float:
+    """Fleiss' kappa from ``(items, categories)`` rating counts.
+
+    Items may have different numbers of raters; those with fewer than two
+    ratings carry no agreement information and are skipped.
+    """
+    _require()
+    counts = np.asarray(counts, dtype=float)
+    m = counts.sum(axis=1)
+    counts, m = counts[m >= 2], m[m >= 2]
+    if not len(m):
+        return float("nan")
+    observed = (((counts * counts).sum(axis=1) - m) / (m * (m - 1))).mean()
+    shares = counts.sum(axis=0) / counts.sum()
+    expected = float((shares * shares).sum())
+    if expected == 1.0:
+        return float("nan")
+    return float((observed - expected) / (1.0 - expected))
+
+
+def coincidences(counts: np.ndarray) -> np.ndarray:
+    """Krippendorff's ``(categories, categories)`` coincidence matrix of pairable values."""
+    _require()
+    counts = np.asarray(counts, dtype=float)
+    m = counts.sum(axis=1)
+    counts, m = counts[m >= 2], m[m >= 2]
+    weighted = counts / (m - 1)[:, None]
+    return weighted.T @ counts - np.diag(weighted.sum(axis=0))
+
+
+def krippendorff_alpha(counts: np.ndarray, level: str = "ordinal") -> float:
+    """Krippendorff's alpha from ``(items, categories)`` counts; ``level`` is nominal, ordinal or interval.
+
+    Categories are taken to be in increasing order (and equally spaced for
+    the interval metric).
+    """
+    _require()
+    o = coincidences(counts)
+    totals = o.sum(axis=1)
+    n = totals.sum()
+    k = len(totals)
+    c, j = np.indices((k, k))
+    if level == "nominal":
+        delta = (c != j).astype(float)
+    elif level == "ordinal":
+        cumulative = np.concatenate([[0.0], np.cumsum(totals)])
+        low, high = np.minimum(c, j), np.maximum(c, j)
+        delta = (cumulative[high + 1] - cumulative[low] - (totals[c] + totals[j]) / 2) ** 2
+    elif level == "interval":
+        delta = (c - j).astype(float) ** 2
+    else:
+        raise ValueError(f"unknown measurement level {level!r}")
+    expected = (np.outer(totals, totals) * delta).sum() / (n - 1) if n > 1 else 0.0
+    if not expected:
+        return float("nan")
+    return float(1.0 - (o * delta).sum() / expected)
+
+
+def rater_disagreement(matrix: RatingMatrix, name: str) -> tuple[np.ndarray, np.ndarray]:
+    """``(shared, disagreement)``: items each pair of raters both graded, and the share they graded differently.
+
+    Accumulated over blocks of items, each a small dense (items x raters)
+    slab, so memory is bounded whatever the number of images.
+    """
+    _require()
+    item, rater, category = matrix.component(name)
+    r = len(matrix.raters)
+    shared = np.zeros((r, r))
+    agreed = np.zeros((r, r))
+    order = np.argsort(item, kind="stable")
+    item, rater, category = item[order], rater[order], category[order]
+    block = max(1, _BLOCK_CELLS // max(r, 1))
+    bounds = np.searchsorted(item, np.arange(0, len(matrix.items) + block, block))
+    for start, stop in zip(bounds[:-1], bounds[1:]):
+        if start == stop:
+            continue
+        rows = item[start:stop] - item[start]
+        slab = np.full((int(rows[-1]) + 1, r), -1, dtype=np.int8)
+        slab[rows, rater[start:stop]] = category[start:stop]
+        rated = (slab >= 0).astype(np.float32)
+        shared += rated.T @ rated
+        for value in range(len(CATEGORY_LABELS[name])):
+            same = (slab == value).astype(np.float32)
+            agreed += same.T @ same
+    with np.errstate(invalid="ignore", divide="ignore"):
+        disagreement = 1.0 - agreed / shared
+    return shared, disagreement
+
+
+@dataclass
+class ComponentVariability:
+    """Agreement among all raters on one Gardner component."""
+
+    component: str
+    categories: list[str]
+    items: int
+    ratings: int
+    fleiss_kappa: float
+    krippendorff_alpha: float
+    coincidence: list[list[float]]
+    rater_disagreement: list[list[float | None]]
+    rater_shared: list[list[int]]
+
+
+@dataclass
+class InterObserverSummary:
+    raters: list[str]
+    items: int
+    ratings: int
+    components: list[ComponentVariability]
+
+    def to_dict(self) -> dict[str, Any]:
+        return asdict(self)
+
+
+def analyse(matrix: RatingMatrix) -> InterObserverSummary:
+    """Kappa, alpha and both heatmaps for every component.
+
+    ``items`` of a component counts the images with at least two ratings of
+    it, the ones that say anything about agreement.
+    """
+    _require()
+    components = []
+    for name in COMPONENTS:
+        counts = matrix.category_counts(name)
+        pairable = counts[counts.sum(axis=1) >= 2]
+        o = coincidences(pairable)
+        total = o.sum()
+        shared, disagreement = rater_disagreement(matrix, name)
+        components.append(ComponentVariability(
+            component=name,
+            categories=CATEGORY_LABELS[name],
+            items=len(pairable),
+            ratings=int(pairable.sum()),
+            fleiss_kappa=fleiss_kappa(pairable),
+            krippendorff_alpha=krippendorff_alpha(pairable, "ordinal"),
+            coincidence=(o / total if total else o).round(4).tolist(),
+            rater_disagreement=[
+                [None if np.isnan(value) else round(float(value), 4) for value in row] for row in disagreement
+            ],
+            rater_shared=shared.astype(int).tolist(),
+        ))
+    return InterObserverSummary(matrix.raters, len(matrix.items), len(matrix), components)
+
+
+def registry_ratings(
+    registry: RunRegistry, run_ids: Iterable[str] | None = None, experts: bool = True
+) -> Iterable[tuple[str, str, str]]:
+    """``(rater, image name, grade)`` of each grading run and, with ``experts``, each reviewer.
+
+    AI raters are named "<model> run <id prefix>", experts "expert <reviewer>".
+    """
+    runs = {run["run_id"]: run for run in registry.runs()}
+    for run_id in run_ids if run_ids is not None else runs:
+        label = f"{runs[run_id]['model']} run {run_id[:8]}"
+        for _, image_name, grade in registry.grades(run_id):
+            yield label, image_name, grade
+    if experts:
+        for review in registry.reviews():
+            if review["expert_grade"]:
+                yield f"expert {review['reviewer'] or 'anonymous'}", review["image_name"], review["expert_grade"]
+
+
+def _heatmap(title: str, rows: list[str], columns: list[str], values: list[list[float | None]], scale: float) -> str:
+    header = "".join(f"<th>{escape(column)}</th>" for column in columns)
+    body = []
+    for label, row in zip(rows, values):
+        cells = []
+        for value in row:
+            if value is None:
+                cells.append("<td></td>")
+            else:
+                shade = min(value / scale, 1.0) if scale else 0.0
+                cells.append(f'<td style="background: rgba(220, 53, 69, {shade:.2f})">{value:.2f}</td>')
+        body.append(f"<tr><th>{escape(label)}</th>{''.join(cells)}</tr>")
+    return (
+        f'        <h3>{escape(title)}</h3>\n'
+        f'        <table class="heatmap"><tr><th></th>{header}</tr>\n'
+        + "".join(f"            {row}\n" for row in body)
+        + "        </table>\n"
+    )
+
+
+def render_section(summary: InterObserverSummary) -> str:
+    """The inter-observer section of the verification report."""
+    rows = "".join(
+        f"            <tr><th>{COMPONENT_TITLES[c.component]}</th><td>{c.fleiss_kappa:.3f}</td>"
+        f"<td>{c.krippendorff_alpha:.3f}</td><td>{c.items}</td><td>{c.ratings}</td></tr>\n"
+        for c in summary.components
+    )
+    parts = [
+        '\n    <div class="summary">\n',
+        "        <h2>Inter-Observer Agreement</h2>\n",
+        f"        <p>{len(summary.raters)} raters (experts and AI runs), {summary.items} images, "
+        f"{summary.ratings} grades.</p>\n",
+        "        <table>\n"
+        "            <tr><th>Component</th><th>Fleiss' kappa</th><th>Krippendorff's alpha (ordinal)</th>"
+        "<th>Images rated twice or more</th><th>Ratings</th></tr>\n",
+        rows,
+        "        </table>\n",
+    ]
+    for c in summary.components:
+        # Shade the category heatmap relative to its largest confusion.
+        confused = max((v for i, row in enumerate(c.coincidence) for j, v in enumerate(row) if i != j), default=0.0)
+        title = COMPONENT_TITLES[c.component]
+        parts.append(_heatmap(f"{title}: share of rating pairs by category", c.categories, c.categories,
+                              c.coincidence, confused))
+        parts.append(_heatmap(f"{title}: disagreement rate between raters", summary.raters, summary.raters,
+                              c.rater_disagreement, 1.0))
+    parts.append("    </div>\n")
+    return "".join(parts)
@@ -0,0 +1,250 @@
+"""Local stand-in for the Gemini ``generateContent`` endpoint.
+
+Answers with the same response shape as the real API
+(``candidates[0].content.parts[0].text``) after a configurable delay, so
+batch throughput can be measured offline::
+
+    python -m embryograding mock-server --port 8765 --latency 0.5
+
+Requests asking for ``responseMimeType: application/json`` get the same
+grades as a JSON object. ``token_latency`` adds a delay per output token,
+since generation time grows with response length. ``sample_noise`` answers
+that fraction of requests with a random grade instead, like sampling at a
+non-zero temperature, so repeated calls for one image can disagree.
+
+Multi-image requests (an ``Image <id>:`` text part before each image) get
+one answer block per image, each chosen by hashing that image;
+``drop_block_rate`` leaves that fraction of blocks out, as a model that
+skips an image would. ``promptTokenCount`` counts the request's text at
+four characters per token plus :data:`~embryograding.prompt.IMAGE_TOKENS`
+per image, so sending the prompt once per request shows up in the usage.
+
+It can also misbehave like the real quota system: ``throttle_rate`` answers
+a random fraction of requests with 429 ``RESOURCE_EXHAUSTED``, and
+``max_concurrent`` rejects requests beyond a fixed number in flight.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import json
+import random
+import re
+from dataclasses import dataclass
+from typing import Any
+
+from .parser import parse_response
+from .prompt import IMAGE_TOKENS
+
+CANNED_RESPONSES = (
+    "Grade: 3AA\nExpansion: 3\nICM: A\nTE: A\nQuality: Good\n"
+    "Explanation: The blastocyst is fully expanded within the zona pellucida, showing a tightly "
+    "packed inner cell mass and a cohesive trophectoderm layer.",
+    "Grade: 4AB\nExpansion: 4\nICM: A\nTE: B\nQuality: Good\n"
+    "Explanation: An expanded blastocyst with a thinned zona. The inner cell mass is compact while "
+    "the trophectoderm has fewer, looser cells.",
+    "Grade: 2BC\nExpansion: 2\nICM: B\nTE: C\nQuality: Fair\n"
+    "Explanation: The blastocoel occupies more than half of the embryo. The inner cell mass is loosely "
+    "grouped and the trophectoderm consists of very few large cells.",
+    "Grade: N/A\nExpansion: N/A\nICM: N/A\nTE: N/A\nQuality: Not Applicable\n"
+    "Explanation: This image displays a cleavage-stage embryo (approximately 8 cells), not a "
+    "blastocyst, so the Gardner Scale cannot be applied.",
+)
+
+CANNED_JSON = tuple(
+    json.dumps(parse_response(text).as_fields(), separators=(",", ":")) for text in CANNED_RESPONSES
+)
+
+_TEXT_PART = re.compile(rb'"text":"((?:[^"\\]|\\.)*)"')
+_IMAGE_DATA = re.compile(rb'"data":"([^"]*)"')
+_IMAGE_LABEL = re.compile(rb"^Image (.+):$")
+
+
+@dataclass
+class ServerStats:
+    requests: int = 0
+    throttled: int = 0
+    in_flight: int = 0
+    max_in_flight: int = 0
+
+
+class MockGeminiServer:
+    """An asyncio HTTP/1.1 server that fakes ``generateContent`` responses.
+
+    Each request gets one of ``CANNED_RESPONSES`` chosen by hashing the
+    request body, so the same image always receives the same grade.
+    """
+
+    def __init__(
+        self,
+        host: str = "127.0.0.1",
+        port: int = 0,
+        latency: float = 0.0,
+        latency_per_request: float = 0.0,
+        token_latency: float = 0.0,
+        throttle_rate: float = 0.0,
+        max_concurrent: int | None = None,
+        retry_after: float | None = None,
+        sample_noise: float = 0.0,
+        drop_block_rate: float = 0.0,
+        seed: int | None = None,
+    ) -> None:
+        self.host = host
+        self.port = port
+        self.latency = latency
+        self.latency_per_request = latency_per_request
+        self.token_latency = token_latency
+        self.throttle_rate = throttle_rate
+        self.max_concurrent = max_concurrent
+        self.retry_after = retry_after
+        self.sample_noise = sample_noise
+        self.drop_block_rate = drop_block_rate
+        self._random = random.Random(seed)
+        self.stats = ServerStats()
+        self._server: asyncio.Server | None = None
+        self._connections: dict[asyncio.Task[None], asyncio.StreamWriter] = {}
+
+    @property
+    def api_root(self) -> str:
+        return f"http://{self.host}:{self.port}/v1beta"
+
+    async def __aenter__(self) -> "MockGeminiServer":
+        await self.start()
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.stop()
+
+    async def start(self) -> None:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=2**20)
+        self.port = self._server.sockets[0].getsockname()[1]
+
+    async def stop(self) -> None:
+        if self._server is not None:
+            self._server.close()
+            # Idle keep-alive connections are not closed by Server.close();
+            # close them ourselves so their handlers exit cleanly.
+            for writer in self._connections.values():
+                writer.close()
+            if self._connections:
+                await asyncio.wait(list(self._connections))
+            await self._server.wait_closed()
+            self._server = None
+
+    async def serve_forever(self) -> None:
+        if self._server is None:
+            await self.start()
+        assert self._server is not None
+        await self._server.serve_forever()
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        task = asyncio.current_task()
+        assert task is not None
+        self._connections[task] = writer
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    return
+                request_line, headers = _parse_head(head)
+                body = await _read_body(reader, headers)
+                status, payload = await self._dispatch(request_line, body)
+                data = json.dumps(payload).encode("utf-8")
+                extra = ""
+                if status == 429 and self.retry_after is not None:
+                    extra = f"Retry-After: {self.retry_after:g}\r\n"
+                writer.write(
+                    f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n{extra}"
+                    f"Content-Type: application/json\r\nContent-Length: {len(data)}\r\n\r\n".encode("latin-1")
+                    + data
+                )
+                await writer.drain()
+        except ConnectionError:
+            pass
+        finally:
+            del self._connections[task]
+            writer.close()
+
+    async def _dispatch(self, request_line: str, body: bytes) -> tuple[int, dict[str, Any]]:
+        method, _, rest = request_line.partition(" ")
+        path = rest.split(" ", 1)[0]
+        if method != "POST" or not path.split("?", 1)[0].endswith(":generateContent"):
+            return 404, {"error": {"code": 404, "message": f"Unknown endpoint {path}"}}
+
+        stats = self.stats
+        stats.requests += 1
+        overloaded = self.max_concurrent is not None and stats.in_flight >= self.max_concurrent
+        if overloaded or (self.throttle_rate and self._random.random() < self.throttle_rate):
+            stats.throttled += 1
+            return 429, {"error": {
+                "code": 429,
+                "message": "Resource has been exhausted (e.g. check quota).",
+                "status": "RESOURCE_EXHAUSTED",
+            }}
+
+        stats.in_flight += 1
+        stats.max_in_flight = max(stats.max_in_flight, stats.in_flight)
+        try:
+            response = self.respond(body)
+            output_tokens = response["usageMetadata"]["candidatesTokenCount"]
+            delay = self.latency + self.latency_per_request * stats.in_flight + self.token_latency * output_tokens
+            if delay:
+                await asyncio.sleep(delay)
+            return 200, response
+        finally:
+            stats.in_flight -= 1
+
+    def _choose(self, canned: tuple[str, ...], data: bytes) -> str:
+        choice = hashlib.sha256(data).digest()[0]
+        if self.sample_noise and self._random.random() < self.sample_noise:
+            choice = self._random.randrange(len(canned))
+        return canned[choice % len(canned)]
+
+    def respond(self, body: bytes) -> dict[str, Any]:
+        """Build a ``generateContent`` response for a raw request body."""
+        json_mode = b'"responseMimeType":"application/json"' in body
+        canned = CANNED_JSON if json_mode else CANNED_RESPONSES
+        texts = _TEXT_PART.findall(body)
+        images = _IMAGE_DATA.findall(body)
+        labels = [match.group(1).decode() for match in map(_IMAGE_LABEL.match, texts[1:]) if match]
+        if len(images) > 1 and len(labels) == len(images):
+            blocks = [
+                (label, self._choose(canned, data))
+                for label, data in zip(labels, images)
+                if not (self.drop_block_rate and self._random.random() < self.drop_block_rate)
+            ]
+            if json_mode:
+                text = "[" + ",".join(f'{{"image":{json.dumps(label)},{answer[1:]}' for label, answer in blocks) + "]"
+            else:
+                text = "\n\n".join(f"Image: {label}\n{answer}" for label, answer in blocks)
+        else:
+            text = self._choose(canned, body)
+        prompt_tokens = sum(len(t) for t in texts) // 4 + sum(IMAGE_TOKENS + len(data) // 4096 for data in images)
+        return {
+            "candidates": [{
+                "content": {"parts": [{"text": text}], "role": "model"},
+                "finishReason": "STOP",
+                "index": 0,
+            }],
+            "usageMetadata": {
+                "promptTokenCount": prompt_tokens,
+                "candidatesTokenCount": len(text) // 4,
+                "totalTokenCount": prompt_tokens + len(text) // 4,
+            },
+        }
+
+
+def _parse_head(head: bytes) -> tuple[str, dict[str, str]]:
+    lines = head.decode("latin-1").split("\r\n")
+    headers = {}
+    for line in lines[1:]:
+        if line:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+    return lines[0], headers
+
+
+async def _read_body(reader: asyncio.StreamReader, headers: dict[str, str]) -> bytes:
+    return await reader.readexactly(int(headers.get("content-length", "0")))
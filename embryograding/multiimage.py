@@ -0,0 +1,179 @@
+"""Several images per ``generateContent`` request.
+
+Every single-image request repeats the whole Gardner prompt, and for small
+(preprocessed) images the prompt and per-request overhead cost more than
+the image. With ``images_per_request`` set, :class:`~embryograding.engine.BatchGrader`
+hands each image to an :class:`ImageBatcher` instead of sending it:
+
+1. Images are collected into groups of ``images_per_request``. A group
+   that does not fill up within ``linger`` seconds (the end of a batch,
+   or too little concurrency) is sent as it is.
+2. A group goes out as one request: the multi-image prompt once, then
+   an ``Image <id>:`` text part before each image's ``inline_data``.
+   ``maxOutputTokens`` is scaled by the group size.
+3. The answer is cut into per-image blocks by identifier
+   (:func:`~embryograding.parser.split_response`, or
+   :func:`~embryograding.parser.split_json_response` in JSON mode), and
+   each block becomes that image's response text.
+4. An image whose block is missing or lacks a field is graded again on
+   its own with the usual single-image request, as is a group of one.
+
+Token usage and request bytes are reported per request; each image in it
+gets an equal share, added to its row even when it is graded again on its
+own, so batch totals stay exact.
+"""
+
+from __future__ import annotations
+
+import asyncio
+from dataclasses import dataclass, field
+from typing import Any, Awaitable, Callable
+
+from .client import encode_request, response_text
+from .parser import ResponseValidationError, parse_json_response, parse_response, split_json_response, split_response
+from .prompt import (
+    MULTI_IMAGE_JSON_PROMPT,
+    MULTI_IMAGE_PROMPT,
+    build_multi_image_request_body,
+    multi_image_generation_config,
+)
+
+# Added to results rows in multi-image mode: images that shared the request.
+MULTI_IMAGE_FIELDS = ["request_images"]
+
+Send = Callable[[bytes, str, int], Awaitable[dict[str, Any]]]
+
+
+@dataclass
+class MultiImageStats:
+    requests: int = 0
+    images: int = 0
+    fallbacks: int = 0
+
+    @property
+    def images_per_request(self) -> float:
+        return self.images / self.requests if self.requests else 0.0
+
+
+@dataclass
+class BlockAnswer:
+    """One image's share of a multi-image request; ``text`` is ``None`` when it must be graded alone."""
+
+    text: str | None
+    request_images: int
+    bytes_sent: int
+    input_tokens: int
+    output_tokens: int
+
+
+@dataclass
+class _Pending:
+    image: bytes | memoryview
+    mime_type: str
+    future: asyncio.Future[BlockAnswer] = field(repr=False)
+
+
+def usable_block(text: str, json_mode: bool = False) -> bool:
+    """Whether a block parses with every field present (inconsistent grades still count as answers)."""
+    if json_mode:
+        try:
+            parse_json_response(text)
+        except ResponseValidationError:
+            return False
+        return True
+    return not any(error.startswith("missing") for error in parse_response(text).errors)
+
+
+def _share(total: int, parts: int, index: int) -> int:
+    """``index``-th of ``parts`` integer shares of ``total`` that add up to it."""
+    return total // parts + (1 if index < total % parts else 0)
+
+
+class ImageBatcher:
+    """Collect images into multi-image requests sent through ``send``.
+
+    ``send(body, prompt, images)`` posts an encoded request and returns
+    the decoded response (the grader passes its scheduler-aware sender).
+    :meth:`submit` resolves to the image's :class:`BlockAnswer`.
+    """
+
+    def __init__(
+        self,
+        send: Send,
+        images_per_request: int,
+        generation_config: dict[str, Any] | None = None,
+        json_mode: bool = False,
+        linger: float = 0.05,
+    ) -> None:
+        if images_per_request < 2:
+            raise ValueError("images_per_request must be at least 2")
+        self.send = send
+        self.images_per_request = images_per_request
+        self.json_mode = json_mode
+        self.prompt = MULTI_IMAGE_JSON_PROMPT if json_mode else MULTI_IMAGE_PROMPT
+        self.generation_config = multi_image_generation_config(images_per_request, generation_config, json_mode)
+        self.linger = linger
+        self.stats = MultiImageStats()
+        self._group: list[_Pending] = []
+        self._timer: asyncio.TimerHandle | None = None
+        self._sending: set[asyncio.Task[None]] = set()
+
+    async def submit(self, image: bytes | memoryview, mime_type: str) -> BlockAnswer:
+        loop = asyncio.get_running_loop()
+        pending = _Pending(image, mime_type, loop.create_future())
+        self._group.append(pending)
+        if len(self._group) >= self.images_per_request:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.linger, self._flush)
+        return await pending.future
+
+    def _flush(self) -> None:
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+        group, self._group = self._group, []
+        if len(group) == 1:
+            if not group[0].future.done():
+                group[0].future.set_result(BlockAnswer(None, 1, 0, 0, 0))
+        elif group:
+            task = asyncio.create_task(self._send_group(group))
+            self._sending.add(task)
+            task.add_done_callback(self._sending.discard)
+
+    async def _send_group(self, group: list[_Pending]) -> None:
+        identifiers = [str(i + 1) for i in range(len(group))]
+        images = [(identifier, p.image, p.mime_type) for identifier, p in zip(identifiers, group)]
+        body = encode_request(build_multi_image_request_body(images, self.prompt, self.generation_config))
+        try:
+            data = await self.send(body, self.prompt, len(group))
+            text = response_text(data)
+        except asyncio.CancelledError:
+            for pending in group:
+                pending.future.cancel()
+            raise
+        except Exception as exc:
+            for pending in group:
+                if not pending.future.done():
+                    pending.future.set_exception(exc)
+            return
+        self.stats.requests += 1
+        self.stats.images += len(group)
+        blocks = (split_json_response if self.json_mode else split_response)(text, identifiers)
+        usage = data.get("usageMetadata", {})
+        for index, (identifier, pending) in enumerate(zip(identifiers, group)):
+            if pending.future.done():
+                continue
+            block = blocks.get(identifier)
+            if block is None or not usable_block(block, self.json_mode):
+                self.stats.fallbacks += 1
+                block = None
+            pending.future.set_result(
+                BlockAnswer(
+                    block,
+                    len(group),
+                    _share(len(body), len(group), index),
+                    _share(usage.get("promptTokenCount", 0), len(group), index),
+                    _share(usage.get("candidatesTokenCount", 0), len(group), index),
+                )
+            )
@@ -0,0 +1,353 @@
+"""Nearest-neighbour search over per-image feature vectors.
+
+An embryologist looking at a borderline grade wants to see the most
+similar embryos graded before, with their grades. :class:`NeighbourIndex`
+indexes the descriptor rows of a results store
+(:class:`~embryograding.features.FeatureMatrix`), standardised per
+column, and answers top-``k`` queries in Euclidean distance.
+
+Two layouts, chosen by size (``kind="auto"``):
+
+``exact``
+    Brute force: one matrix-vector product against every vector, in
+    chunks. Exact, and fast enough up to about a hundred thousand rows.
+``ivfpq``
+    An inverted file with product-quantised residuals (IVF-PQ, as in
+    FAISS): k-means splits the vectors into ``lists`` cells; each vector is
+    stored in its cell as ``subspaces`` one-byte codes of its residual from
+    the cell centroid. A query scans the ``nprobe`` nearest cells using
+    per-cell distance lookup tables, then re-ranks the best candidates
+    with their exact vectors.
+
+Everything lives in an ``index/`` directory next to the features, as raw
+arrays opened with ``np.memmap``, so opening an index of a million rows
+costs nothing until it is queried:
+
+``index.json``
+    Format version, layout, the column means and scales.
+``vectors.f32`` / ``ids.i8``
+    The standardised vectors and the store row each one belongs to (in
+    cell order for ``ivfpq``).
+``norms.f32``
+    ``exact`` only: squared vector norms.
+``centroids.f32`` / ``codebooks.f32`` / ``codes.u8`` / ``offsets.i8``
+    ``ivfpq`` only: cell centroids, the 256 PQ centroids per subspace (as
+    one 256 x dim matrix, column blocks per subspace), the codes, and
+    where each cell's rows start.
+
+Requires NumPy.
+"""
+
+from __future__ import annotations
+
+import json
+import math
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Sequence
+
+from .features import DONE, FeatureMatrix
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+INDEX_FORMAT = "embryograding-index"
+INDEX_VERSION = 1
+
+# Stores up to this many vectors are searched exactly by kind="auto".
+EXACT_LIMIT = 100_000
+
+_CHUNK = 65536
+
+
+def _require() -> None:
+    if np is None:
+        raise ImportError("the neighbour index requires NumPy (pip install numpy)")
+
+
+def _sq_distances(x: np.ndarray, centroids: np.ndarray, centroid_norms: np.ndarray) -> np.ndarray:
+    """Squared distances of rows of ``x`` to every centroid, up to the constant ``|x|^2``."""
+    return centroid_norms[None, :] - 2.0 * (x @ centroids.T)
+
+
+def _assign(x: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Index of the nearest centroid for every row of ``x``, in chunks."""
+    norms = (centroids * centroids).sum(axis=1)
+    labels = np.empty(len(x), dtype=np.int64)
+    for first in range(0, len(x), _CHUNK):
+        labels[first:first + _CHUNK] = _sq_distances(x[first:first + _CHUNK], centroids, norms).argmin(axis=1)
+    return labels
+
+
+def kmeans(x: np.ndarray, k: int, iterations: int = 10, seed: int = 0) -> np.ndarray:
+    """Lloyd's k-means from ``k`` random rows; empty clusters are re-seeded."""
+    _require()
+    rng = np.random.default_rng(seed)
+    x = np.asarray(x, dtype=np.float32)
+    centroids = x[rng.choice(len(x), size=k, replace=len(x) < k)].copy()
+    for _ in range(iterations):
+        labels = _assign(x, centroids)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids, dtype=np.float64)
+        # One bincount per column; much faster than np.add.at.
+        for column in range(x.shape[1]):
+            sums[:, column] = np.bincount(labels, weights=x[:, column], minlength=k)
+        empty = counts == 0
+        centroids = np.where(empty[:, None], centroids, sums / np.maximum(counts, 1)[:, None]).astype(np.float32)
+        if empty.any():
+            centroids[empty] = x[rng.choice(len(x), size=int(empty.sum()))]
+    return centroids
+
+
+@dataclass
+class Neighbour:
+    """One search result: a store row, its distance and its grades."""
+
+    row: int
+    distance: float
+    image_name: str = ""
+    gardner_grade: str = ""
+    expansion: str = ""
+    icm_quality: str = ""
+    te_quality: str = ""
+    image_path: str = ""
+    expert_grades: list[str] = field(default_factory=list)
+
+    def to_dict(self) -> dict[str, Any]:
+        return {name: getattr(self, name) for name in self.__dataclass_fields__}
+
+
+class NeighbourIndex:
+    """A built index directory, memory-mapped read-only.
+
+    Build one with :meth:`build`; open an existing one by constructing it
+    with the directory. ``nprobe`` (cells scanned) and ``rerank`` (exact
+    re-ranking candidates per result) trade speed for recall in ``ivfpq``
+    indexes.
+    """
+
+    def __init__(self, path: str | Path, nprobe: int | None = None, rerank: int = 8) -> None:
+        _require()
+        self.path = Path(path)
+        meta = json.loads((self.path / "index.json").read_text(encoding="utf-8"))
+        if meta.get("format") != INDEX_FORMAT or meta.get("version") != INDEX_VERSION:
+            raise ValueError(f"{self.path} is not an embryograding neighbour index")
+        self.kind: str = meta["kind"]
+        self.dim: int = meta["dim"]
+        self.count: int = meta["count"]
+        self.mean = np.asarray(meta["mean"], dtype=np.float32)
+        self.scale = np.asarray(meta["scale"], dtype=np.float32)
+        self.nprobe = nprobe or meta.get("nprobe", 0)
+        self.rerank = rerank
+        self.vectors = self._map("vectors.f32", np.float32, (self.count, self.dim))
+        self.ids = self._map("ids.i8", np.int64, (self.count,))
+        if self.kind == "exact":
+            self.norms = self._map("norms.f32", np.float32, (self.count,))
+        else:
+            self.lists: int = meta["lists"]
+            self.subspaces: int = meta["subspaces"]
+            self.centroids = self._map("centroids.f32", np.float32, (self.lists, self.dim))
+            self.centroid_norms = (self.centroids * self.centroids).sum(axis=1)
+            self.codebooks = self._map("codebooks.f32", np.float32, (256, self.dim))
+            self.codes = self._map("codes.u8", np.uint8, (self.count, self.subspaces))
+            self.offsets = np.array(self._map("offsets.i8", np.int64, (self.lists + 1,)))
+            self.blocks = np.array_split(np.arange(self.dim), self.subspaces)
+
+    def _map(self, name: str, dtype: type, shape: tuple[int, ...]) -> np.ndarray:
+        if not shape[0]:
+            return np.zeros(shape, dtype=dtype)
+        return np.memmap(self.path / name, dtype=dtype, mode="r", shape=shape)
+
+    def __len__(self) -> int:
+        return self.count
+
+    # -- building --------------------------------------------------------
+
+    @classmethod
+    def build(
+        cls,
+        path: str | Path,
+        vectors: np.ndarray,
+        ids: Sequence[int] | np.ndarray | None = None,
+        kind: str = "auto",
+        lists: int | None = None,
+        subspaces: int = 8,
+        nprobe: int = 24,
+        train_size: int = 65536,
+        seed: int = 0,
+    ) -> "NeighbourIndex":
+        """Write an index of ``vectors`` (one row per item, ``ids`` the store rows) to ``path``.
+
+        ``lists`` defaults to about ``4 * sqrt(n)`` cells; k-means for the
+        cells and the PQ codebooks is trained on at most ``train_size``
+        sampled rows.
+        """
+        _require()
+        raw = np.asarray(vectors, dtype=np.float32)
+        ids = np.arange(len(raw), dtype=np.int64) if ids is None else np.asarray(ids, dtype=np.int64)
+        if kind == "auto":
+            kind = "exact" if len(raw) <= EXACT_LIMIT else "ivfpq"
+        if kind not in ("exact", "ivfpq"):
+            raise ValueError(f"unknown index kind {kind!r}")
+        path = Path(path)
+        path.mkdir(parents=True, exist_ok=True)
+        (path / "index.json").unlink(missing_ok=True)
+        mean = raw.mean(axis=0) if len(raw) else np.zeros(raw.shape[1], dtype=np.float32)
+        scale = raw.std(axis=0) if len(raw) else np.ones(raw.shape[1], dtype=np.float32)
+        scale[scale == 0] = 1.0
+        x = (raw - mean) / scale
+        meta: dict[str, Any] = {
+            "format": INDEX_FORMAT,
+            "version": INDEX_VERSION,
+            "kind": kind,
+            "dim": int(x.shape[1]),
+            "count": len(x),
+            "mean": mean.tolist(),
+            "scale": scale.tolist(),
+        }
+        if kind == "ivfpq":
+            rng = np.random.default_rng(seed)
+            sample = x[rng.choice(len(x), size=min(train_size, len(x)), replace=False)]
+            lists = lists or max(1, min(len(x) // 32, int(4 * math.sqrt(len(x)))))
+            subspaces = min(subspaces, x.shape[1])
+            centroids = kmeans(sample, lists, seed=seed)
+            cells = _assign(x, centroids)
+            order = np.argsort(cells, kind="stable")
+            x, ids, cells = x[order], ids[order], cells[order]
+            offsets = np.concatenate([[0], np.cumsum(np.bincount(cells, minlength=lists))])
+
+            # PQ on residuals from the cell centroids, one codebook per block of columns.
+            blocks = np.array_split(np.arange(x.shape[1]), subspaces)
+            codebooks = np.zeros((256, x.shape[1]), dtype=np.float32)
+            codes = np.empty((len(x), subspaces), dtype=np.uint8)
+            # 256 centroids per subspace need far fewer training rows than the cells.
+            pq_sample = sample[:256 * 64]
+            sample_residuals = pq_sample - centroids[_assign(pq_sample, centroids)]
+            for j, block in enumerate(blocks):
+                codebooks[:, block] = kmeans(sample_residuals[:, block], 256, seed=seed + j + 1)
+                for first in range(0, len(x), _CHUNK):
+                    residual = x[first:first + _CHUNK, block] - centroids[cells[first:first + _CHUNK]][:, block]
+                    codes[first:first + _CHUNK, j] = _assign(residual, codebooks[:, block])
+            centroids.tofile(path / "centroids.f32")
+            codebooks.tofile(path / "codebooks.f32")
+            codes.tofile(path / "codes.u8")
+            offsets.astype(np.int64).tofile(path / "offsets.i8")
+            meta.update(lists=lists, subspaces=subspaces, nprobe=min(nprobe, lists))
+        else:
+            (x * x).sum(axis=1).astype(np.float32).tofile(path / "norms.f32")
+        x.astype(np.float32).tofile(path / "vectors.f32")
+        ids.tofile(path / "ids.i8")
+        # The header goes last: a half-written index is never opened.
+        (path / "index.json").write_text(json.dumps(meta) + "\n", encoding="utf-8")
+        return cls(path)
+
+    @classmethod
+    def build_from_store(cls, store_path: str | Path, kind: str = "auto", **options: Any) -> "NeighbourIndex":
+        """Index the computed feature rows of a results store into ``<store>/index``."""
+        _require()
+        features = FeatureMatrix.open(store_path)
+        ids = np.flatnonzero(features.done == DONE)
+        return cls.build(Path(store_path) / "index", features.matrix[ids], ids, kind, **options)
+
+    # -- searching -------------------------------------------------------
+
+    def standardise(self, vectors: np.ndarray) -> np.ndarray:
+        """Map raw feature vectors into the index's space."""
+        return ((np.asarray(vectors, dtype=np.float32) - self.mean) / self.scale).astype(np.float32)
+
+    def search(self, query: np.ndarray, k: int = 10, standardised: bool = False) -> tuple[np.ndarray, np.ndarray]:
+        """Store rows and Euclidean distances of the ``k`` nearest vectors, nearest first.
+
+        ``query`` is one raw feature vector (or already standardised with
+        ``standardised=True``). Fewer than ``k`` results come back when the
+        index (or, for ``ivfpq``, the scanned cells) holds fewer.
+        """
+        q = np.asarray(query, dtype=np.float32).reshape(-1)
+        if not standardised:
+            q = self.standardise(q)
+        if not self.count:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+        if self.kind == "exact":
+            positions, squared = self._search_exact(q, k)
+        else:
+            positions, squared = self._search_ivfpq(q, k)
+        return self.ids[positions], np.sqrt(np.maximum(squared, 0.0))
+
+    def _search_exact(self, q: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        best_pos = np.zeros(0, dtype=np.int64)
+        best = np.zeros(0, dtype=np.float32)
+        for first in range(0, self.count, 1 << 18):
+            chunk = self.vectors[first:first + (1 << 18)]
+            d = self.norms[first:first + len(chunk)] - 2.0 * (chunk @ q)
+            top = np.argpartition(d, k - 1)[:k] if len(d) > k else np.arange(len(d))
+            best_pos = np.concatenate([best_pos, top + first])
+            best = np.concatenate([best, d[top]])
+        order = np.argsort(best, kind="stable")[:k]
+        return best_pos[order], best[order] + float(q @ q)
+
+    def _search_ivfpq(self, q: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        nprobe = min(self.nprobe or 1, self.lists)
+        coarse = _sq_distances(q[None], self.centroids, self.centroid_norms)[0]
+        probes = np.argpartition(coarse, nprobe - 1)[:nprobe] if nprobe < self.lists else np.arange(self.lists)
+        starts, ends = self.offsets[probes], self.offsets[probes + 1]
+        sizes = ends - starts
+        if not sizes.sum():
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.float32)
+
+        # Lookup tables: squared distance of each probe's query residual,
+        # per subspace, to each of the 256 codebook centroids.
+        residuals = q[None, :] - self.centroids[probes]
+        tables = np.empty((nprobe, self.subspaces, 256), dtype=np.float32)
+        for j, block in enumerate(self.blocks):
+            diff = residuals[:, None, block] - self.codebooks[None, :, block]
+            tables[:, j] = (diff * diff).sum(axis=2)
+
+        positions = np.concatenate([np.arange(s, e) for s, e in zip(starts.tolist(), ends.tolist())])
+        probe_of = np.repeat(np.arange(nprobe), sizes)
+        # One gather from the flattened tables: entry (probe, subspace, code).
+        slots = (probe_of * (self.subspaces * 256))[:, None] + np.arange(0, self.subspaces * 256, 256)
+        approx = tables.ravel()[slots + self.codes[positions]].sum(axis=1)
+
+        # Re-rank the best approximate candidates with their exact vectors.
+        keep = min(len(approx), max(k * self.rerank, k))
+        candidates = np.sort(positions[np.argpartition(approx, keep - 1)[:keep]])
+        diff = np.asarray(self.vectors[candidates]) - q
+        exact = (diff * diff).sum(axis=1)
+        order = np.argsort(exact, kind="stable")[:k]
+        return candidates[order], exact[order]
+
+
+def similar(
+    store_path: str | Path,
+    query: np.ndarray,
+    k: int = 10,
+    index: NeighbourIndex | None = None,
+    exclude: int | None = None,
+    registry: Any = None,
+) -> list[Neighbour]:
+    """The ``k`` store rows nearest a raw feature vector, with their grades.
+
+    ``exclude`` drops one store row (the query's own). With a
+    :class:`~embryograding.registry.RunRegistry`, each neighbour's expert
+    grades are filled in from its reviews.
+    """
+    from .store import ResultStore
+
+    index = index or NeighbourIndex(Path(store_path) / "index")
+    rows, distances = index.search(query, k + (exclude is not None))
+    pairs = [(int(r), float(d)) for r, d in zip(rows, distances) if r != exclude][:k]
+    with ResultStore(store_path) as store:
+        records = store.take([row for row, _ in pairs])
+    neighbours = []
+    for (row, distance), record in zip(pairs, records):
+        neighbour = Neighbour(row, round(distance, 4), **{
+            name: record[name]
+            for name in ("image_name", "gardner_grade", "expansion", "icm_quality", "te_quality", "image_path")
+        })
+        if registry is not None:
+            reviews = registry.reviews(image=neighbour.image_name)
+            neighbour.expert_grades = [review["expert_grade"] for review in reviews if review["expert_grade"]]
+        neighbours.append(neighbour)
+    return neighbours
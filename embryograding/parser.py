@@ -0,0 +1,294 @@
+"""Parse Gardner Scale fields out of a Gemini text response.
+
+Replaces the six independent regexes of ``parseGeminiResponse`` in
+``app.html`` with a single scan: one compiled pattern finds every
+``Label: value`` line, values are normalised into enums (the model spells
+"not applicable" a dozen ways: ``N/A``, ``Not Applicable``, ``N/A (Not a
+blastocyst)``, ``Cannot be assessed by Gardner Scale``...), and the overall
+grade is checked against its expansion / ICM / TE components.
+
+JSON-mode responses (see :func:`~embryograding.prompt.json_generation_config`)
+go through :func:`parse_json_response`, which shares the same normalisation
+and checks.
+
+Responses to multi-image requests are first cut into one block per image
+by :func:`split_response` (or :func:`split_json_response`); each block then
+parses like a single-image response.
+"""
+
+from __future__ import annotations
+
+import enum
+import functools
+import json
+import re
+from dataclasses import dataclass, field
+from typing import Sequence
+
+try:
+    import orjson
+
+    _json_loads = orjson.loads
+except ImportError:  # pragma: no cover - optional dependency
+    _json_loads = json.loads
+
+
+class ResponseValidationError(ValueError):
+    """A response that is missing fields or contradicts itself."""
+
+    def __init__(self, errors: list[str]) -> None:
+        super().__init__("; ".join(errors))
+        self.errors = errors
+
+
+class CellGrade(str, enum.Enum):
+    """ICM / TE quality on the Gardner A-C scale."""
+
+    A = "A"
+    B = "B"
+    C = "C"
+    NOT_APPLICABLE = "N/A"
+
+
+class Quality(str, enum.Enum):
+    EXCELLENT = "Excellent"
+    GOOD = "Good"
+    FAIR = "Fair"
+    POOR = "Poor"
+    NOT_APPLICABLE = "Not Applicable"
+
+
+NOT_APPLICABLE = "N/A"
+
+# One pattern for every field label, anchored at line starts. Tolerates
+# markdown bold (``**Grade:**``), bullets and "Brief explanation:".
+_FIELD = re.compile(
+    r"^[ \t*\-]*(grade|expansion|icm|te|quality|(?:brief\s+)?explanation)\**[ \t]*:\**[ \t]*(.*)$",
+    re.I | re.M,
+)
+_GRADE = re.compile(r"([1-6])\s*([ABC])\s*([ABC])\b")
+_CELL = re.compile(r"([ABC])\b")
+_EXPANSION = re.compile(r"([1-6])\b")
+_NOT_APPLICABLE = re.compile(
+    r"n/?a\b|not\s+(?:applicable|a\s+blastocyst|assessable|gradable)|cannot|can't|ungradable|unable|none",
+    re.I,
+)
+# "Image: 3", "Image 3:", "### Image 3", "**Image 3**" on a line of its own.
+_BLOCK = re.compile(r"^[ \t#*\-]*image[ \t]*[:#]?[ \t*]*([\w.\-]+)[ \t*:]*$", re.I | re.M)
+_QUALITIES = {q.value.lower(): q for q in Quality if q is not Quality.NOT_APPLICABLE}
+
+
+@dataclass(slots=True)
+class GardnerResult:
+    """A parsed and normalised grading response.
+
+    ``expansion`` is ``None`` and ``icm`` / ``te`` are
+    :attr:`CellGrade.NOT_APPLICABLE` for non-blastocysts; ``grade`` is the
+    canonical ``"4AA"`` form or ``"N/A"``. ``errors`` lists missing fields
+    and inconsistencies; the result is still usable when it is non-empty.
+    """
+
+    grade: str
+    expansion: int | None
+    icm: CellGrade
+    te: CellGrade
+    quality: Quality
+    explanation: str
+    errors: list[str] = field(default_factory=list)
+
+    @property
+    def is_blastocyst(self) -> bool:
+        return self.grade != NOT_APPLICABLE
+
+    @property
+    def valid(self) -> bool:
+        return not self.errors
+
+    def as_fields(self) -> dict[str, str]:
+        """The display strings shown in the app and written to results CSVs."""
+        return {
+            "grade": self.grade,
+            "expansion": NOT_APPLICABLE if self.expansion is None else str(self.expansion),
+            "icm": self.icm.value,
+            "te": self.te.value,
+            "quality": self.quality.value,
+            "explanation": self.explanation,
+        }
+
+
+# The model only ever produces a handful of distinct values per field, so
+# normalisation is memoised and costs a dict lookup after warm-up.
+
+
+@functools.lru_cache(maxsize=4096)
+def _grade(value: str) -> tuple[str, str | None]:
+    match = _GRADE.match(value.upper())
+    if match:
+        return "".join(match.groups()), None
+    if _NOT_APPLICABLE.match(value) or not value:
+        return NOT_APPLICABLE, None
+    return NOT_APPLICABLE, f"unrecognised grade {value!r}"
+
+
+@functools.lru_cache(maxsize=4096)
+def _expansion(value: str) -> tuple[int | None, str | None]:
+    match = _EXPANSION.match(value)
+    if match:
+        return int(match.group(1)), None
+    if _NOT_APPLICABLE.match(value):
+        return None, None
+    return None, f"unrecognised expansion {value!r}"
+
+
+@functools.lru_cache(maxsize=4096)
+def _cell(value: str) -> tuple[CellGrade, str | None]:
+    match = _CELL.match(value.upper())
+    if match:
+        return CellGrade(match.group(1)), None
+    if _NOT_APPLICABLE.match(value):
+        return CellGrade.NOT_APPLICABLE, None
+    return CellGrade.NOT_APPLICABLE, f"unrecognised cell grade {value!r}"
+
+
+@functools.lru_cache(maxsize=4096)
+def _quality(value: str) -> tuple[Quality, str | None]:
+    word = value.split(None, 1)[0].strip(".,;:()").lower() if value else ""
+    if word in _QUALITIES:
+        return _QUALITIES[word], None
+    if _NOT_APPLICABLE.search(value):
+        return Quality.NOT_APPLICABLE, None
+    return Quality.NOT_APPLICABLE, f"unrecognised quality {value!r}"
+
+
+def parse_response(text: str, strict: bool = False) -> GardnerResult:
+    """Parse a Gemini response in one pass over ``text``.
+
+    With ``strict=True`` a :class:`ResponseValidationError` is raised when
+    the response is missing fields or its grade contradicts its components.
+    """
+    values: dict[str, str] = {}
+    explanation = None
+    for match in _FIELD.finditer(text):
+        label = match.group(1).lower()
+        if label.endswith("explanation"):
+            if explanation is None:
+                # The explanation may wrap onto following lines; it runs to
+                # the next blank line (as in the browser parser) or label.
+                start = match.start(2)
+                end = text.find("\n\n", start)
+                explanation = text[start:] if end < 0 else text[start:end]
+        elif label not in values:
+            values[label] = match.group(2).strip()
+
+    if explanation is not None:
+        following = _FIELD.search(explanation)
+        if following:
+            explanation = explanation[:following.start()]
+        explanation = explanation.strip()
+
+    return _normalise(values, explanation, text, strict)
+
+
+def _normalise(values: dict[str, str], explanation: str | None, text: str, strict: bool) -> GardnerResult:
+    errors = [f"missing {label}" for label in ("grade", "expansion", "icm", "te", "quality") if label not in values]
+    grade, grade_error = _grade(values.get("grade", ""))
+    expansion, expansion_error = _expansion(values.get("expansion", ""))
+    icm, icm_error = _cell(values.get("icm", ""))
+    te, te_error = _cell(values.get("te", ""))
+    quality, quality_error = _quality(values.get("quality", ""))
+    for label, error in (
+        ("grade", grade_error),
+        ("expansion", expansion_error),
+        ("icm", icm_error),
+        ("te", te_error),
+        ("quality", quality_error),
+    ):
+        if error and label in values:
+            errors.append(error)
+    if explanation is None:
+        errors.append("missing explanation")
+        explanation = text.strip()
+
+    if grade != NOT_APPLICABLE:
+        components = f"{expansion or '?'}{icm.value[0]}{te.value[0]}"
+        if components != grade:
+            errors.append(f"grade {grade} does not match components {components}")
+        if quality is Quality.NOT_APPLICABLE:
+            errors.append(f"grade {grade} has no quality")
+    elif expansion is not None or icm is not CellGrade.NOT_APPLICABLE or te is not CellGrade.NOT_APPLICABLE:
+        errors.append("grade is N/A but components are graded")
+
+    if strict and errors:
+        raise ResponseValidationError(errors)
+    return GardnerResult(grade, expansion, icm, te, quality, explanation, errors)
+
+
+_JSON_FIELDS = ("grade", "expansion", "icm", "te", "quality", "explanation")
+
+
+def parse_json_response(text: str, strict: bool = False) -> GardnerResult:
+    """Parse a JSON-mode response.
+
+    Raises :class:`ResponseValidationError` when ``text`` is not a JSON
+    object with every schema field (e.g. output cut off at
+    ``maxOutputTokens``), so callers can fall back to :func:`parse_response`.
+    """
+    try:
+        data = _json_loads(text)
+    except ValueError as exc:
+        raise ResponseValidationError([f"invalid JSON: {exc}"]) from None
+    if not isinstance(data, dict):
+        raise ResponseValidationError(["JSON response is not an object"])
+    missing = [name for name in _JSON_FIELDS if not isinstance(data.get(name), (str, int))]
+    if missing:
+        raise ResponseValidationError([f"missing {name}" for name in missing])
+    values = {name: str(data[name]).strip() for name in _JSON_FIELDS[:-1]}
+    return _normalise(values, str(data["explanation"]).strip(), text, strict)
+
+
+def split_response(text: str, identifiers: Sequence[str]) -> dict[str, str]:
+    """Cut a multi-image text response into its per-image blocks.
+
+    A block runs from its ``Image: <id>`` header line to the next header.
+    Identifiers that were not asked for are ignored (so an explanation
+    starting "Image quality is..." does not open a block), images with no
+    block are left out, and the first block of a repeated identifier wins.
+    """
+    wanted = set(identifiers)
+    headers = [match for match in _BLOCK.finditer(text) if match.group(1) in wanted]
+    blocks: dict[str, str] = {}
+    for header, following in zip(headers, headers[1:] + [None]):
+        end = following.start() if following is not None else len(text)
+        blocks.setdefault(header.group(1), text[header.end():end].strip())
+    return blocks
+
+
+def split_json_response(text: str, identifiers: Sequence[str]) -> dict[str, str]:
+    """Cut a multi-image JSON response (an array of objects with ``image``) into per-image JSON objects.
+
+    Each block is re-serialised without ``image`` so it parses with
+    :func:`parse_json_response`. Output that is not a JSON array (e.g. cut
+    off at ``maxOutputTokens``) gives no blocks.
+    """
+    try:
+        data = _json_loads(text)
+    except ValueError:
+        return {}
+    if not isinstance(data, list):
+        return {}
+    wanted = set(identifiers)
+    blocks: dict[str, str] = {}
+    for item in data:
+        if isinstance(item, dict) and str(item.get("image")) in wanted:
+            fields = {name: value for name, value in item.items() if name != "image"}
+            blocks.setdefault(str(item["image"]), json.dumps(fields, separators=(",", ":")))
+    return blocks
+
+
+def parse_gemini_response(text: str) -> dict[str, str]:
+    """Extract grade, expansion, ICM, TE, quality and explanation from ``text``.
+
+    Same keys as ``parseGeminiResponse`` in ``app.html``, with values
+    normalised by :func:`parse_response`.
+    """
+    return parse_response(text).as_fields()
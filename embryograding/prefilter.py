@@ -0,0 +1,349 @@
+"""Local blastocyst / non-blastocyst pre-filter.
+
+About half of a typical Kaggle batch is day-3 cleavage-stage embryos, which
+the Gardner scale does not apply to: Gemini answers ``N/A`` after a full
+round trip. A small logistic model over cheap image features predicts in
+a few milliseconds per image on the CPU whether an embryo is a
+blastocyst, and :class:`~embryograding.engine.BatchGrader` only sends the
+likely ones.
+
+Features are computed in NumPy for a whole batch of downscaled grayscale
+frames at once, in rings around the zona found by
+:func:`~embryograding.roi.detect_circles`. A blastocyst has a smooth
+fluid-filled cavity inside a thin trophectoderm ring; a cleavage-stage
+embryo has a handful of large blastomeres whose boundaries fill the
+interior with edges. For each ring (in units of the zona radius) the model
+sees the mean and spread of the normalised intensity and the mean gradient
+magnitude.
+
+The decision threshold is not 0.5: :func:`train` picks the highest score
+threshold that still routes ``recall`` of the training blastocysts to the
+grader, since skipping a blastocyst loses a grade while sending a
+cleavage-stage embryo only costs a call.
+
+Requires NumPy and Pillow.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import json
+import os
+import re
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import TYPE_CHECKING, AsyncIterable, AsyncIterator, Iterable, Sequence
+
+from .roi import DetectorConfig, annotate_in_batches, detect_circles, load_frames
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+if TYPE_CHECKING:
+    from .engine import ImageJob
+
+MODEL_FORMAT = "embryograding-prefilter"
+MODEL_VERSION = 1
+
+# Ring boundaries in units of the detected zona radius: cavity centre,
+# inner cavity, trophectoderm band, zona, just outside, background.
+RING_EDGES = (0.35, 0.7, 0.9, 1.1, 1.4)
+RINGS = ("centre", "inner", "band", "zona", "rim", "outside")
+FEATURE_NAMES = [
+    *(f"{ring}_{stat}" for ring in RINGS for stat in ("mean", "std", "gradient")),
+    "radius",
+    "circle_score",
+    "brightness",
+    "contrast",
+]
+
+_STAGE = re.compile(r"^D(\d+)[_-]", re.IGNORECASE)
+
+
+def _require() -> None:
+    if np is None:
+        raise ImportError("the blastocyst pre-filter requires NumPy (pip install numpy)")
+
+
+def stage_label(name: str) -> bool | None:
+    """Whether a Kaggle-style file name (``D5_123.jpg``) is a blastocyst-day image; ``None`` if unnamed."""
+    match = _STAGE.match(name)
+    return int(match.group(1)) >= 5 if match else None
+
+
+def extract_features(frames: np.ndarray, detector: DetectorConfig | None = None) -> np.ndarray:
+    """A ``(batch, len(FEATURE_NAMES))`` float32 matrix for ``(batch, size, size)`` grayscale frames."""
+    _require()
+    f = np.asarray(frames, dtype=np.float32)
+    if f.ndim == 2:
+        f = f[None]
+    batch, height, width = f.shape
+    detector = detector or DetectorConfig(size=min(height, width))
+    detections = detect_circles(f, detector)
+    cx = np.array([d.cx for d in detections], dtype=np.float32)
+    cy = np.array([d.cy for d in detections], dtype=np.float32)
+    radius = np.maximum(np.array([d.radius for d in detections], dtype=np.float32), 1.0)
+
+    flat = f.reshape(batch, -1)
+    brightness = flat.mean(axis=1)
+    contrast = flat.std(axis=1)
+    z = (f - brightness[:, None, None]) / np.maximum(contrast, 1e-3)[:, None, None]
+    gy, gx = np.gradient(z, axis=(1, 2))
+    grad = np.hypot(gx, gy)
+
+    yy, xx = np.mgrid[0:height, 0:width].astype(np.float32)
+    dist = np.hypot(xx[None] - cx[:, None, None], yy[None] - cy[:, None, None]) / radius[:, None, None]
+    ring = np.digitize(dist, RING_EDGES)
+    rings = len(RINGS)
+    index = (np.arange(batch)[:, None, None] * rings + ring).ravel()
+
+    def ring_sum(values: np.ndarray | None) -> np.ndarray:
+        weights = None if values is None else values.ravel()
+        return np.bincount(index, weights=weights, minlength=batch * rings).reshape(batch, rings)
+
+    count = ring_sum(None)
+    occupied = count > 0
+
+    def ring_mean(values: np.ndarray) -> np.ndarray:
+        return np.divide(ring_sum(values), count, out=np.zeros((batch, rings)), where=occupied)
+
+    mean = ring_mean(z)
+    std = np.sqrt(np.maximum(ring_mean(z * z) - mean * mean, 0.0))
+    gradient = ring_mean(grad)
+
+    per_ring = np.stack([mean, std, gradient], axis=2).reshape(batch, -1)
+    scale = float(min(height, width))
+    extra = np.stack(
+        [radius / scale, [d.score for d in detections], brightness / 255.0, contrast / 255.0], axis=1
+    )
+    return np.concatenate([per_ring, extra], axis=1).astype(np.float32)
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 0.5 * (1.0 + np.tanh(0.5 * x))
+
+
+@dataclass
+class BlastocystModel:
+    """Standardised logistic regression over :data:`FEATURE_NAMES`.
+
+    Images scoring at least ``threshold`` are sent for grading. ``size``
+    is the working frame edge the features were trained at.
+    """
+
+    weights: list[float]
+    bias: float
+    mean: list[float]
+    scale: list[float]
+    threshold: float
+    size: int = 96
+    recall: float = 0.98
+    trained_on: int = 0
+    features: list[str] = field(default_factory=lambda: list(FEATURE_NAMES))
+
+    def scores(self, features: np.ndarray) -> np.ndarray:
+        """Blastocyst probability for each row of a feature matrix."""
+        _require()
+        x = (np.asarray(features, dtype=np.float64) - self.mean) / self.scale
+        return _sigmoid(x @ np.asarray(self.weights) + self.bias)
+
+    def score_frames(self, frames: np.ndarray) -> np.ndarray:
+        return self.scores(extract_features(frames))
+
+    def save(self, path: str | Path) -> None:
+        data = {"format": MODEL_FORMAT, "version": MODEL_VERSION, **asdict(self)}
+        Path(path).write_text(json.dumps(data, indent=1) + "\n", encoding="utf-8")
+
+    @classmethod
+    def load(cls, path: str | Path) -> "BlastocystModel":
+        data = json.loads(Path(path).read_text(encoding="utf-8"))
+        if data.pop("format", None) != MODEL_FORMAT or data.pop("version", None) != MODEL_VERSION:
+            raise ValueError(f"{path} is not an embryograding pre-filter model")
+        if data.get("features") != FEATURE_NAMES:
+            raise ValueError(f"{path} was trained on different features; retrain it")
+        return cls(**data)
+
+
+def train(
+    features: np.ndarray,
+    labels: Sequence[bool] | np.ndarray,
+    recall: float = 0.98,
+    l2: float = 1.0,
+    iterations: int = 50,
+    size: int = 96,
+) -> BlastocystModel:
+    """Fit a model by Newton's method and set its threshold for ``recall``.
+
+    ``l2`` is the ridge penalty on the standardised weights (not the bias).
+    The threshold is the highest score that still keeps at least
+    ``recall`` of the positive training images. Rows of unreadable images
+    (NaN features) are left out.
+    """
+    _require()
+    x = np.asarray(features, dtype=np.float64)
+    y = np.asarray(labels, dtype=np.float64)
+    readable = ~np.isnan(x).any(axis=1)
+    x, y = x[readable], y[readable]
+    if not 0 < y.sum() < len(y):
+        raise ValueError("training needs both blastocyst and non-blastocyst images")
+    mean = x.mean(axis=0)
+    scale = x.std(axis=0)
+    scale[scale == 0] = 1.0
+    design = np.hstack([(x - mean) / scale, np.ones((len(x), 1))])
+    penalty = np.full(design.shape[1], l2)
+    penalty[-1] = 0.0
+    beta = np.zeros(design.shape[1])
+    for _ in range(iterations):
+        p = _sigmoid(design @ beta)
+        gradient = design.T @ (p - y) + penalty * beta
+        hessian = (design * (p * (1 - p))[:, None]).T @ design + np.diag(penalty + 1e-9)
+        step = np.linalg.solve(hessian, gradient)
+        beta -= step
+        if np.abs(step).max() < 1e-8:
+            break
+    positive = np.sort(_sigmoid(design @ beta)[y == 1])
+    threshold = float(positive[int(np.floor((1 - recall) * len(positive)))])
+    return BlastocystModel(
+        weights=beta[:-1].tolist(),
+        bias=float(beta[-1]),
+        mean=mean.tolist(),
+        scale=scale.tolist(),
+        threshold=threshold,
+        size=size,
+        recall=recall,
+        trained_on=len(y),
+    )
+
+
+def image_features(paths: Sequence[str | Path], size: int = 96) -> np.ndarray:
+    """Decode a batch of image files and return their feature matrix (NaN rows for unreadable files)."""
+    frames, scales = load_frames(paths, size)
+    features = extract_features(frames)
+    features[[scale is None for scale in scales]] = np.nan
+    return features
+
+
+def batch_features(
+    paths: Sequence[str | Path], size: int = 96, workers: int | None = None, batch_size: int = 64
+) -> np.ndarray:
+    """Features for many image files, decoded and computed in a process pool."""
+    _require()
+    chunks = [paths[i:i + batch_size] for i in range(0, len(paths), batch_size)]
+    if not chunks:
+        return np.empty((0, len(FEATURE_NAMES)), dtype=np.float32)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return np.concatenate(list(pool.map(image_features, chunks, [size] * len(chunks))))
+
+
+def score_images(paths: Sequence[str | Path], model: BlastocystModel) -> list[float | None]:
+    """Blastocyst scores for a batch of image files (runs in a worker process).
+
+    Unreadable files score ``None``, which sends them to the grader.
+    """
+    return [None if np.isnan(score) else score for score in model.scores(image_features(paths, model.size)).tolist()]
+
+
+@dataclass(frozen=True)
+class PrefilterReport:
+    """How a threshold would have routed a labelled set of images.
+
+    False negatives are images the filter would skip although they should
+    have been graded: against the file-name stage (``D5_...``) and against
+    ``actual_class`` 1, where that column is filled in. Unreadable images
+    (NaN scores) are always sent, and are counted apart.
+    """
+
+    images: int
+    skipped: int
+    unreadable: int
+    stage_positives: int
+    stage_false_negatives: int
+    class_positives: int
+    class_false_negatives: int
+
+    @property
+    def calls_avoided(self) -> float:
+        return self.skipped / self.images if self.images else 0.0
+
+    @property
+    def stage_false_negative_rate(self) -> float:
+        return self.stage_false_negatives / self.stage_positives if self.stage_positives else float("nan")
+
+    @property
+    def false_negative_rate(self) -> float:
+        return self.class_false_negatives / self.class_positives if self.class_positives else float("nan")
+
+    def to_dict(self) -> dict[str, float | int]:
+        return {
+            **asdict(self),
+            "calls_avoided": round(self.calls_avoided, 4),
+            "stage_false_negative_rate": round(self.stage_false_negative_rate, 4),
+            "false_negative_rate": round(self.false_negative_rate, 4),
+        }
+
+
+def assess(
+    scores: Sequence[float] | np.ndarray,
+    threshold: float,
+    names: Sequence[str],
+    actual_class: Sequence[str],
+) -> PrefilterReport:
+    """Calls avoided and false-negative rates of ``threshold`` on scored images."""
+    _require()
+    scores = np.asarray(scores, dtype=np.float64)
+    unreadable = np.isnan(scores)
+    skipped = ~unreadable & (scores < threshold)
+    stage = np.array([stage_label(name) is True for name in names], dtype=bool)
+    positive = np.array([str(value).strip() == "1" for value in actual_class], dtype=bool)
+    return PrefilterReport(
+        images=len(skipped),
+        skipped=int(skipped.sum()),
+        unreadable=int(unreadable.sum()),
+        stage_positives=int(stage.sum()),
+        stage_false_negatives=int((stage & skipped).sum()),
+        class_positives=int(positive.sum()),
+        class_false_negatives=int((positive & skipped).sum()),
+    )
+
+
+class BlastocystFilter:
+    """Score a stream of jobs with a :class:`BlastocystModel` in a process pool."""
+
+    def __init__(self, model: BlastocystModel, workers: int | None = None, batch_size: int = 64) -> None:
+        _require()
+        self.model = model
+        self.batch_size = batch_size
+        self.workers = workers or os.cpu_count() or 1
+        self._pool = ProcessPoolExecutor(max_workers=self.workers)
+
+    @classmethod
+    def load(cls, path: str | Path, workers: int | None = None) -> "BlastocystFilter":
+        return cls(BlastocystModel.load(path), workers)
+
+    @property
+    def threshold(self) -> float:
+        return self.model.threshold
+
+    def __enter__(self) -> "BlastocystFilter":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._pool.shutdown(cancel_futures=True)
+
+    def _submit(self, chunk: list[ImageJob]) -> Future[list[float | None]]:
+        return self._pool.submit(score_images, [str(job.image_path) for job in chunk], self.model)
+
+    async def annotate(self, jobs: Iterable[ImageJob] | AsyncIterable[ImageJob]) -> AsyncIterator[ImageJob]:
+        """Yield ``jobs`` in order with ``blastocyst_score`` filled in."""
+
+        def apply(job: ImageJob, score: float | None) -> ImageJob:
+            return dataclasses.replace(job, blastocyst_score=None if score is None else round(score, 4))
+
+        async for job in annotate_in_batches(jobs, self._submit, apply, self.batch_size, 2 * self.workers):
+            yield job
@@ -0,0 +1,183 @@
+"""Gardner Scale prompt and request construction.
+
+Mirrors ``gradeEmbryoWithGemini`` in ``app.html`` so the browser app and the
+batch grader send identical requests to Gemini.
+"""
+
+from __future__ import annotations
+
+import base64
+from typing import Any, Sequence
+
+MODEL = "gemini-2.5-flash"
+API_ROOT = "https://generativelanguage.googleapis.com/v1beta"
+
+_GARDNER_SCALE = """The Gardner Scale grades blastocyst-stage embryos based on:
+- Expansion (1-6): Degree of expansion and hatching
+- Inner Cell Mass/ICM (A-C): Quality of inner cell mass
+- Trophectoderm/TE (A-C): Quality of trophectoderm layer"""
+
+_GARDNER_INTRO = """You are an expert embryologist. Analyze this IVF embryo image and provide a Gardner Scale grade.
+
+""" + _GARDNER_SCALE
+
+_FIELD_FORMAT = """Grade: [e.g., 4AA, 3BB, 2AB, or N/A if not a blastocyst]
+Expansion: [1-6 or N/A]
+ICM: [A, B, C, or N/A]
+TE: [A, B, C, or N/A]
+Quality: [Excellent, Good, Fair, Poor, or Not Applicable]
+Explanation: [2-3 sentences explaining your grading in detail, mentioning specific features you observe]"""
+
+GARDNER_PROMPT = _GARDNER_INTRO + """
+
+Provide your response in this EXACT format (each field on a new line):
+""" + _FIELD_FORMAT
+
+GENERATION_CONFIG: dict[str, Any] = {
+    "temperature": 0.2,
+    "topK": 32,
+    "topP": 1,
+    "maxOutputTokens": 1024,
+}
+
+# JSON mode: the model fills a response schema instead of a labelled line
+# format, so no output tokens go on labels and parsing is a JSON decode.
+JSON_PROMPT = _GARDNER_INTRO + """
+
+Respond with a JSON object matching the response schema. If the embryo is not a blastocyst, use "N/A" for grade, \
+expansion, icm and te, and "Not Applicable" for quality. The explanation should be 2-3 sentences mentioning specific \
+features you observe."""
+
+RESPONSE_SCHEMA: dict[str, Any] = {
+    "type": "OBJECT",
+    "properties": {
+        "grade": {"type": "STRING", "description": "Gardner grade such as 4AA, or N/A"},
+        "expansion": {"type": "STRING", "enum": ["1", "2", "3", "4", "5", "6", "N/A"]},
+        "icm": {"type": "STRING", "enum": ["A", "B", "C", "N/A"]},
+        "te": {"type": "STRING", "enum": ["A", "B", "C", "N/A"]},
+        "quality": {"type": "STRING", "enum": ["Excellent", "Good", "Fair", "Poor", "Not Applicable"]},
+        "explanation": {"type": "STRING"},
+    },
+    "required": ["grade", "expansion", "icm", "te", "quality", "explanation"],
+    "propertyOrdering": ["grade", "expansion", "icm", "te", "quality", "explanation"],
+}
+
+
+def json_generation_config(base: dict[str, Any] | None = None) -> dict[str, Any]:
+    """``base`` (default :data:`GENERATION_CONFIG`) with JSON output enabled."""
+    config = dict(GENERATION_CONFIG if base is None else base)
+    config["responseMimeType"] = "application/json"
+    config["responseSchema"] = RESPONSE_SCHEMA
+    return config
+
+# Multi-image requests: several images, each after an "Image <id>:" text
+# part, answered in one block per image. The instructions are sent once
+# per request instead of once per image.
+_MULTI_INTRO = """You are an expert embryologist. Analyze each of the following IVF embryo images independently and \
+provide a Gardner Scale grade for each. Every image is preceded by a line "Image <id>:".
+
+""" + _GARDNER_SCALE
+
+MULTI_IMAGE_PROMPT = _MULTI_INTRO + """
+
+For every image, in the order given, write one block in this EXACT format (each field on a new line), starting with \
+the image's identifier and with a blank line between blocks:
+Image: [the identifier]
+""" + _FIELD_FORMAT
+
+MULTI_IMAGE_JSON_PROMPT = _MULTI_INTRO + """
+
+Respond with a JSON array holding one object per image, in the order given, matching the response schema, with the \
+image's identifier in "image". If an embryo is not a blastocyst, use "N/A" for grade, expansion, icm and te, and \
+"Not Applicable" for quality. Each explanation should be 2-3 sentences mentioning specific features you observe."""
+
+MULTI_IMAGE_SCHEMA: dict[str, Any] = {
+    "type": "ARRAY",
+    "items": {
+        "type": "OBJECT",
+        "properties": {"image": {"type": "STRING"}, **RESPONSE_SCHEMA["properties"]},
+        "required": ["image", *RESPONSE_SCHEMA["required"]],
+        "propertyOrdering": ["image", *RESPONSE_SCHEMA["propertyOrdering"]],
+    },
+}
+
+
+def multi_image_generation_config(
+    images: int, base: dict[str, Any] | None = None, json_mode: bool = False
+) -> dict[str, Any]:
+    """``base`` with room for ``images`` answers, and the array schema in JSON mode."""
+    config = dict(GENERATION_CONFIG if base is None else base)
+    if "maxOutputTokens" in config:
+        config["maxOutputTokens"] = config["maxOutputTokens"] * images
+    if json_mode:
+        config["responseMimeType"] = "application/json"
+        config["responseSchema"] = MULTI_IMAGE_SCHEMA
+    return config
+
+
+# Gemini bills each image up to 384x384 px as a fixed number of tokens;
+# larger images are tiled, so this is a lower bound used for budgeting.
+IMAGE_TOKENS = 258
+
+MIME_TYPES = {
+    ".jpg": "image/jpeg",
+    ".jpeg": "image/jpeg",
+    ".png": "image/png",
+}
+
+
+def mime_type_for(name: str) -> str:
+    """Guess the upload mime type from a file name, defaulting to JPEG."""
+    dot = name.rfind(".")
+    return MIME_TYPES.get(name[dot:].lower(), "image/jpeg") if dot >= 0 else "image/jpeg"
+
+
+def estimate_input_tokens(prompt: str, images: int = 1) -> int:
+    """Rough input-token count for a request, for rate-limit budgeting."""
+    return len(prompt) // 4 + images * IMAGE_TOKENS
+
+
+def generate_content_url(model: str = MODEL, api_root: str = API_ROOT) -> str:
+    """Return the ``generateContent`` endpoint for ``model``."""
+    return f"{api_root.rstrip('/')}/models/{model}:generateContent"
+
+
+def build_request_body(
+    image_bytes: bytes | memoryview,
+    mime_type: str = "image/jpeg",
+    prompt: str = GARDNER_PROMPT,
+    generation_config: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Build the ``generateContent`` JSON body for a single image."""
+    return {
+        "contents": [{
+            "parts": [
+                {"text": prompt},
+                {
+                    "inline_data": {
+                        "mime_type": mime_type,
+                        "data": base64.b64encode(image_bytes).decode("ascii"),
+                    }
+                },
+            ]
+        }],
+        "generationConfig": dict(GENERATION_CONFIG if generation_config is None else generation_config),
+    }
+
+
+def build_multi_image_request_body(
+    images: Sequence[tuple[str, bytes | memoryview, str]],
+    prompt: str = MULTI_IMAGE_PROMPT,
+    generation_config: dict[str, Any] | None = None,
+) -> dict[str, Any]:
+    """Build one ``generateContent`` body for several ``(identifier, image bytes, mime type)`` images."""
+    parts: list[dict[str, Any]] = [{"text": prompt}]
+    for identifier, image_bytes, mime_type in images:
+        parts.append({"text": f"Image {identifier}:"})
+        parts.append(
+            {"inline_data": {"mime_type": mime_type, "data": base64.b64encode(image_bytes).decode("ascii")}}
+        )
+    return {
+        "contents": [{"parts": parts}],
+        "generationConfig": dict(GENERATION_CONFIG if generation_config is None else generation_config),
+    }
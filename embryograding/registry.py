@@ -0,0 +1,305 @@
+"""SQLite registry of grading runs and every grade they produced.
+
+Each run overwrites ``verification_results.csv``, so there is no way to ask
+what grades ``D5_368.jpg`` has received across prompt versions and models.
+The registry keeps one row per grading call, tagged with its run (model,
+prompt hash, generation config), the SHA-256 of the source image, the parsed
+fields, latency and token usage, indexed by image, grade and run. Expert
+reviews exported from the report (see :mod:`embryograding.reviews`) go into
+a ``reviews`` table keyed by run, image name and reviewer, next to the
+grades they judge.
+
+Rows are buffered and inserted with ``executemany`` in one transaction per
+batch (WAL journal, ``synchronous=NORMAL``), which keeps up with the async
+grader at tens of thousands of rows per second.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import sqlite3
+import time
+import uuid
+from pathlib import Path
+from typing import Any, Callable, Iterable
+
+from .engine import Row
+from .prompt import GARDNER_PROMPT, GENERATION_CONFIG, MODEL
+from .reviews import read_reviews
+
+_SCHEMA = [
+    "CREATE TABLE IF NOT EXISTS prompts ("
+    " prompt_hash TEXT PRIMARY KEY,"
+    " prompt TEXT NOT NULL)",
+    "CREATE TABLE IF NOT EXISTS runs ("
+    " run_id TEXT PRIMARY KEY,"
+    " started_at REAL NOT NULL,"
+    " model TEXT NOT NULL,"
+    " prompt_hash TEXT NOT NULL REFERENCES prompts(prompt_hash),"
+    " generation_config TEXT NOT NULL,"
+    " source TEXT NOT NULL DEFAULT '')",
+    "CREATE TABLE IF NOT EXISTS gradings ("
+    " id INTEGER PRIMARY KEY,"
+    " run_id TEXT NOT NULL REFERENCES runs(run_id),"
+    " image_name TEXT NOT NULL,"
+    " image_hash TEXT,"
+    " image_path TEXT,"
+    " actual_class TEXT,"
+    " grade TEXT,"
+    " expansion TEXT,"
+    " icm TEXT,"
+    " te TEXT,"
+    " quality TEXT,"
+    " explanation TEXT,"
+    " response TEXT,"
+    " cached INTEGER,"
+    " latency_s REAL,"
+    " input_tokens INTEGER,"
+    " output_tokens INTEGER,"
+    " recorded_at REAL NOT NULL)",
+    "CREATE INDEX IF NOT EXISTS gradings_image ON gradings(image_name)",
+    "CREATE INDEX IF NOT EXISTS gradings_image_hash ON gradings(image_hash)",
+    "CREATE INDEX IF NOT EXISTS gradings_grade ON gradings(grade)",
+    "CREATE INDEX IF NOT EXISTS gradings_run ON gradings(run_id)",
+    "CREATE TABLE IF NOT EXISTS reviews ("
+    " id INTEGER PRIMARY KEY,"
+    " run_id TEXT NOT NULL,"
+    " image_name TEXT NOT NULL,"
+    " reviewer TEXT NOT NULL,"
+    " ai_grade TEXT,"
+    " expert_grade TEXT,"
+    " agree TEXT,"
+    " comments TEXT,"
+    " reviewed_at REAL NOT NULL,"
+    " source TEXT NOT NULL DEFAULT '',"
+    " UNIQUE (run_id, image_name, reviewer))",
+    "CREATE INDEX IF NOT EXISTS reviews_image ON reviews(image_name)",
+]
+
+_INSERT = (
+    "INSERT INTO gradings (run_id, image_name, image_hash, image_path, actual_class, grade, expansion, icm, te,"
+    " quality, explanation, response, cached, latency_s, input_tokens, output_tokens, recorded_at)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)"
+)
+
+# Re-importing an export, or a later one from the same reviewer, keeps the
+# most recent answer for each card.
+_UPSERT_REVIEW = (
+    "INSERT INTO reviews (run_id, image_name, reviewer, ai_grade, expert_grade, agree, comments, reviewed_at, source)"
+    " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)"
+    " ON CONFLICT (run_id, image_name, reviewer) DO UPDATE SET"
+    " ai_grade = excluded.ai_grade, expert_grade = excluded.expert_grade, agree = excluded.agree,"
+    " comments = excluded.comments, reviewed_at = excluded.reviewed_at, source = excluded.source"
+    " WHERE excluded.reviewed_at >= reviews.reviewed_at"
+)
+
+
+def prompt_hash(prompt: str) -> str:
+    """Short stable identifier of a prompt version."""
+    return hashlib.sha256(prompt.encode("utf-8")).hexdigest()[:16]
+
+
+class RunRegistry:
+    """Record grading runs and query the history of each image.
+
+    Rows passed to :meth:`record` are buffered and written every
+    ``batch_size`` rows, on :meth:`flush` and on :meth:`close`.
+    """
+
+    def __init__(self, path: str | Path, batch_size: int = 512) -> None:
+        self.path = Path(path)
+        self.batch_size = batch_size
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._db = sqlite3.connect(self.path, isolation_level=None)
+        self._db.row_factory = sqlite3.Row
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        for statement in _SCHEMA:
+            self._db.execute(statement)
+        self._pending: list[tuple[Any, ...]] = []
+
+    def __enter__(self) -> "RunRegistry":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+        self._db.close()
+
+    def start_run(
+        self,
+        model: str = MODEL,
+        prompt: str = GARDNER_PROMPT,
+        generation_config: dict[str, Any] | None = None,
+        source: str = "",
+        run_id: str | None = None,
+        started_at: float | None = None,
+    ) -> str:
+        """Register a run and return its id."""
+        run_id = run_id or uuid.uuid4().hex
+        digest = prompt_hash(prompt)
+        config = GENERATION_CONFIG if generation_config is None else generation_config
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.execute("INSERT OR IGNORE INTO prompts (prompt_hash, prompt) VALUES (?, ?)", (digest, prompt))
+            self._db.execute(
+                "INSERT INTO runs (run_id, started_at, model, prompt_hash, generation_config, source)"
+                " VALUES (?, ?, ?, ?, ?, ?)",
+                (
+                    run_id,
+                    time.time() if started_at is None else started_at,
+                    model,
+                    digest,
+                    json.dumps(config, sort_keys=True, separators=(",", ":")),
+                    source,
+                ),
+            )
+        return run_id
+
+    def record(self, run_id: str, row: Row) -> None:
+        """Buffer one results row from :class:`~embryograding.engine.BatchGrader`."""
+        cached = row.get("cached")
+        self._pending.append((
+            run_id,
+            row["image_name"],
+            row.get("image_sha256") or None,
+            row.get("image_path"),
+            row.get("actual_class"),
+            row.get("gardner_grade"),
+            row.get("expansion"),
+            row.get("icm_quality"),
+            row.get("te_quality"),
+            row.get("quality_score"),
+            row.get("explanation"),
+            row.get("full_response"),
+            None if cached in (None, "") else int(cached in (True, "True", "1")),
+            row.get("latency_s") or None,
+            row.get("input_tokens") or None,
+            row.get("output_tokens") or None,
+            time.time(),
+        ))
+        if len(self._pending) >= self.batch_size:
+            self.flush()
+
+    def recorder(self, run_id: str) -> Callable[[Row], None]:
+        """A sink for :meth:`BatchGrader.run` that records into ``run_id``."""
+        return lambda row: self.record(run_id, row)
+
+    def flush(self) -> None:
+        if not self._pending:
+            return
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(_INSERT, self._pending)
+        self._pending = []
+
+    def import_csv(
+        self,
+        path: str | Path,
+        model: str = MODEL,
+        prompt: str = GARDNER_PROMPT,
+        run_id: str | None = None,
+    ) -> tuple[str, int]:
+        """Record a results CSV as one run, dated by the file's mtime.
+
+        Returns the run id and the number of rows imported.
+        """
+        path = Path(path)
+        run_id = self.start_run(model, prompt, source=str(path), run_id=run_id, started_at=path.stat().st_mtime)
+        count = 0
+        with path.open(newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                self.record(run_id, row)
+                count += 1
+        self.flush()
+        return run_id, count
+
+    def record_reviews(self, reviews: Iterable[dict[str, Any]], source: str = "") -> int:
+        """Insert or update expert reviews in one transaction; returns how many were read.
+
+        ``reviews`` are dicts as produced by :func:`~embryograding.reviews.read_reviews`.
+        """
+        now = time.time()
+        count = 0
+
+        def params() -> Iterable[tuple[Any, ...]]:
+            nonlocal count
+            for review in reviews:
+                count += 1
+                yield (
+                    review.get("run_id") or "",
+                    review["image_name"],
+                    review.get("reviewer") or "",
+                    review.get("ai_grade") or None,
+                    review.get("expert_grade") or None,
+                    review.get("agree") or None,
+                    review.get("comments") or None,
+                    review.get("reviewed_at") or now,
+                    source,
+                )
+
+        with self._db:
+            self._db.execute("BEGIN")
+            self._db.executemany(_UPSERT_REVIEW, params())
+        return count
+
+    def import_reviews(self, path: str | Path) -> int:
+        """Load a review export from the report; returns the number of reviews read."""
+        return self.record_reviews(read_reviews(path), source=str(path))
+
+    def reviews(self, run_id: str | None = None, image: str | None = None) -> list[dict[str, Any]]:
+        """Expert reviews, optionally of one run or one image, oldest first."""
+        clauses, params = [], []
+        if run_id is not None:
+            clauses.append("run_id = ?")
+            params.append(run_id)
+        if image is not None:
+            clauses.append("image_name = ?")
+            params.append(image)
+        where = f" WHERE {' AND '.join(clauses)}" if clauses else ""
+        rows = self._db.execute(f"SELECT * FROM reviews{where} ORDER BY reviewed_at, id", params)
+        return [dict(row) for row in rows]
+
+    def runs(self) -> list[dict[str, Any]]:
+        """Every run with its grading count, oldest first."""
+        self.flush()
+        rows = self._db.execute(
+            "SELECT runs.*, (SELECT COUNT(*) FROM gradings WHERE gradings.run_id = runs.run_id) AS gradings"
+            " FROM runs ORDER BY started_at"
+        )
+        return [dict(row) for row in rows]
+
+    def history(self, image: str) -> list[dict[str, Any]]:
+        """Every grade recorded for an image, by name or SHA-256, oldest first."""
+        self.flush()
+        column = "image_hash" if len(image) == 64 and all(c in "0123456789abcdef" for c in image) else "image_name"
+        rows = self._db.execute(
+            "SELECT gradings.*, runs.model, runs.prompt_hash, runs.started_at FROM gradings"
+            f" JOIN runs USING (run_id) WHERE gradings.{column} = ? ORDER BY runs.started_at, gradings.id",
+            (image,),
+        )
+        return [dict(row) for row in rows]
+
+    def grades(self, run_id: str | None = None) -> list[tuple[str, str, str]]:
+        """``(run_id, image_name, grade)`` of every grading, or of one run, in recording order."""
+        self.flush()
+        if run_id is None:
+            rows = self._db.execute("SELECT run_id, image_name, grade FROM gradings ORDER BY id")
+        else:
+            rows = self._db.execute(
+                "SELECT run_id, image_name, grade FROM gradings WHERE run_id = ? ORDER BY id", (run_id,)
+            )
+        return [tuple(row) for row in rows]
+
+    def grade_counts(self, run_id: str | None = None) -> dict[str, int]:
+        """How often each grade was given, overall or within one run."""
+        self.flush()
+        if run_id is None:
+            rows = self._db.execute("SELECT grade, COUNT(*) FROM gradings GROUP BY grade")
+        else:
+            rows = self._db.execute("SELECT grade, COUNT(*) FROM gradings WHERE run_id = ? GROUP BY grade", (run_id,))
+        return {grade: count for grade, count in rows}
@@ -0,0 +1,1069 @@
+"""Expert verification report with externalised, lazy-loaded images.
+
+``verification_results/verification_report.html`` inlines every frame as a
+``data:image/jpeg;base64`` URI: 637 KB for 15 embryos, and the browser must
+download and decode all of it before the page is usable. The generator here
+writes each image once into ``assets/`` under a content hash (so re-running
+never rewrites it and browsers can cache it forever), plus a small
+WebP/JPEG thumbnail. Cards show the thumbnail with ``loading="lazy"`` and
+explicit dimensions and link to the full-resolution frame, so a report's
+first paint costs the HTML plus the handful of thumbnails on screen.
+
+Thumbnails are made in a process pool with Pillow. Without Pillow the cards
+link the full images directly.
+"""
+
+from __future__ import annotations
+
+import collections
+import csv
+import datetime
+import hashlib
+import json
+import logging
+import os
+import re
+import time
+from concurrent.futures import Future, ProcessPoolExecutor
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, Sequence, TextIO, TypeVar
+
+try:
+    from PIL import Image, ImageOps
+except ImportError:  # pragma: no cover - optional dependency
+    Image = ImageOps = None
+
+from .engine import Row
+from .htmlstream import Template, escape, write_chunks
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+R = TypeVar("R")
+
+ASSET_DIR = "assets"
+
+
+@dataclass(frozen=True)
+class ReportConfig:
+    """Report text and thumbnail settings.
+
+    ``thumb_edge`` is the thumbnail's long edge in pixels; the card image
+    column is 400 CSS pixels wide. ``webp_method`` trades WebP encoding time
+    for size (0-6; 2 is about twice as fast as libwebp's default of 4 for
+    ~5% larger files). ``run_id`` tags each card, and so each exported
+    expert review, with the grading run the report shows; rows carrying
+    their own ``run_id`` override it.
+    """
+
+    title: str = "Embryo Grading Verification Report"
+    model_name: str = "Google Gemini 2.5 Flash"
+    thumb_edge: int = 400
+    thumb_format: str = "webp"
+    thumb_quality: int = 80
+    webp_method: int = 2
+    run_id: str = ""
+
+
+@dataclass(frozen=True)
+class Asset:
+    """Where a card's images live, relative to the report file."""
+
+    full: str
+    thumb: str
+    width: int | None = None
+    height: int | None = None
+
+
+@dataclass
+class ReportStats:
+    cards: int = 0
+    missing_images: int = 0
+    pages: int = 0
+    pages_written: int = 0
+    rendered: int = 0
+    html_bytes: int = 0
+    index_bytes: int = 0
+    elapsed: float = 0.0
+
+
+def _write_once(path: Path, write: Callable[[Path], None]) -> None:
+    """Create ``path`` via a temporary file unless it already exists."""
+    if path.exists():
+        return
+    tmp = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    write(tmp)
+    os.replace(tmp, path)
+
+
+def prepare_asset(path: str | Path, out_dir: str | Path, config: ReportConfig) -> Asset | None:
+    """Copy an image into the asset directory and make its thumbnail.
+
+    Returns ``None`` when the image does not exist. Files are named by the
+    SHA-256 of the image, so existing assets are reused as they are.
+    """
+    path = Path(path)
+    try:
+        data = path.read_bytes()
+    except FileNotFoundError:
+        return None
+    assets = Path(out_dir) / ASSET_DIR
+    assets.mkdir(parents=True, exist_ok=True)
+    digest = hashlib.sha256(data).hexdigest()[:20]
+    full = assets / f"{digest}{path.suffix.lower()}"
+    _write_once(full, lambda tmp: tmp.write_bytes(data))
+    href = f"{ASSET_DIR}/{full.name}"
+    if Image is None:
+        return Asset(href, href)
+
+    ext = "jpg" if config.thumb_format.lower() in ("jpeg", "jpg") else config.thumb_format.lower()
+    thumb = assets / f"{digest}-{config.thumb_edge}.{ext}"
+    if not thumb.exists():
+        def write_thumb(tmp: Path) -> None:
+            with Image.open(full) as im:
+                if im.format == "JPEG":
+                    im.draft("RGB", (config.thumb_edge, config.thumb_edge))
+                im = ImageOps.exif_transpose(im)
+                if im.mode not in ("RGB", "L"):
+                    im = im.convert("RGB")
+                im.thumbnail((config.thumb_edge, config.thumb_edge), Image.LANCZOS)
+                if ext == "webp":
+                    im.save(tmp, "WEBP", quality=config.thumb_quality, method=config.webp_method)
+                else:
+                    im.save(tmp, "JPEG" if ext == "jpg" else ext.upper(), quality=config.thumb_quality)
+
+        try:
+            _write_once(thumb, write_thumb)
+        except OSError as exc:
+            log.warning("cannot make a thumbnail of %s: %s", path, exc)
+            return Asset(href, href)
+    with Image.open(thumb) as im:
+        width, height = im.size
+    return Asset(href, f"{ASSET_DIR}/{thumb.name}", width, height)
+
+
+def _ordered(submit: Callable[[T], Future[R]], items: Iterable[T], window: int) -> Iterator[tuple[T, R]]:
+    """Yield ``(item, result)`` in input order with at most ``window`` in flight.
+
+    Unlike :meth:`Executor.map` the input is not submitted all up front, so
+    an unbounded stream of rows can be fed through.
+    """
+    pending: collections.deque[tuple[T, Future[R]]] = collections.deque()
+    for item in items:
+        pending.append((item, submit(item)))
+        if len(pending) >= window:
+            done, future = pending.popleft()
+            yield done, future.result()
+    while pending:
+        done, future = pending.popleft()
+        yield done, future.result()
+
+
+STYLE = """\
+        body { font-family: Arial, sans-serif; max-width: 1400px; margin: 0 auto; padding: 20px; background-color: #f5f5f5; }
+        h1 { color: #333; text-align: center; margin-bottom: 10px; }
+        .subtitle { text-align: center; color: #666; margin-bottom: 30px; }
+        .summary { background: white; padding: 20px; border-radius: 8px; margin-bottom: 30px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); }
+        .embryo-card { background: white; border-radius: 8px; padding: 20px; margin-bottom: 30px; box-shadow: 0 2px 4px rgba(0,0,0,0.1); display: flex; gap: 20px; content-visibility: auto; contain-intrinsic-size: auto 560px; }
+        .image-container { flex: 0 0 400px; }
+        .image-container img { width: 100%; height: auto; border-radius: 4px; border: 2px solid #ddd; }
+        .image-missing { padding: 40px; text-align: center; color: #999; border: 2px dashed #ddd; border-radius: 4px; }
+        .details-container { flex: 1; }
+        .embryo-header { display: flex; justify-content: space-between; align-items: center; margin-bottom: 15px; padding-bottom: 15px; border-bottom: 2px solid #e0e0e0; }
+        .embryo-id { font-size: 20px; font-weight: bold; color: #333; }
+        .grade-badge { font-size: 24px; font-weight: bold; padding: 8px 16px; border-radius: 4px; background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); color: white; }
+        .metrics { display: grid; grid-template-columns: repeat(3, 1fr); gap: 15px; margin-bottom: 15px; }
+        .metric { background: #f8f9fa; padding: 12px; border-radius: 4px; border-left: 4px solid #667eea; }
+        .metric-label { font-size: 12px; color: #666; text-transform: uppercase; margin-bottom: 4px; }
+        .metric-value { font-size: 20px; font-weight: bold; color: #333; }
+        .quality-good { border-left-color: #28a745; }
+        .quality-fair { border-left-color: #ffc107; }
+        .quality-poor { border-left-color: #dc3545; }
+        .explanation { background: #f8f9fa; padding: 15px; border-radius: 4px; border-left: 4px solid #17a2b8; margin-top: 15px; }
+        .explanation-label { font-weight: bold; color: #17a2b8; margin-bottom: 8px; }
+        .explanation-text { color: #555; line-height: 1.6; }
+        .verification-section { margin-top: 20px; padding-top: 20px; border-top: 2px solid #e0e0e0; }
+        .verification-label { font-weight: bold; color: #333; margin-bottom: 10px; }
+        .verification-inputs { display: flex; gap: 15px; align-items: center; }
+        .verification-inputs input { padding: 8px; border: 1px solid #ddd; border-radius: 4px; font-size: 14px; }
+        .verification-inputs textarea { flex: 1; padding: 8px; border: 1px solid #ddd; border-radius: 4px; font-size: 14px; resize: vertical; min-height: 60px; }
+        table { width: 100%; border-collapse: collapse; }
+        th, td { padding: 10px; text-align: left; border-bottom: 1px solid #ddd; }
+        th { background-color: #f8f9fa; font-weight: bold; color: #333; }
+        .page-nav { display: flex; flex-wrap: wrap; gap: 10px; margin: 20px 0; }
+        .page-nav a, .page-nav span { padding: 6px 12px; background: white; border-radius: 4px; box-shadow: 0 1px 2px rgba(0,0,0,0.1); color: #667eea; text-decoration: none; }
+        .filter-inputs { display: flex; flex-wrap: wrap; gap: 10px; margin-bottom: 10px; }
+        .filter-inputs input, .filter-inputs select { padding: 8px; border: 1px solid #ddd; border-radius: 4px; font-size: 14px; }
+        .heatmap th, .heatmap td { padding: 4px 6px; text-align: center; font-size: 12px; }
+        .review-bar { display: flex; flex-wrap: wrap; gap: 10px; align-items: center; margin-bottom: 20px; }
+        .review-bar input, .review-bar button { padding: 8px; border: 1px solid #ddd; border-radius: 4px; font-size: 14px; }
+        .review-bar button { background: #667eea; color: white; border-color: #667eea; cursor: pointer; }
+        #review-count { color: #666; }
+        @media print { .page-nav, .filter-inputs, .review-bar { display: none; } }
+        @media print { .embryo-card { page-break-inside: avoid; } }
+"""
+
+HEAD = Template("""\
+<!DOCTYPE html>
+<html>
+<head>
+    <meta charset="utf-8">
+    <title>{title}</title>
+    <style>
+{style!raw}    </style>
+</head>
+<body>
+    <h1>🔬 {title}</h1>
+    <div class="subtitle">{subtitle}</div>
+""")
+
+SUMMARY = Template("""
+    <div class="summary">
+        <h2>Summary</h2>
+        <table>
+{rows!raw}        </table>
+    </div>
+""")
+
+CARDS_HEADING = """
+    <h2>Individual Embryo Assessments</h2>
+"""
+
+FILTER = Template("""
+    <div class="summary">
+        <h2>Find Embryos</h2>
+        <div class="filter-inputs">
+            <input type="search" id="filter-name" placeholder="Image name contains...">
+            <select id="filter-grade"><option value="">All grades</option></select>
+            <select id="filter-quality"><option value="">All qualities</option></select>
+            <select id="filter-day"><option value="">All days</option></select>
+        </div>
+        <div id="filter-count"></div>
+        <ol id="filter-results"></ol>
+    </div>
+
+    <h2>Pages</h2>
+    <div class="page-nav">
+{links!raw}    </div>
+    <script src="{index_script}"></script>
+    <script src="{report_script}"></script>
+""")
+
+FOOTER = "</body></html>\n"
+
+REVIEW_SCRIPT_NAME = "review.js"
+
+# Expert inputs are kept in the browser as they are typed (so a review can
+# span pages and sessions) and downloaded as JSON for ingest_reviews.
+REVIEW_BAR = """
+    <div class="review-bar">
+        <label>Reviewer: <input type="text" id="reviewer" placeholder="Your name"></label>
+        <button type="button" id="export-reviews">Export reviews (JSON)</button>
+        <span id="review-count"></span>
+    </div>
+"""
+
+REVIEW_FOOTER = f'    <script src="{REVIEW_SCRIPT_NAME}"></script>\n' + FOOTER
+
+CARD = Template("""
+    <div class="embryo-card" id="card-{number}" data-name="{name}" data-run="{run_id}" data-grade="{grade}">
+        <div class="image-container">
+            {image!raw}
+        </div>
+        <div class="details-container">
+            <div class="embryo-header">
+                <div class="embryo-id">#{number}: {name}</div>
+                <div class="grade-badge">{grade}</div>
+            </div>
+
+            <div class="metrics">
+                <div class="metric">
+                    <div class="metric-label">Expansion</div>
+                    <div class="metric-value">{expansion}</div>
+                </div>
+                <div class="metric">
+                    <div class="metric-label">ICM Quality</div>
+                    <div class="metric-value">{icm}</div>
+                </div>
+                <div class="metric">
+                    <div class="metric-label">TE Quality</div>
+                    <div class="metric-value">{te}</div>
+                </div>
+            </div>
+
+            <div class="metric{quality_class!raw}" style="margin-bottom: 15px;">
+                <div class="metric-label">Overall Quality</div>
+                <div class="metric-value">{quality}</div>
+            </div>
+
+            <div class="explanation">
+                <div class="explanation-label">AI Explanation:</div>
+                <div class="explanation-text">{explanation}</div>
+            </div>
+
+            <div class="verification-section">
+                <div class="verification-label">Expert Verification:</div>
+                <div class="verification-inputs">
+                    <label>Your Grade: <input type="text" class="expert-grade" placeholder="e.g., 4AA" style="width: 80px;"></label>
+                    <label>Agree?
+                        <select class="expert-agree">
+                            <option value="">-</option>
+                            <option value="yes">Yes</option>
+                            <option value="no">No</option>
+                            <option value="partial">Partially</option>
+                        </select>
+                    </label>
+                </div>
+                <div style="margin-top: 10px;">
+                    <label style="display: block; margin-bottom: 5px;">Comments:</label>
+                    <textarea class="expert-comments" placeholder="Add your expert notes here..."></textarea>
+                </div>
+            </div>
+        </div>
+    </div>
+""")
+
+
+def _image_html(asset: Asset | None, name: str) -> str:
+    if asset is None:
+        return f'<div class="image-missing">Image not found: {escape(name)}</div>'
+    size = f' width="{asset.width}" height="{asset.height}"' if asset.width else ""
+    return (
+        f'<a href="{escape(asset.full)}" target="_blank">'
+        f'<img src="{escape(asset.thumb)}" alt="{escape(name)}"{size} loading="lazy" decoding="async"></a>'
+    )
+
+
+_QUALITY_CLASSES = {
+    "excellent": " quality-good",
+    "good": " quality-good",
+    "fair": " quality-fair",
+    "poor": " quality-poor",
+}
+
+
+def _quality_class(quality: str) -> str:
+    word = quality.split(None, 1)[0].lower() if quality else ""
+    return _QUALITY_CLASSES.get(word, "")
+
+
+def render_card(number: int, row: Row, asset: Asset | None, run_id: str = "") -> str:
+    """HTML of one ``embryo-card``; values from ``row`` are escaped as they are rendered."""
+    name = str(row.get("image_name", ""))
+    quality = str(row.get("quality_score", ""))
+    return CARD.render(
+        image=_image_html(asset, name),
+        number=number,
+        name=name,
+        run_id=row.get("run_id") or run_id,
+        grade=row.get("gardner_grade", ""),
+        expansion=row.get("expansion", ""),
+        icm=row.get("icm_quality", ""),
+        te=row.get("te_quality", ""),
+        quality_class=_quality_class(quality),
+        quality=quality,
+        explanation=row.get("explanation", ""),
+    )
+
+
+def render_head(config: ReportConfig, subtitle: str = "AI-Assisted Gardner Scale Grading") -> str:
+    return HEAD.render(title=config.title, style=STYLE, subtitle=subtitle)
+
+
+def render_summary(config: ReportConfig, total: int | None, generated: datetime.datetime | None = None) -> str:
+    generated = generated or datetime.datetime.now()
+    summary = []
+    if total is not None:
+        summary.append(("Total Images Analyzed", str(total)))
+    summary += [
+        ("Model Used", config.model_name),
+        ("Grading Scale", "Gardner Scale (Expansion 1-6, ICM A-C, TE A-C)"),
+        ("Date Generated", generated.strftime("%B %d, %Y at %I:%M %p")),
+    ]
+    rows = "".join(f"            <tr><th>{label}</th><td>{escape(value)}</td></tr>\n" for label, value in summary)
+    return SUMMARY.render(rows=rows)
+
+
+def render_header(
+    config: ReportConfig,
+    total: int | None,
+    generated: datetime.datetime | None = None,
+    sections: Sequence[str] = (),
+) -> str:
+    """Everything before the first card of a single-page report.
+
+    ``sections`` are extra HTML blocks shown after the summary, such as
+    :func:`embryograding.interobserver.render_section`.
+    """
+    summary = render_summary(config, total, generated)
+    return render_head(config) + summary + "".join(sections) + REVIEW_BAR + CARDS_HEADING
+
+
+def iter_report(
+    cards: Iterable[str], config: ReportConfig, total: int | None = None, sections: Sequence[str] = ()
+) -> Iterator[str]:
+    """Yield a single-page report chunk by chunk: header, each card, footer.
+
+    ``cards`` is consumed lazily, so the document can be streamed to a file
+    (:func:`~embryograding.htmlstream.write_chunks`) or an HTTP response
+    (:func:`~embryograding.htmlstream.encode_chunks`) with memory use
+    independent of the number of cards.
+    """
+    yield render_header(config, total, sections=sections)
+    yield from cards
+    yield REVIEW_FOOTER
+
+
+def _resolve(row: Row, base_dir: Path) -> Path:
+    path = Path(str(row.get("image_path", "")))
+    return path if path.is_absolute() else base_dir / path
+
+
+_DAY = re.compile(r"^(D\d+)[_\-]", re.I)
+
+
+def embryo_day(image_name: str) -> str:
+    """Day of development from names like ``D5_368.jpg`` ("D5"), or ""."""
+    match = _DAY.match(image_name)
+    return match.group(1).upper() if match else ""
+
+
+def page_filename(page: int) -> str:
+    return f"page-{page:04d}.html"
+
+
+class _IndexWriter:
+    """Stream the card index to ``index.json`` and ``index.js`` as cards are written.
+
+    ``index.js`` holds the same JSON assigned to ``window.REPORT_INDEX``,
+    because browsers refuse ``fetch()`` of local files and reports are
+    usually opened straight from disk.
+    """
+
+    FIELDS = ["number", "name", "grade", "quality", "day", "page"]
+
+    def __init__(self, out_dir: Path) -> None:
+        self.paths = [out_dir / "index.json", out_dir / "index.js"]
+        self._files = [path.with_name(f".{path.name}.tmp").open("w", encoding="utf-8") for path in self.paths]
+        fields = json.dumps(self.FIELDS, separators=(",", ":"))
+        self._write(f'{{"fields":{fields},"rows":[', prefix="window.REPORT_INDEX = ")
+        self._first = True
+
+    def _write(self, text: str, prefix: str = "", suffix: str = "") -> None:
+        json_fh, js_fh = self._files
+        json_fh.write(text)
+        js_fh.write(prefix + text + suffix)
+
+    def add(self, number: int, row: Row, page: int) -> None:
+        name = str(row.get("image_name", ""))
+        entry = [number, name, str(row.get("gardner_grade", "")), str(row.get("quality_score", "")),
+                 embryo_day(name), page]
+        self._write(("" if self._first else ",\n") + json.dumps(entry, ensure_ascii=False, separators=(",", ":")))
+        self._first = False
+
+    def close(self, pages: int, page_size: int) -> int:
+        self._write(f'],"pages":{pages},"page_size":{page_size}}}', suffix=";")
+        self._write("\n")
+        size = 0
+        for fh, path in zip(self._files, self.paths):
+            fh.close()
+            os.replace(fh.name, path)
+            size += path.stat().st_size
+        return size
+
+    def abort(self) -> None:
+        for fh in self._files:
+            fh.close()
+            Path(fh.name).unlink(missing_ok=True)
+
+
+# Page files delimit each card so an incremental update can splice new cards
+# between unchanged ones. Card content is escaped and cannot contain these.
+CARD_MARK = "\n<!--card-->"
+CARDS_END = "\n<!--end cards-->\n"
+
+
+def _page_nav(page: int, last: bool | None, landing: str) -> str:
+    links = [f'<a href="{landing}">All embryos</a>']
+    if page > 1:
+        links.append(f'<a href="{page_filename(page - 1)}">&larr; Previous</a>')
+    links.append(f"<span>Page {page}</span>")
+    if last is False:
+        links.append(f'<a href="{page_filename(page + 1)}">Next &rarr;</a>')
+    return '    <div class="page-nav">' + " ".join(links) + "</div>\n"
+
+
+def _page_head(config: ReportConfig, page: int, first: int, landing: str) -> str:
+    head = render_head(config, f"Page {page}, from embryo #{first}")
+    return head + REVIEW_BAR + _page_nav(page, None, landing)
+
+
+def _page_tail(page: int, last: bool, landing: str) -> str:
+    return CARDS_END + _page_nav(page, last, landing) + REVIEW_FOOTER
+
+
+def _split_page(text: str) -> list[str]:
+    """The cards of a page file, in order."""
+    start = text.find(CARD_MARK)
+    end = text.rfind(CARDS_END)
+    if start < 0 or end < 0:
+        return []
+    return text[start:end].split(CARD_MARK)[1:]
+
+
+# Bump when render_card's markup changes in a way CARD.source does not show.
+CARD_VERSION = 1
+TEMPLATE_VERSION = f"{CARD_VERSION}-{hashlib.sha256(CARD.source.encode('utf-8')).hexdigest()[:12]}"
+
+_CARD_FIELDS = ["image_name", "gardner_grade", "expansion", "icm_quality", "te_quality", "quality_score", "explanation"]
+
+
+def card_fingerprint(row: Row, image_path: Path, config: ReportConfig) -> str:
+    """Identify everything a card's HTML depends on besides its position.
+
+    That is the template version, thumbnail settings, the image (its
+    ``image_sha256`` when the row has one, otherwise size and modification
+    time) and the rendered result fields.
+    """
+    image = row.get("image_sha256")
+    if not image:
+        try:
+            st = image_path.stat()
+            image = f"{st.st_size}:{st.st_mtime_ns}"
+        except OSError:
+            image = "missing"
+    digest = hashlib.blake2b(digest_size=12)
+    for value in (
+        TEMPLATE_VERSION, config.thumb_edge, config.thumb_format, config.thumb_quality, image,
+        row.get("run_id") or config.run_id,
+        *(row.get(name, "") for name in _CARD_FIELDS),
+    ):
+        digest.update(str(value).encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+MANIFEST = "cards.manifest"
+
+
+class _ManifestWriter:
+    """Stream one card fingerprint per line after a JSON header line."""
+
+    def __init__(self, out_dir: Path, page_size: int, landing: str) -> None:
+        self.path = out_dir / MANIFEST
+        self._fh = self.path.with_name(f".{MANIFEST}.tmp").open("w", encoding="utf-8")
+        header = {"template": TEMPLATE_VERSION, "page_size": page_size, "landing": landing}
+        self._fh.write(json.dumps(header) + "\n")
+
+    def add(self, fingerprint: str) -> None:
+        self._fh.write(fingerprint + "\n")
+
+    def close(self) -> None:
+        self._fh.close()
+        os.replace(self._fh.name, self.path)
+
+    def abort(self) -> None:
+        self._fh.close()
+        Path(self._fh.name).unlink(missing_ok=True)
+
+
+def _read_manifest(out_dir: Path, page_size: int, landing: str) -> Iterator[str] | None:
+    """Fingerprints of an existing paginated report, or ``None`` if it can't be updated."""
+    path = out_dir / MANIFEST
+    try:
+        fh = path.open(encoding="utf-8")
+    except FileNotFoundError:
+        return None
+    header = json.loads(fh.readline() or "{}")
+    if header != {"template": TEMPLATE_VERSION, "page_size": page_size, "landing": landing}:
+        fh.close()
+        return None
+
+    def fingerprints() -> Iterator[str]:
+        with fh:
+            for line in fh:
+                yield line.rstrip("\n")
+
+    return fingerprints()
+
+
+class _PageWriter:
+    """Write cards into numbered pages of ``page_size``, one page open at a time.
+
+    A page is finished only when the next card arrives (or the stream
+    ends), so its bottom navigation knows whether a next page exists
+    without the card count being known up front. Finished pages stay
+    temporary files until :meth:`close`, so an interrupted rebuild leaves
+    the previous report as it was.
+    """
+
+    def __init__(self, out_dir: Path, config: ReportConfig, page_size: int, landing: str) -> None:
+        self.out_dir = out_dir
+        self.config = config
+        self.page_size = page_size
+        self.landing = landing
+        self.pages = 0
+        self.html_bytes = 0
+        self._fh: TextIO | None = None
+        self._finished: list[Path] = []
+
+    def add(self, number: int, card: str) -> int:
+        """Write one card and return its page number."""
+        if (number - 1) % self.page_size == 0:
+            self._finish(last=False)
+            self.pages += 1
+            path = self.out_dir / page_filename(self.pages)
+            self._fh = path.with_name(f".{path.name}.tmp").open("w", encoding="utf-8")
+            self._fh.write(_page_head(self.config, self.pages, number, self.landing))
+        assert self._fh is not None
+        self._fh.write(CARD_MARK)
+        self._fh.write(card)
+        return self.pages
+
+    def _finish(self, last: bool) -> None:
+        if self._fh is None:
+            return
+        self._fh.write(_page_tail(self.pages, last, self.landing))
+        self._fh.close()
+        tmp = Path(self._fh.name)
+        self.html_bytes += tmp.stat().st_size
+        self._finished.append(tmp)
+        self._fh = None
+
+    def close(self) -> None:
+        self._finish(last=True)
+        for page, tmp in enumerate(self._finished, 1):
+            os.replace(tmp, self.out_dir / page_filename(page))
+        self._finished = []
+        # Pages left over from an earlier, longer report.
+        stale = self.pages + 1
+        while (self.out_dir / page_filename(stale)).exists():
+            (self.out_dir / page_filename(stale)).unlink()
+            stale += 1
+
+    def abort(self) -> None:
+        if self._fh is not None:
+            self._fh.close()
+            self._finished.append(Path(self._fh.name))
+            self._fh = None
+        for tmp in self._finished:
+            tmp.unlink(missing_ok=True)
+        self._finished = []
+
+
+def render_landing(
+    config: ReportConfig, total: int, pages: int, page_size: int, sections: Sequence[str] = ()
+) -> str:
+    """The entry page of a paginated report: summary, extra sections, filter and page list."""
+    links = "".join(
+        f'        <a href="{page_filename(page)}">'
+        f"{(page - 1) * page_size + 1}\u2013{min(page * page_size, total)}</a>\n"
+        for page in range(1, pages + 1)
+    )
+    return (
+        render_head(config)
+        + render_summary(config, total)
+        + "".join(sections)
+        + REVIEW_BAR
+        + FILTER.render(links=links, index_script="index.js", report_script=REPORT_SCRIPT_NAME)
+        + REVIEW_FOOTER
+    )
+
+
+REPORT_SCRIPT_NAME = "report.js"
+
+# Filters the card index on the landing page and links matches to their
+# page and card. Only the first LIMIT matches are listed.
+REPORT_SCRIPT = """\
+(function () {
+  var index = window.REPORT_INDEX;
+  if (!index) { return; }
+  var LIMIT = 200;
+  var col = {};
+  index.fields.forEach(function (field, i) { col[field] = i; });
+  var rows = index.rows;
+
+  function pageFile(page) {
+    var digits = String(page);
+    while (digits.length < 4) { digits = '0' + digits; }
+    return 'page-' + digits + '.html';
+  }
+
+  function fill(id, field) {
+    var select = document.getElementById(id);
+    var counts = {};
+    rows.forEach(function (row) { var v = row[col[field]]; counts[v] = (counts[v] || 0) + 1; });
+    Object.keys(counts).sort().forEach(function (value) {
+      var option = document.createElement('option');
+      option.value = value;
+      option.textContent = (value || '(none)') + ' (' + counts[value] + ')';
+      select.appendChild(option);
+    });
+    select.addEventListener('change', update);
+  }
+
+  function value(id) { return document.getElementById(id).value; }
+
+  function update() {
+    var name = value('filter-name').toLowerCase();
+    var filters = [
+      ['grade', value('filter-grade')], ['quality', value('filter-quality')], ['day', value('filter-day')]
+    ];
+    var list = document.getElementById('filter-results');
+    list.textContent = '';
+    var matches = 0;
+    for (var i = 0; i < rows.length; i++) {
+      var row = rows[i];
+      if (name && row[col.name].toLowerCase().indexOf(name) < 0) { continue; }
+      var keep = true;
+      for (var j = 0; j < filters.length; j++) {
+        if (filters[j][1] && row[col[filters[j][0]]] !== filters[j][1]) { keep = false; break; }
+      }
+      if (!keep) { continue; }
+      matches++;
+      if (matches > LIMIT) { continue; }
+      var item = document.createElement('li');
+      var link = document.createElement('a');
+      link.href = pageFile(row[col.page]) + '#card-' + row[col.number];
+      link.textContent = row[col.name] + ' \u2014 ' + row[col.grade] + ' \u2014 ' + row[col.quality];
+      item.appendChild(link);
+      list.appendChild(item);
+    }
+    document.getElementById('filter-count').textContent =
+      matches + ' of ' + rows.length + ' embryos' + (matches > LIMIT ? ' (first ' + LIMIT + ' shown)' : '');
+  }
+
+  fill('filter-grade', 'grade');
+  fill('filter-quality', 'quality');
+  fill('filter-day', 'day');
+  document.getElementById('filter-name').addEventListener('input', update);
+  update();
+})();
+"""
+
+# Keeps each card's expert inputs in localStorage, shared by every page of
+# the report directory, and downloads them as one JSON document in the
+# format read by :func:`embryograding.reviews.read_reviews`.
+REVIEW_SCRIPT = """\
+(function () {
+  var KEY = 'embryograding-reviews:' + location.pathname.replace(/[^\\/]*$/, '');
+  var INPUTS = [['expert_grade', '.expert-grade'], ['agree', '.expert-agree'], ['comments', '.expert-comments']];
+
+  function load() {
+    try {
+      return JSON.parse(localStorage.getItem(KEY)) || {reviewer: '', reviews: {}};
+    } catch (e) {
+      return {reviewer: '', reviews: {}};
+    }
+  }
+
+  // Without storage (private windows, some file:// setups) the page still
+  // exports what was entered on it.
+  function save() {
+    try { localStorage.setItem(KEY, JSON.stringify(state)); } catch (e) { /* keep in memory */ }
+  }
+
+  var state = load();
+
+  function keyOf(card) { return card.getAttribute('data-run') + '\\n' + card.getAttribute('data-name'); }
+
+  function showCount() {
+    var count = Object.keys(state.reviews).length;
+    document.getElementById('review-count').textContent = count + (count === 1 ? ' embryo' : ' embryos') + ' reviewed';
+  }
+
+  function record(card) {
+    var review = {
+      image_name: card.getAttribute('data-name'),
+      run_id: card.getAttribute('data-run'),
+      ai_grade: card.getAttribute('data-grade')
+    };
+    var empty = true;
+    INPUTS.forEach(function (input) {
+      var value = card.querySelector(input[1]).value;
+      review[input[0]] = value;
+      if (value.trim()) { empty = false; }
+    });
+    if (empty) {
+      delete state.reviews[keyOf(card)];
+    } else {
+      review.updated_at = new Date().toISOString();
+      state.reviews[keyOf(card)] = review;
+    }
+    save();
+    showCount();
+  }
+
+  Array.prototype.forEach.call(document.querySelectorAll('.embryo-card[data-name]'), function (card) {
+    var review = state.reviews[keyOf(card)];
+    if (review) {
+      INPUTS.forEach(function (input) { card.querySelector(input[1]).value = review[input[0]] || ''; });
+    }
+    card.addEventListener('input', function () { record(card); });
+    card.addEventListener('change', function () { record(card); });
+  });
+
+  var reviewer = document.getElementById('reviewer');
+  reviewer.value = state.reviewer || '';
+  reviewer.addEventListener('input', function () { state.reviewer = reviewer.value; save(); });
+
+  // Another page of the report open in a second tab.
+  window.addEventListener('storage', function (event) {
+    if (event.key === KEY) {
+      state = load();
+      reviewer.value = state.reviewer || '';
+      showCount();
+    }
+  });
+
+  document.getElementById('export-reviews').addEventListener('click', function () {
+    var reviews = Object.keys(state.reviews).sort().map(function (key) { return state.reviews[key]; });
+    var exported = new Date().toISOString();
+    var doc = {
+      format: 'embryograding-reviews', version: 1, exported_at: exported,
+      reviewer: state.reviewer || '', report: document.title, reviews: reviews
+    };
+    var link = document.createElement('a');
+    link.href = URL.createObjectURL(new Blob([JSON.stringify(doc, null, 1)], {type: 'application/json'}));
+    var who = (state.reviewer || 'expert').replace(/[^\\w-]+/g, '_');
+    link.download = 'reviews-' + who + '-' + exported.slice(0, 10) + '.json';
+    document.body.appendChild(link);
+    link.click();
+    document.body.removeChild(link);
+    setTimeout(function () { URL.revokeObjectURL(link.href); }, 0);
+  });
+
+  showCount();
+})();
+"""
+
+
+def write_report(
+    rows: Iterable[Row],
+    out_dir: str | Path,
+    config: ReportConfig | None = None,
+    workers: int | None = None,
+    base_dir: str | Path = ".",
+    filename: str = "verification_report.html",
+    total: int | None = None,
+    page_size: int | None = None,
+    incremental: bool = False,
+    sections: Sequence[str] = (),
+) -> ReportStats:
+    """Write ``out_dir/filename`` and its ``assets/`` for ``rows``.
+
+    Relative ``image_path`` values are resolved against ``base_dir``. Cards
+    are written as their assets become ready, so ``rows`` may be a lazy
+    iterator (e.g. :meth:`ResultStore.rows`); pass ``total`` to show the
+    image count in the summary in that case.
+
+    With ``page_size``, cards go into ``page-0001.html``, ``page-0002.html``
+    ... in a single pass, with a card index (``index.json`` / ``index.js``)
+    and ``filename`` becomes a landing page that filters the index by name,
+    grade, quality and day. Memory use does not grow with the report.
+
+    With ``incremental`` as well, an existing paginated report in
+    ``out_dir`` is updated in place: each card's fingerprint (see
+    :func:`card_fingerprint`) is compared with the previous run's, only
+    changed cards are rendered, and they are spliced into their pages
+    between the unchanged cards. Pages without changes are not touched.
+    Falls back to a full rebuild when there is no compatible previous
+    report.
+
+    ``sections`` are extra HTML blocks placed after the summary of the
+    single page or the landing page.
+    """
+    config = config or ReportConfig()
+    out_dir = Path(out_dir)
+    out_dir.mkdir(parents=True, exist_ok=True)
+    base = Path(base_dir)
+    stats = ReportStats()
+    started = time.perf_counter()
+    if total is None and hasattr(rows, "__len__"):
+        total = len(rows)
+    workers = workers or os.cpu_count() or 1
+
+    if page_size and incremental:
+        previous = _read_manifest(out_dir, page_size, filename)
+        if previous is not None:
+            _update_pages(rows, previous, out_dir, config, page_size, filename, base, workers, stats)
+            _finish_pages(out_dir, config, page_size, filename, stats, sections)
+            stats.elapsed = time.perf_counter() - started
+            return stats
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        def submit(row: Row) -> Future[Asset | None]:
+            return pool.submit(prepare_asset, str(_resolve(row, base)), out_dir, config)
+
+        def cards() -> Iterator[tuple[int, Row, str]]:
+            for row, asset in _ordered(submit, rows, window=8 * workers):
+                stats.cards += 1
+                if asset is None:
+                    stats.missing_images += 1
+                    log.warning("image for %s not found", row.get("image_name"))
+                stats.rendered += 1
+                yield stats.cards, row, render_card(stats.cards, row, asset, config.run_id)
+
+        if page_size:
+            _write_pages(cards(), out_dir, config, page_size, filename, base, stats)
+            _finish_pages(out_dir, config, page_size, filename, stats, sections)
+        else:
+            chunks = iter_report((card for _, _, card in cards()), config, total, sections)
+            stats.html_bytes = write_chunks(chunks, out_dir / filename)
+            (out_dir / REVIEW_SCRIPT_NAME).write_text(REVIEW_SCRIPT, encoding="utf-8")
+    stats.elapsed = time.perf_counter() - started
+    return stats
+
+
+def _write_pages(
+    cards: Iterable[tuple[int, Row, str]],
+    out_dir: Path,
+    config: ReportConfig,
+    page_size: int,
+    filename: str,
+    base_dir: Path,
+    stats: ReportStats,
+) -> None:
+    pages = _PageWriter(out_dir, config, page_size, filename)
+    index = _IndexWriter(out_dir)
+    manifest = _ManifestWriter(out_dir, page_size, filename)
+    try:
+        for number, row, card in cards:
+            index.add(number, row, pages.add(number, card))
+            manifest.add(card_fingerprint(row, _resolve(row, base_dir), config))
+    except BaseException:
+        # Leave the previous report whole: no page, index or manifest is replaced.
+        pages.abort()
+        index.abort()
+        manifest.abort()
+        raise
+    pages.close()
+    stats.index_bytes = index.close(pages.pages, page_size)
+    manifest.close()
+    stats.pages = stats.pages_written = pages.pages
+    stats.html_bytes += pages.html_bytes
+
+
+def _finish_pages(
+    out_dir: Path, config: ReportConfig, page_size: int, filename: str, stats: ReportStats, sections: Sequence[str]
+) -> None:
+    (out_dir / REPORT_SCRIPT_NAME).write_text(REPORT_SCRIPT, encoding="utf-8")
+    (out_dir / REVIEW_SCRIPT_NAME).write_text(REVIEW_SCRIPT, encoding="utf-8")
+    landing = out_dir / filename
+    landing.write_text(render_landing(config, stats.cards, stats.pages, page_size, sections), encoding="utf-8")
+    stats.html_bytes += landing.stat().st_size
+
+
+def _update_pages(
+    rows: Iterable[Row],
+    previous: Iterator[str],
+    out_dir: Path,
+    config: ReportConfig,
+    page_size: int,
+    filename: str,
+    base_dir: Path,
+    workers: int,
+    stats: ReportStats,
+) -> None:
+    """Splice changed cards into an existing paginated report.
+
+    One pass over ``rows`` rewrites the (small) index and manifest and
+    collects the rows whose fingerprint differs from the previous run at
+    the same position; only the pages holding those are rebuilt.
+    """
+    index = _IndexWriter(out_dir)
+    manifest = _ManifestWriter(out_dir, page_size, filename)
+    changed: dict[int, Row] = {}
+    old_count = 0
+    try:
+        for number, row in enumerate(rows, 1):
+            fingerprint = card_fingerprint(row, _resolve(row, base_dir), config)
+            old = next(previous, None)
+            if old is not None:
+                old_count += 1
+            if old != fingerprint:
+                changed[number] = row
+            index.add(number, row, (number - 1) // page_size + 1)
+            manifest.add(fingerprint)
+            stats.cards = number
+        old_count += sum(1 for _ in previous)
+        pages = -(-stats.cards // page_size)
+        old_pages = -(-old_count // page_size)
+
+        dirty = {(number - 1) // page_size + 1 for number in changed}
+        if stats.cards != old_count and pages:
+            # The last page gains or loses cards, or its "Next" link changes.
+            dirty.update(range(min(pages, old_pages) or 1, pages + 1))
+        assets = _prepare_assets(changed, out_dir, config, base_dir, workers)
+        stats.missing_images = sum(1 for asset in assets.values() if asset is None)
+
+        for page in sorted(dirty):
+            first = (page - 1) * page_size + 1
+            last = min(page * page_size, stats.cards)
+            path = out_dir / page_filename(page)
+            old_cards = _split_page(path.read_text(encoding="utf-8")) if path.exists() else []
+            chunks = [_page_head(config, page, first, filename)]
+            for number in range(first, last + 1):
+                if number in changed:
+                    card = render_card(number, changed[number], assets[number], config.run_id)
+                    stats.rendered += 1
+                elif number - first < len(old_cards):
+                    card = old_cards[number - first]
+                else:
+                    raise ValueError(f"{path} is missing cards; rebuild the report without incremental")
+                chunks += [CARD_MARK, card]
+            chunks.append(_page_tail(page, page == pages, filename))
+            stats.html_bytes += write_chunks(chunks, path)
+            stats.pages_written += 1
+        for stale in range(pages + 1, old_pages + 1):
+            (out_dir / page_filename(stale)).unlink(missing_ok=True)
+    except BaseException:
+        index.abort()
+        manifest.abort()
+        raise
+    stats.index_bytes = index.close(pages, page_size)
+    manifest.close()
+    stats.pages = pages
+
+
+def _prepare_assets(
+    rows: dict[int, Row], out_dir: Path, config: ReportConfig, base_dir: Path, workers: int
+) -> dict[int, Asset | None]:
+    """Assets for a handful of rows; a process pool only pays off for many."""
+    if len(rows) < 4 * workers or workers == 1:
+        return {n: prepare_asset(_resolve(row, base_dir), out_dir, config) for n, row in rows.items()}
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {
+            n: pool.submit(prepare_asset, str(_resolve(row, base_dir)), out_dir, config) for n, row in rows.items()
+        }
+        return {n: future.result() for n, future in futures.items()}
+
+
+def read_rows(source: str | Path) -> Iterator[Row]:
+    """Rows of a results CSV or a :class:`~embryograding.store.ResultStore` directory."""
+    source = Path(source)
+    if source.is_dir():
+        from .store import ResultStore
+
+        yield from ResultStore(source).rows()
+        return
+    with source.open(newline="", encoding="utf-8") as fh:
+        yield from csv.DictReader(fh)
+
+
+def count_rows(source: str | Path) -> int:
+    """Number of rows :func:`read_rows` yields, for the summary's image count.
+
+    A store knows its length; a CSV takes one pass that does not build rows.
+    """
+    source = Path(source)
+    if source.is_dir():
+        from .store import ResultStore
+
+        with ResultStore(source) as store:
+            return len(store)
+    with source.open(newline="", encoding="utf-8") as fh:
+        # Fields may span lines, so records are counted by the csv reader;
+        # like DictReader, blank lines are not rows.
+        return max(sum(1 for record in csv.reader(fh) if record) - 1, 0)
@@ -0,0 +1,109 @@
+"""Expert reviews exported from the verification report.
+
+Each report card has "Your Grade", "Agree?" and "Comments" inputs. The
+report's ``review.js`` keeps what the expert types in the browser and its
+"Export reviews (JSON)" button downloads a document like::
+
+    {"format": "embryograding-reviews", "version": 1,
+     "exported_at": "2025-11-03T09:12:44.051Z", "reviewer": "Dr. A",
+     "reviews": [{"image_name": "D5_368.jpg", "run_id": "4f1c...", "ai_grade": "4AA",
+                  "expert_grade": "4AB", "agree": "partial", "comments": "...",
+                  "updated_at": "2025-11-03T09:10:02.118Z"}]}
+
+:func:`read_reviews` validates and normalises such files and
+:meth:`RunRegistry.import_reviews <embryograding.registry.RunRegistry.import_reviews>`
+loads them, keyed by run, image name and reviewer.
+"""
+
+from __future__ import annotations
+
+import datetime
+import json
+import re
+from pathlib import Path
+from typing import Any, Iterator
+
+REVIEW_FORMAT = "embryograding-reviews"
+REVIEW_VERSION = 1
+
+REVIEW_FIELDS = [
+    "run_id",
+    "image_name",
+    "reviewer",
+    "ai_grade",
+    "expert_grade",
+    "agree",
+    "comments",
+    "reviewed_at",
+]
+
+AGREEMENTS = ("yes", "no", "partial")
+_AGREEMENT_ALIASES = {"partially": "partial", "y": "yes", "n": "no"}
+
+_SPACE = re.compile(r"\s+")
+
+
+def _timestamp(value: Any) -> float | None:
+    """Seconds since the epoch from an ISO 8601 string (``Z`` allowed) or a number."""
+    if value in (None, ""):
+        return None
+    if isinstance(value, (int, float)):
+        return float(value)
+    text = str(value)
+    if text.endswith("Z"):
+        text = text[:-1] + "+00:00"
+    moment = datetime.datetime.fromisoformat(text)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=datetime.timezone.utc)
+    return moment.timestamp()
+
+
+def normalise_review(entry: dict[str, Any], reviewer: str = "", reviewed_at: float | None = None) -> dict[str, Any]:
+    """One review with the fields of :data:`REVIEW_FIELDS`, cleaned up.
+
+    Grades are upper-cased without spaces ("4 aa" -> "4AA"), the agreement
+    is one of :data:`AGREEMENTS` or "". Raises ``ValueError`` for entries
+    without an image name or with an unknown agreement.
+    """
+    name = str(entry.get("image_name") or "").strip()
+    if not name:
+        raise ValueError("review without image_name")
+    agree = str(entry.get("agree") or "").strip().lower()
+    agree = _AGREEMENT_ALIASES.get(agree, agree)
+    if agree and agree not in AGREEMENTS:
+        raise ValueError(f"{name}: unknown agreement {entry.get('agree')!r}")
+    updated = _timestamp(entry.get("updated_at"))
+    return {
+        "run_id": str(entry.get("run_id") or ""),
+        "image_name": name,
+        "reviewer": str(entry.get("reviewer") or reviewer).strip(),
+        "ai_grade": _SPACE.sub("", str(entry.get("ai_grade") or "")).upper(),
+        "expert_grade": _SPACE.sub("", str(entry.get("expert_grade") or "")).upper(),
+        "agree": agree,
+        "comments": str(entry.get("comments") or "").strip(),
+        "reviewed_at": updated if updated is not None else reviewed_at,
+    }
+
+
+def read_reviews(path: str | Path) -> Iterator[dict[str, Any]]:
+    """Normalised reviews from one exported JSON document.
+
+    Raises ``ValueError`` when the file is not a review export (or is from
+    a newer version of the format) or holds an invalid entry.
+    """
+    path = Path(path)
+    with path.open("rb") as fh:
+        doc = json.load(fh)
+    if not isinstance(doc, dict) or doc.get("format") != REVIEW_FORMAT:
+        raise ValueError(f"{path} is not an exported review file")
+    if doc.get("version", 0) > REVIEW_VERSION:
+        raise ValueError(f"{path} has review format version {doc['version']}; this version reads {REVIEW_VERSION}")
+    reviewer = str(doc.get("reviewer") or "")
+    exported = _timestamp(doc.get("exported_at"))
+    for number, entry in enumerate(doc.get("reviews") or [], 1):
+        try:
+            review = normalise_review(entry, reviewer, exported)
+        except (ValueError, TypeError, AttributeError) as exc:
+            raise ValueError(f"{path}: review {number}: {exc}") from exc
+        if review["expert_grade"] or review["agree"] or review["comments"]:
+            yield review
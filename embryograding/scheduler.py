@@ -0,0 +1,243 @@
+"""Client-side request scheduling for the Gemini API.
+
+:class:`RequestScheduler` sits between the batch grader and the network and
+
+* enforces requests-per-minute and tokens-per-minute budgets with token
+  buckets, so batches stay under quota instead of tripping it;
+* retries 429 / 503 (and dropped connections) with jittered exponential
+  backoff, honouring ``Retry-After`` when the server sends one;
+* adapts the number of requests in flight with AIMD: the limit grows by
+  one per window of fast successes and is cut multiplicatively on
+  throttling or when latency exceeds the target.
+
+Everything it does is visible through :attr:`RequestScheduler.stats`.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import collections
+import logging
+import random
+import time
+from dataclasses import dataclass
+from typing import Awaitable, Callable, TypeVar
+
+from .client import GeminiAPIError
+from .transport import TransportError
+
+log = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+RETRYABLE_STATUSES = frozenset({429, 500, 503})
+
+
+class TokenBucket:
+    """An asyncio token bucket refilled continuously at ``per_minute``.
+
+    ``capacity`` defaults to one minute's worth of tokens, i.e. the full
+    budget may be spent in a burst. The level may go negative through
+    :meth:`debit`, which delays later acquisitions until the debt is repaid.
+    """
+
+    def __init__(self, per_minute: float, capacity: float | None = None) -> None:
+        if per_minute <= 0:
+            raise ValueError("per_minute must be positive")
+        self.rate = per_minute / 60.0
+        self.capacity = per_minute if capacity is None else capacity
+        self.level = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, amount: float = 1.0) -> None:
+        """Wait until ``amount`` tokens are available and take them."""
+        amount = min(amount, self.capacity)
+        # The lock keeps waiters FIFO so large requests are not starved.
+        async with self._lock:
+            while True:
+                self._refill()
+                if self.level >= amount:
+                    self.level -= amount
+                    return
+                await asyncio.sleep((amount - self.level) / self.rate)
+
+    def debit(self, amount: float) -> None:
+        """Take ``amount`` tokens without waiting (used to settle estimates)."""
+        self._refill()
+        self.level -= amount
+
+
+@dataclass
+class SchedulerStats:
+    concurrency_limit: float = 0.0
+    in_flight: int = 0
+    queue_depth: int = 0
+    requests: int = 0
+    succeeded: int = 0
+    failed: int = 0
+    retries: int = 0
+    throttled: int = 0
+    current_rate: float = 0.0
+    mean_latency: float = 0.0
+
+
+class RequestScheduler:
+    """Rate-limited, retrying, adaptively concurrent request runner."""
+
+    def __init__(
+        self,
+        requests_per_minute: float | None = None,
+        tokens_per_minute: float | None = None,
+        initial_concurrency: int = 4,
+        min_concurrency: int = 1,
+        max_concurrency: int = 64,
+        target_latency: float = 10.0,
+        max_retries: int = 6,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        backoff_factor: float = 0.5,
+    ) -> None:
+        if not 1 <= min_concurrency <= initial_concurrency <= max_concurrency:
+            raise ValueError("need 1 <= min_concurrency <= initial_concurrency <= max_concurrency")
+        self.request_bucket = TokenBucket(requests_per_minute) if requests_per_minute else None
+        self.token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute else None
+        self.min_concurrency = min_concurrency
+        self.max_concurrency = max_concurrency
+        self.target_latency = target_latency
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.backoff_factor = backoff_factor
+
+        self._limit = float(initial_concurrency)
+        self._in_flight = 0
+        self._waiting = 0
+        self._slot_freed = asyncio.Condition()
+        self._last_decrease = 0.0
+        self._completions: collections.deque[float] = collections.deque()
+        self._latency_sum = 0.0
+        self._counts = SchedulerStats()
+
+    @property
+    def stats(self) -> SchedulerStats:
+        """A snapshot of the scheduler's current state and counters."""
+        now = time.monotonic()
+        while self._completions and self._completions[0] < now - 60.0:
+            self._completions.popleft()
+        counts = self._counts
+        return SchedulerStats(
+            concurrency_limit=self._limit,
+            in_flight=self._in_flight,
+            queue_depth=self._waiting,
+            requests=counts.requests,
+            succeeded=counts.succeeded,
+            failed=counts.failed,
+            retries=counts.retries,
+            throttled=counts.throttled,
+            current_rate=len(self._completions) / 60.0,
+            mean_latency=self._latency_sum / counts.succeeded if counts.succeeded else 0.0,
+        )
+
+    async def submit(self, call: Callable[[], Awaitable[T]], tokens: float = 0.0) -> T:
+        """Run ``call`` under the rate limits, retrying transient failures.
+
+        ``tokens`` is the caller's estimate of the request's token usage,
+        charged against the tokens-per-minute budget before each attempt.
+        """
+        attempt = 0
+        last_error: Exception | None = None
+        while True:
+            await self._acquire_slot()
+            try:
+                if self.request_bucket is not None:
+                    await self.request_bucket.acquire(1)
+                if self.token_bucket is not None and tokens:
+                    await self.token_bucket.acquire(tokens)
+                self._counts.requests += 1
+                started = time.monotonic()
+                try:
+                    result = await call()
+                except (GeminiAPIError, TransportError, ConnectionError, asyncio.TimeoutError) as exc:
+                    retry_after = self._on_failure(exc)
+                    if retry_after is None or attempt >= self.max_retries:
+                        self._counts.failed += 1
+                        raise
+                    last_error = exc
+                else:
+                    self._on_success(time.monotonic() - started)
+                    return result
+            finally:
+                await self._release_slot()
+
+            attempt += 1
+            self._counts.retries += 1
+            delay = max(retry_after, self._backoff(attempt))
+            log.debug("retrying in %.2fs (attempt %d): %s", delay, attempt, last_error)
+            await asyncio.sleep(delay)
+
+    def settle_tokens(self, estimated: float, actual: float) -> None:
+        """Charge the difference between estimated and actual token usage."""
+        if self.token_bucket is not None and actual > estimated:
+            self.token_bucket.debit(actual - estimated)
+
+    def _backoff(self, attempt: int) -> float:
+        # "Full jitter": uniform in [0, min(max_delay, base * 2**(attempt - 1))], attempt counting from 1.
+        return random.uniform(0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def _on_failure(self, exc: Exception) -> float | None:
+        """Update the limit after a failure; return a minimum retry delay or None."""
+        if isinstance(exc, GeminiAPIError):
+            if exc.status not in RETRYABLE_STATUSES:
+                return None
+            if exc.status == 429:
+                self._counts.throttled += 1
+            self._decrease()
+            try:
+                return float(exc.headers.get("retry-after", 0))
+            except ValueError:
+                return 0.0
+        self._decrease()
+        return 0.0
+
+    def _on_success(self, latency: float) -> None:
+        counts = self._counts
+        counts.succeeded += 1
+        self._latency_sum += latency
+        self._completions.append(time.monotonic())
+        if latency > self.target_latency:
+            self._decrease()
+        else:
+            # Additive increase: about +1 per limit's worth of successes.
+            self._limit = min(float(self.max_concurrency), self._limit + 1.0 / self._limit)
+
+    def _decrease(self) -> None:
+        # Requests already in flight when we back off will also fail or be
+        # slow; only cut once per round trip so one burst doesn't collapse
+        # the limit to the floor.
+        now = time.monotonic()
+        succeeded = self._counts.succeeded
+        cooldown = self._latency_sum / succeeded if succeeded else self.base_delay
+        if now - self._last_decrease < cooldown:
+            return
+        self._last_decrease = now
+        self._limit = max(float(self.min_concurrency), self._limit * self.backoff_factor)
+
+    async def _acquire_slot(self) -> None:
+        async with self._slot_freed:
+            self._waiting += 1
+            try:
+                await self._slot_freed.wait_for(lambda: self._in_flight < int(self._limit))
+            finally:
+                self._waiting -= 1
+            self._in_flight += 1
+
+    async def _release_slot(self) -> None:
+        async with self._slot_freed:
+            self._in_flight -= 1
+            self._slot_freed.notify_all()
@@ -0,0 +1,378 @@
+"""Columnar, append-only store of grading results.
+
+``verification_results.csv`` repeats every explanation inside the quoted
+``full_response`` column and spells categorical fields out as free text on
+every row, so a season of results is slow to load and mostly redundant. A
+:class:`ResultStore` is a directory holding:
+
+``rows.bin``
+    One fixed-width record per result (a NumPy structured array, read back
+    with ``np.memmap``). Categorical columns are stored as ``uint16`` codes.
+``meta.json``
+    The categorical dictionaries (code -> value) and the format version.
+``blobs.bin``
+    The response blob table: hash, offset and length of each *distinct*
+    ``full_response``. Identical responses (cache hits, re-runs) share a blob.
+``heap.bin``
+    UTF-8 bytes of image names, paths and response blobs.
+
+The explanation is not stored separately when it appears verbatim inside
+the response (the usual case); rows keep a byte range into the blob
+instead. Files are only ever appended to and ``rows.bin`` is written last,
+so a crash mid-flush loses at most the unflushed rows.
+
+Requires NumPy.
+"""
+
+from __future__ import annotations
+
+import csv
+import hashlib
+import json
+import os
+from pathlib import Path
+from typing import Any, Iterable, Iterator
+
+try:
+    import numpy as np
+except ImportError:  # pragma: no cover - optional dependency
+    np = None
+
+from .engine import CSV_FIELDS, Row
+
+FORMAT_VERSION = 1
+
+# Columns stored as dictionary codes; the rest are strings in the heap.
+CATEGORICAL_FIELDS = ["actual_class", "gardner_grade", "expansion", "icm_quality", "te_quality", "quality_score"]
+
+_MAX_CATEGORIES = 2**16
+_BLOB_CACHE_SIZE = 4096
+
+_ROW_DTYPE = [
+    ("name_offset", "<u8"),
+    ("name_length", "<u4"),
+    ("path_offset", "<u8"),
+    ("path_length", "<u4"),
+    *[(name, "<u2") for name in CATEGORICAL_FIELDS],
+    ("response", "<u4"),
+    ("explanation_blob", "<u4"),
+    ("explanation_start", "<u4"),
+    ("explanation_length", "<u4"),
+]
+
+_BLOB_DTYPE = [("hash", "<u8"), ("offset", "<u8"), ("length", "<u4")]
+
+
+def _require() -> None:
+    if np is None:
+        raise ImportError("the results store requires NumPy (pip install numpy)")
+
+
+def _hash(data: bytes) -> int:
+    return int.from_bytes(hashlib.blake2b(data, digest_size=8).digest(), "little")
+
+
+class ResultStore:
+    """Append results to, and read columns from, a store directory.
+
+    The store is a sink for :meth:`BatchGrader.run` like
+    :class:`~embryograding.engine.CSVResultWriter`: call it with each row.
+    Rows are buffered and written every ``flush_every`` rows, on
+    :meth:`flush` and on :meth:`close`.
+    """
+
+    def __init__(self, path: str | Path, flush_every: int = 1024) -> None:
+        _require()
+        self.path = Path(path)
+        self.flush_every = flush_every
+        self.path.mkdir(parents=True, exist_ok=True)
+        self._row_dtype = np.dtype(_ROW_DTYPE)
+        self._blob_dtype = np.dtype(_BLOB_DTYPE)
+
+        meta_path = self.path / "meta.json"
+        if meta_path.exists():
+            meta = json.loads(meta_path.read_text(encoding="utf-8"))
+            if meta.get("version") != FORMAT_VERSION:
+                raise ValueError(f"{self.path}: unsupported results store version {meta.get('version')!r}")
+            self._categories: dict[str, list[str]] = meta["categories"]
+        else:
+            self._categories = {name: [] for name in CATEGORICAL_FIELDS}
+        self._codes = {name: {value: i for i, value in enumerate(values)} for name, values in self._categories.items()}
+        self._dirty_meta = not meta_path.exists()
+
+        # Drop a torn trailing record left by a crash mid-write.
+        for name, dtype in (("rows.bin", self._row_dtype), ("blobs.bin", self._blob_dtype)):
+            file = self.path / name
+            if file.exists() and file.stat().st_size % dtype.itemsize:
+                with file.open("r+b") as fh:
+                    fh.truncate(file.stat().st_size - file.stat().st_size % dtype.itemsize)
+        (self.path / "heap.bin").touch()
+        self._heap_size = (self.path / "heap.bin").stat().st_size
+        self._blob_count = self._file_records("blobs.bin", self._blob_dtype)
+        self._blob_index: dict[int, int] | None = None
+
+        self._pending_rows: list[tuple[Any, ...]] = []
+        self._pending_blobs: list[tuple[int, int, int]] = []
+        self._pending_heap = bytearray()
+        self._views: dict[str, np.ndarray] = {}
+
+    def __enter__(self) -> "ResultStore":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.flush()
+        self._views.clear()
+
+    def __len__(self) -> int:
+        return self._file_records("rows.bin", self._row_dtype) + len(self._pending_rows)
+
+    def _file_records(self, name: str, dtype: np.dtype) -> int:
+        file = self.path / name
+        return file.stat().st_size // dtype.itemsize if file.exists() else 0
+
+    # -- writing ---------------------------------------------------------
+
+    def __call__(self, row: Row) -> None:
+        self.append(row)
+
+    def append(self, row: Row) -> None:
+        """Buffer one results row (as produced by :func:`build_row`)."""
+        name_offset, name_length = self._put_heap(str(row.get("image_name", "")).encode("utf-8"))
+        path_offset, path_length = self._put_heap(str(row.get("image_path", "")).encode("utf-8"))
+        codes = [self._code(name, row.get(name, "")) for name in CATEGORICAL_FIELDS]
+        response = str(row.get("full_response", "")).encode("utf-8")
+        explanation = str(row.get("explanation", "")).encode("utf-8")
+        response_id = self._put_blob(response)
+        start = response.find(explanation) if explanation else 0
+        if start >= 0:
+            explanation_blob = response_id
+        else:
+            explanation_blob, start = self._put_blob(explanation), 0
+        self._pending_rows.append((
+            name_offset, name_length, path_offset, path_length, *codes,
+            response_id, explanation_blob, start, len(explanation),
+        ))
+        if len(self._pending_rows) >= self.flush_every:
+            self.flush()
+
+    def extend(self, rows: Iterable[Row]) -> None:
+        for row in rows:
+            self.append(row)
+
+    def _code(self, name: str, value: Any) -> int:
+        value = "" if value is None else str(value)
+        codes = self._codes[name]
+        code = codes.get(value)
+        if code is None:
+            code = len(codes)
+            if code >= _MAX_CATEGORIES:
+                raise ValueError(f"too many distinct values for categorical column {name}")
+            codes[value] = code
+            self._categories[name].append(value)
+            self._dirty_meta = True
+        return code
+
+    def _put_heap(self, data: bytes) -> tuple[int, int]:
+        offset = self._heap_size + len(self._pending_heap)
+        self._pending_heap += data
+        return offset, len(data)
+
+    def _put_blob(self, data: bytes) -> int:
+        index = self._load_blob_index()
+        digest = _hash(data)
+        blob_id = index.get(digest)
+        if blob_id is not None and self._blob_bytes(blob_id) == data:
+            return blob_id
+        offset, length = self._put_heap(data)
+        blob_id = self._blob_count + len(self._pending_blobs)
+        self._pending_blobs.append((digest, offset, length))
+        index.setdefault(digest, blob_id)
+        return blob_id
+
+    def _load_blob_index(self) -> dict[int, int]:
+        # Built lazily: read-only users never pay for it.
+        if self._blob_index is None:
+            hashes = self._view("blobs.bin", self._blob_dtype)["hash"].tolist()
+            self._blob_index = {}
+            for blob_id, digest in enumerate(hashes):
+                self._blob_index.setdefault(digest, blob_id)
+        return self._blob_index
+
+    def flush(self) -> None:
+        """Write buffered rows; heap and blobs first, rows last."""
+        if self._dirty_meta:
+            meta = {"version": FORMAT_VERSION, "categories": self._categories}
+            tmp = self.path / "meta.json.tmp"
+            tmp.write_text(json.dumps(meta, ensure_ascii=False), encoding="utf-8")
+            os.replace(tmp, self.path / "meta.json")
+            self._dirty_meta = False
+        if not self._pending_rows and not self._pending_blobs:
+            return
+        with (self.path / "heap.bin").open("ab") as fh:
+            fh.write(self._pending_heap)
+        self._heap_size += len(self._pending_heap)
+        self._pending_heap = bytearray()
+        if self._pending_blobs:
+            with (self.path / "blobs.bin").open("ab") as fh:
+                fh.write(np.array(self._pending_blobs, dtype=self._blob_dtype).tobytes())
+            self._blob_count += len(self._pending_blobs)
+            self._pending_blobs = []
+        if self._pending_rows:
+            with (self.path / "rows.bin").open("ab") as fh:
+                fh.write(np.array(self._pending_rows, dtype=self._row_dtype).tobytes())
+            self._pending_rows = []
+        self._views.clear()
+
+    # -- reading ---------------------------------------------------------
+
+    def _view(self, name: str, dtype: np.dtype) -> np.ndarray:
+        view = self._views.get(name)
+        if view is None:
+            count = self._file_records(name, dtype)
+            if count:
+                view = np.memmap(self.path / name, dtype=dtype, mode="r", shape=(count,))
+            else:
+                view = np.zeros(0, dtype=dtype)
+            self._views[name] = view
+        return view
+
+    @property
+    def records(self) -> np.ndarray:
+        """The flushed rows as a read-only structured array."""
+        return self._view("rows.bin", self._row_dtype)
+
+    def categories(self, name: str) -> list[str]:
+        """The dictionary of categorical column ``name``, indexed by code."""
+        return list(self._categories[name])
+
+    def codes(self, name: str) -> np.ndarray:
+        """The dictionary codes of categorical column ``name``."""
+        return self.records[name]
+
+    def column(self, name: str) -> np.ndarray | list[str]:
+        """Decode one column of the flushed rows.
+
+        Categorical columns come back as a NumPy object array (one gather
+        over the codes); string columns as a list.
+        """
+        if name in self._categories:
+            return np.array(self._categories[name], dtype=object)[self.codes(name)]
+        if name == "image_name":
+            return self._strings(self.records["name_offset"], self.records["name_length"])
+        if name == "image_path":
+            return self._strings(self.records["path_offset"], self.records["path_length"])
+        if name == "full_response":
+            return [self._blob_bytes(i).decode("utf-8") for i in self.records["response"].tolist()]
+        if name == "explanation":
+            return [row["explanation"] for row in self.rows()]
+        raise KeyError(name)
+
+    def _strings(self, offsets: np.ndarray, lengths: np.ndarray) -> list[str]:
+        heap = self._view("heap.bin", np.dtype(np.uint8))
+        if not len(offsets):
+            return []
+        # One contiguous read covering all the strings, then slice.
+        start = int(offsets.min())
+        data = heap[start:int((offsets + lengths).max())].tobytes()
+        return [data[o - start:o - start + n].decode("utf-8") for o, n in zip(offsets.tolist(), lengths.tolist())]
+
+    def _blob_bytes(self, blob_id: int) -> bytes:
+        if blob_id >= self._blob_count:
+            _, offset, length = self._pending_blobs[blob_id - self._blob_count]
+            offset -= self._heap_size
+            return bytes(self._pending_heap[offset:offset + length])
+        blob = self._view("blobs.bin", self._blob_dtype)[blob_id]
+        offset = int(blob["offset"])
+        return self._view("heap.bin", np.dtype(np.uint8))[offset:offset + int(blob["length"])].tobytes()
+
+    @property
+    def blob_count(self) -> int:
+        """Number of distinct responses stored."""
+        return self._blob_count + len(self._pending_blobs)
+
+    def rows(self, chunk_size: int = 4096) -> Iterator[Row]:
+        """Yield the flushed rows as dicts with the CSV columns.
+
+        Records are decoded ``chunk_size`` at a time, so memory use does not
+        grow with the size of the store.
+        """
+        records = self.records
+        categories = {name: np.array(self._categories[name], dtype=object) for name in CATEGORICAL_FIELDS}
+        blobs: dict[int, bytes] = {}
+
+        def blob(blob_id: int) -> bytes:
+            # Responses repeat, so recently used blobs are kept decoded. The
+            # caller holds on to what it got, so clearing here is safe.
+            data = blobs.get(blob_id)
+            if data is None:
+                if len(blobs) >= _BLOB_CACHE_SIZE:
+                    blobs.clear()
+                data = blobs[blob_id] = self._blob_bytes(blob_id)
+            return data
+
+        for first in range(0, len(records), chunk_size):
+            chunk = records[first:first + chunk_size]
+            columns: dict[str, list[Any]] = {name: values[chunk[name]].tolist() for name, values in categories.items()}
+            columns["image_name"] = self._strings(chunk["name_offset"], chunk["name_length"])
+            columns["image_path"] = self._strings(chunk["path_offset"], chunk["path_length"])
+            fields = zip(
+                chunk["response"].tolist(),
+                chunk["explanation_blob"].tolist(),
+                chunk["explanation_start"].tolist(),
+                chunk["explanation_length"].tolist(),
+            )
+            for i, (response_id, explanation_id, start, length) in enumerate(fields):
+                response = blob(response_id)
+                explanation = blob(explanation_id)
+                row = {name: values[i] for name, values in columns.items()}
+                row["full_response"] = response.decode("utf-8")
+                row["explanation"] = explanation[start:start + length].decode("utf-8")
+                yield row
+
+    def take(self, indices: Iterable[int]) -> list[Row]:
+        """Decode the flushed rows at ``indices``, in that order.
+
+        Unlike :meth:`rows` this touches only the heap bytes of the rows
+        asked for, so picking a few rows out of a large store stays cheap.
+        """
+        heap = self._view("heap.bin", np.dtype(np.uint8))
+
+        def text(offset: int, length: int) -> str:
+            return heap[offset:offset + length].tobytes().decode("utf-8")
+
+        out = []
+        for record in self.records[np.asarray(list(indices), dtype=np.int64)]:
+            row: Row = {name: self._categories[name][int(record[name])] for name in CATEGORICAL_FIELDS}
+            row["image_name"] = text(int(record["name_offset"]), int(record["name_length"]))
+            row["image_path"] = text(int(record["path_offset"]), int(record["path_length"]))
+            row["full_response"] = self._blob_bytes(int(record["response"])).decode("utf-8")
+            start, length = int(record["explanation_start"]), int(record["explanation_length"])
+            row["explanation"] = self._blob_bytes(int(record["explanation_blob"]))[start:start + length].decode("utf-8")
+            out.append(row)
+        return out
+
+    # -- CSV interchange -------------------------------------------------
+
+    def export_csv(self, path: str | Path) -> int:
+        """Write the store as a ``verification_results.csv``; returns rows written."""
+        count = 0
+        with Path(path).open("w", newline="", encoding="utf-8") as fh:
+            writer = csv.DictWriter(fh, fieldnames=CSV_FIELDS, extrasaction="ignore")
+            writer.writeheader()
+            for row in self.rows():
+                writer.writerow(row)
+                count += 1
+        return count
+
+    def import_csv(self, path: str | Path) -> int:
+        """Append every row of a results CSV; returns rows read."""
+        count = 0
+        with Path(path).open(newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                self.append(row)
+                count += 1
+        self.flush()
+        return count
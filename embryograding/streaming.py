@@ -0,0 +1,122 @@
+"""Streaming ``generateContent`` request bodies.
+
+The buffered path (like ``handleFile`` + ``JSON.stringify`` in the browser)
+holds the image bytes, the base64 string, the JSON string and its encoded
+bytes at the same time, roughly 4.5x the image size per request in flight.
+Here the image is memory-mapped and base64-encoded a slice at a time while
+the body is written to the socket, so only one small chunk is ever
+materialised.
+"""
+
+from __future__ import annotations
+
+import base64
+import json
+import mmap
+import os
+from pathlib import Path
+from typing import Any, Callable, Iterator
+
+from .prompt import GARDNER_PROMPT, GENERATION_CONFIG
+
+# Must be a multiple of 3 so each slice encodes without padding, and of the
+# page size so consumed pages can be handed back to the kernel.
+RAW_CHUNK = 48 * 1024
+
+Release = Callable[[int, int], None]
+
+_PLACEHOLDER = "\x00image-data\x00"
+
+_MADV_DONTNEED = getattr(mmap, "MADV_DONTNEED", None)
+
+
+class StreamingBody:
+    """A request body generated chunk by chunk, with its length known up front.
+
+    Iterating it again regenerates the chunks, so a request can be retried.
+    """
+
+    def __init__(self, prefix: bytes, image: memoryview, suffix: bytes, release: Release | None = None) -> None:
+        self.prefix = prefix
+        self.image = image
+        self.suffix = suffix
+        self.release = release
+
+    def __len__(self) -> int:
+        return len(self.prefix) + 4 * ((len(self.image) + 2) // 3) + len(self.suffix)
+
+    def __iter__(self) -> Iterator[bytes]:
+        yield self.prefix
+        yield from base64_chunks(self.image, release=self.release)
+        yield self.suffix
+
+
+def base64_chunks(data: memoryview, raw_chunk: int = RAW_CHUNK, release: Release | None = None) -> Iterator[bytes]:
+    """Base64-encode ``data`` incrementally, ``raw_chunk`` input bytes at a time.
+
+    ``release(start, length)`` is called once each slice has been encoded.
+    """
+    for start in range(0, len(data), raw_chunk):
+        encoded = base64.b64encode(data[start:start + raw_chunk])
+        if release is not None:
+            release(start, min(raw_chunk, len(data) - start))
+        yield encoded
+
+
+class MappedImage:
+    """Memory-map an image file read-only for the lifetime of a request.
+
+    Empty files cannot be mapped and are exposed as an empty buffer.
+    """
+
+    def __init__(self, path: str | Path) -> None:
+        self.path = Path(path)
+        self._mmap: mmap.mmap | None = None
+        self.buffer = memoryview(b"")
+
+    def __enter__(self) -> "MappedImage":
+        with open(self.path, "rb") as fh:
+            if os.fstat(fh.fileno()).st_size:
+                self._mmap = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+                self.buffer = memoryview(self._mmap)
+        return self
+
+    def release_pages(self, start: int, length: int) -> None:
+        """Drop already-encoded pages from this process's resident set.
+
+        The pages stay in the page cache and fault back in if the body is
+        re-sent, but without this every in-flight image would count fully
+        towards RSS by the time its upload finishes.
+        """
+        if self._mmap is not None and _MADV_DONTNEED is not None:
+            self._mmap.madvise(_MADV_DONTNEED, start, length)
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.buffer.release()
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+
+
+def streaming_request_body(
+    image: memoryview,
+    mime_type: str = "image/jpeg",
+    prompt: str = GARDNER_PROMPT,
+    generation_config: dict[str, Any] | None = None,
+    release: Release | None = None,
+) -> StreamingBody:
+    """Build the same JSON as :func:`~embryograding.prompt.build_request_body`, streamed."""
+    skeleton = {
+        "contents": [{
+            "parts": [
+                {"text": prompt},
+                {"inline_data": {"mime_type": mime_type, "data": _PLACEHOLDER}},
+            ]
+        }],
+        "generationConfig": dict(GENERATION_CONFIG if generation_config is None else generation_config),
+    }
+    # Base64 needs no JSON escaping, so the encoded image can be spliced
+    # between the serialised text before and after the placeholder.
+    marker = json.dumps(_PLACEHOLDER)
+    prefix, suffix = json.dumps(skeleton, separators=(",", ":")).split(marker)
+    return StreamingBody((prefix + '"').encode("utf-8"), image, ('"' + suffix).encode("utf-8"), release)
@@ -0,0 +1,206 @@
+"""Minimal asyncio HTTP/1.1 client with per-host keep-alive pooling.
+
+The batch grader only ever POSTs JSON to one host, so a small stdlib client
+keeps the package dependency-free and gives us direct control over how the
+request body is written to the socket.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import json
+import ssl
+from dataclasses import dataclass, field
+from typing import Any, Iterator, Protocol, Union
+from urllib.parse import urlsplit
+
+
+class BodyStream(Protocol):
+    """A request body written chunk by chunk; its length must be known up front."""
+
+    def __len__(self) -> int: ...
+
+    def __iter__(self) -> Iterator[bytes]: ...
+
+
+Body = Union[bytes, BodyStream]
+
+
+class TransportError(Exception):
+    """Raised when the server sends something we cannot parse as HTTP/1.1."""
+
+
+@dataclass
+class Response:
+    status: int
+    headers: dict[str, str]
+    body: bytes
+
+    @property
+    def ok(self) -> bool:
+        return 200 <= self.status < 300
+
+    def json(self) -> Any:
+        return json.loads(self.body)
+
+
+@dataclass
+class _Connection:
+    reader: asyncio.StreamReader
+    writer: asyncio.StreamWriter
+    reused: bool = False
+
+    def close(self) -> None:
+        self.writer.close()
+
+
+@dataclass
+class _HostPool:
+    idle: list[_Connection] = field(default_factory=list)
+
+
+class ConnectionPool:
+    """Keep-alive connection pool shared by every request to the same host."""
+
+    def __init__(self, max_idle_per_host: int = 64, timeout: float = 120.0) -> None:
+        self.max_idle_per_host = max_idle_per_host
+        self.timeout = timeout
+        self._hosts: dict[tuple[str, str, int], _HostPool] = {}
+        self._ssl_context: ssl.SSLContext | None = None
+
+    async def __aenter__(self) -> "ConnectionPool":
+        return self
+
+    async def __aexit__(self, *exc_info: object) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        for pool in self._hosts.values():
+            for conn in pool.idle:
+                conn.close()
+            pool.idle.clear()
+
+    async def request(
+        self,
+        method: str,
+        url: str,
+        body: Body = b"",
+        headers: dict[str, str] | None = None,
+    ) -> Response:
+        return await asyncio.wait_for(self._request(method, url, body, headers or {}), self.timeout)
+
+    async def _request(self, method: str, url: str, body: Body, headers: dict[str, str]) -> Response:
+        parts = urlsplit(url)
+        scheme = parts.scheme or "http"
+        host = parts.hostname or "localhost"
+        port = parts.port or (443 if scheme == "https" else 80)
+        target = parts.path or "/"
+        if parts.query:
+            target += "?" + parts.query
+        key = (scheme, host, port)
+
+        # A pooled connection may have been closed by the server while idle;
+        # retry once on a fresh connection before giving up.
+        while True:
+            conn = await self._acquire(key)
+            try:
+                await self._send(conn, method, target, parts.netloc, body, headers)
+                response, keep_alive = await self._read_response(conn.reader)
+            except (ConnectionError, asyncio.IncompleteReadError):
+                conn.close()
+                if conn.reused:
+                    continue
+                raise
+            except BaseException:
+                conn.close()
+                raise
+            if keep_alive:
+                self._release(key, conn)
+            else:
+                conn.close()
+            return response
+
+    async def _acquire(self, key: tuple[str, str, int]) -> _Connection:
+        pool = self._hosts.setdefault(key, _HostPool())
+        while pool.idle:
+            conn = pool.idle.pop()
+            if not conn.reader.at_eof() and not conn.writer.is_closing():
+                conn.reused = True
+                return conn
+            conn.close()
+        scheme, host, port = key
+        ssl_context = None
+        if scheme == "https":
+            if self._ssl_context is None:
+                self._ssl_context = ssl.create_default_context()
+            ssl_context = self._ssl_context
+        reader, writer = await asyncio.open_connection(host, port, ssl=ssl_context, limit=2**20)
+        return _Connection(reader, writer)
+
+    def _release(self, key: tuple[str, str, int], conn: _Connection) -> None:
+        pool = self._hosts[key]
+        if len(pool.idle) < self.max_idle_per_host:
+            pool.idle.append(conn)
+        else:
+            conn.close()
+
+    async def _send(
+        self,
+        conn: _Connection,
+        method: str,
+        target: str,
+        host: str,
+        body: Body,
+        headers: dict[str, str],
+    ) -> None:
+        head = [f"{method} {target} HTTP/1.1", f"Host: {host}", f"Content-Length: {len(body)}"]
+        head.extend(f"{name}: {value}" for name, value in headers.items())
+        conn.writer.write(("\r\n".join(head) + "\r\n\r\n").encode("latin-1"))
+        if isinstance(body, bytes):
+            if body:
+                conn.writer.write(body)
+        else:
+            # Drain after every chunk so at most one chunk (plus the
+            # transport's write buffer) is held in memory.
+            for chunk in body:
+                conn.writer.write(chunk)
+                await conn.writer.drain()
+        await conn.writer.drain()
+
+    async def _read_response(self, reader: asyncio.StreamReader) -> tuple[Response, bool]:
+        raw_head = await reader.readuntil(b"\r\n\r\n")
+        lines = raw_head.decode("latin-1").split("\r\n")
+        try:
+            version, status, *_ = lines[0].split(" ", 2)
+            status_code = int(status)
+        except ValueError:
+            raise TransportError(f"malformed status line: {lines[0]!r}") from None
+        headers: dict[str, str] = {}
+        for line in lines[1:]:
+            if line:
+                name, _, value = line.partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+        keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+        if headers.get("transfer-encoding", "").lower() == "chunked":
+            body = await _read_chunked(reader)
+        elif "content-length" in headers:
+            body = await reader.readexactly(int(headers["content-length"]))
+        else:
+            body = await reader.read()
+            keep_alive = False
+        return Response(status_code, headers, body), keep_alive
+
+
+async def _read_chunked(reader: asyncio.StreamReader) -> bytes:
+    chunks = []
+    while True:
+        size_line = await reader.readline()
+        size = int(size_line.split(b";", 1)[0].strip() or b"0", 16)
+        if size == 0:
+            # Skip optional trailers up to the terminating blank line.
+            while (await reader.readline()) not in (b"\r\n", b"\n", b""):
+                pass
+            return b"".join(chunks)
+        chunks.append(await reader.readexactly(size))
+        await reader.readexactly(2)
@@ -0,0 +1,80 @@
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+from embryograding.dedup import cluster, fan_out, near_pairs
+from embryograding.engine import ImageJob
+
+
+def _hashes(count, seed=0):
+    """Random hashes plus near copies of some of them (a few bits flipped) and exact repeats."""
+    rng = np.random.default_rng(seed)
+    base = rng.integers(0, 2**64, count, dtype=np.uint64)
+    copies = []
+    for flips in (1, 2, 3, 5, 9):
+        picked = base[rng.choice(count, count // 10, replace=False)]
+        masks = np.zeros(len(picked), dtype=np.uint64)
+        for _ in range(flips):
+            masks |= np.uint64(1) << rng.integers(0, 64, len(picked)).astype(np.uint64)
+        copies.append(picked ^ masks)
+    return np.concatenate([base, *copies, base[:5]])
+
+
+def _brute_force(hashes, distance):
+    gaps = np.bitwise_count(hashes[:, None] ^ hashes[None, :])
+    left, right = np.nonzero(np.triu(gaps <= distance, k=1))
+    return set(zip(left.tolist(), right.tolist()))
+
+
+@pytest.mark.parametrize("count", [50, 600])
+@pytest.mark.parametrize("distance", [0, 1, 3, 4, 8, 12])
+def test_near_pairs_matches_brute_force(count, distance):
+    hashes = _hashes(count)
+    left, right = near_pairs(hashes, distance)
+    assert set(zip(left.tolist(), right.tolist())) == _brute_force(hashes, distance)
+
+
+def test_cluster_keeps_invalid_entries_apart():
+    hashes = np.array([0b1111, 0b1110, 0b1111, 2**63, 0b1111, 2**63 | 1], dtype=np.uint64)
+    valid = np.array([True, True, False, True, True, True])
+    labels = cluster(hashes, distance=1, valid=valid)
+    # The unreadable entry 2 keeps its own label despite an identical hash.
+    assert labels.tolist() == [0, 0, 2, 3, 0, 3]
+    assert cluster(hashes, distance=1).tolist() == [0, 0, 0, 3, 0, 3]
+
+
+def test_cluster_chains_near_duplicates_transitively():
+    hashes = np.array([0b0000, 0b0001, 0b0011, 0b0111, 0b1111_0000_0000], dtype=np.uint64)
+    assert cluster(hashes, distance=1).tolist() == [0, 0, 0, 0, 4]
+
+
+def test_fan_out_copies_the_grade_under_the_members_identity():
+    row = {
+        "image_name": "D5_1.jpg",
+        "actual_class": "1",
+        "image_path": "images/D5_1.jpg",
+        "gardner_grade": "4AB",
+        "explanation": "Expanded blastocyst.",
+        "bytes_sent": 12345,
+        "input_tokens": 300,
+        "output_tokens": 60,
+        "samples": 1,
+        "image_sha256": "abc",
+    }
+    member = ImageJob(Path("images/D5_2.jpg"), "D5_2.jpg", "0")
+    copy = fan_out(row, member, 3)
+    assert copy == {
+        **row,
+        "image_name": "D5_2.jpg",
+        "actual_class": "0",
+        "image_path": str(Path("images/D5_2.jpg")),
+        "duplicate_of": "D5_1.jpg",
+        "hash_distance": 3,
+        "bytes_sent": 0,
+        "input_tokens": 0,
+        "output_tokens": 0,
+        "samples": 0,
+        "image_sha256": "",
+    }
+    assert row["image_name"] == "D5_1.jpg"
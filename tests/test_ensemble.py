@@ -0,0 +1,59 @@
+import collections
+
+from embryograding.ensemble import combine, decided, tally
+
+
+def _sample(grade, explanation=None, quality="Good", **fields):
+    row = {"gardner_grade": grade, "quality_score": quality, "explanation": explanation or f"Looks like {grade}."}
+    if grade != "N/A" and not fields:
+        fields = {"expansion": grade[0], "icm_quality": grade[1], "te_quality": grade[2]}
+    return {"expansion": "N/A", "icm_quality": "N/A", "te_quality": "N/A", **row, **fields}
+
+
+def test_unanimous_samples_keep_the_first():
+    samples = [_sample("4AA", "first"), _sample("4AA", "second"), _sample("4AA", "third")]
+    row = combine(samples, tally(samples))
+    assert row["explanation"] == "first" and row["gardner_grade"] == "4AA"
+    assert row["samples"] == 3
+    assert (row["expansion_agreement"], row["icm_agreement"], row["te_agreement"]) == (1.0, 1.0, 1.0)
+
+
+def test_majority_sample_is_chosen():
+    samples = [_sample("3BB"), _sample("4AB"), _sample("4AB", "majority")]
+    row = combine(samples, tally(samples))
+    assert row["gardner_grade"] == "4AB" and row["explanation"] == "Looks like 4AB."
+    assert row["expansion_agreement"] == round(2 / 3, 3)
+
+
+def test_rebuilt_grade_marks_an_explanation_from_another_grade():
+    samples = [_sample("4AB", quality="Fair"), _sample("4BA"), _sample("3AA")]
+    row = combine(samples, tally(samples))
+    assert row["gardner_grade"] == "4AA"
+    assert (row["expansion"], row["icm_quality"], row["te_quality"]) == ("4", "A", "A")
+    assert row["explanation"] == "[Explanation from a sample graded 4AB; the vote gave 4AA.] Looks like 4AB."
+    assert row["quality_score"] == "Fair"
+
+
+def test_rebuilt_grade_prefers_a_sample_that_gave_it():
+    # The last sample's components did not parse, but its grade is the vote's.
+    agreeing = _sample("4AA", "describes 4AA", quality="Good", expansion="", icm_quality="", te_quality="")
+    samples = [_sample("4AB", quality="Fair"), _sample("4BA"), _sample("3AA"), agreeing]
+    row = combine(samples, tally(samples))
+    assert row["gardner_grade"] == "4AA"
+    assert row["explanation"] == "describes 4AA" and row["quality_score"] == "Good"
+    assert (row["expansion"], row["icm_quality"], row["te_quality"]) == ("4", "A", "A")
+
+
+def _votes(*components):
+    return {field: collections.Counter(counts) for field, counts in zip(("expansion", "icm", "te"), components)}
+
+
+def test_decided_stops_only_when_no_winner_can_change():
+    unanimous = _votes({"4": 3}, {"A": 3}, {"B": 3})
+    assert decided(unanimous, remaining=2)
+    assert not decided(unanimous, remaining=3)
+    split = _votes({"4": 3}, {"A": 2, "B": 1}, {"B": 3})
+    # One more B would tie the ICM vote, so it is not settled yet.
+    assert not decided(split, remaining=1)
+    assert decided(split, remaining=0)
+    assert decided(_votes({"4": 3, "3": 1}, {"A": 4}, {"A": 4}), remaining=1)
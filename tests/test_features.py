@@ -0,0 +1,90 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image, ImageDraw  # noqa: E402
+
+from embryograding.features import (  # noqa: E402
+    DONE,
+    MISSING,
+    PENDING,
+    FeatureConfig,
+    FeatureMatrix,
+    describe_images,
+    extract_store_features,
+)
+from embryograding.store import ResultStore  # noqa: E402
+
+SMALL = FeatureConfig(size=32, detect_size=32)
+
+
+def _embryo(path, size=64):
+    im = Image.fromarray(np.full((size, size), 120, dtype=np.uint8))
+    ImageDraw.Draw(im).ellipse((12, 12, 52, 52), fill=150, outline=220, width=2)
+    im.save(path)
+
+
+def _values(features, count, fill):
+    return np.full((count, features.dim), fill, dtype=np.float32)
+
+
+def test_opening_grows_the_matrix_and_keeps_finished_rows(tmp_path):
+    with FeatureMatrix(tmp_path, 3, SMALL) as features:
+        features.write(np.arange(3), _values(features, 3, 1.5), np.ones(3, dtype=bool))
+    features = FeatureMatrix(tmp_path, 5, SMALL)
+    assert features.rows == 5
+    assert features.done.tolist() == [DONE, DONE, DONE, PENDING, PENDING]
+    assert features.pending().tolist() == [3, 4]
+    assert np.all(features.matrix[:3] == 1.5) and np.all(features.matrix[3:] == 0)
+    # Never shrinks.
+    assert FeatureMatrix(tmp_path, 2, SMALL).rows == 5
+
+
+def test_other_settings_are_refused_unless_rebuilding(tmp_path):
+    with FeatureMatrix(tmp_path, 2, SMALL) as features:
+        features.write(np.arange(2), _values(features, 2, 1.0), np.ones(2, dtype=bool))
+    other = FeatureConfig(size=32, detect_size=32, histogram_bins=8)
+    with pytest.raises(ValueError, match="other settings"):
+        FeatureMatrix(tmp_path, 2, other)
+    rebuilt = FeatureMatrix(tmp_path, 2, other, rebuild=True)
+    assert rebuilt.pending().tolist() == [0, 1]
+    assert FeatureMatrix.open(tmp_path).config == other
+
+
+def test_written_rows_are_marked_only_on_flush(tmp_path):
+    features = FeatureMatrix(tmp_path, 4, SMALL)
+    features.write(np.array([0, 2, 3]), _values(features, 3, 2.0), np.array([True, False, True]))
+    assert features.pending().tolist() == [0, 1, 2, 3]
+    features.flush()
+    assert features.done.tolist() == [DONE, PENDING, MISSING, DONE]
+    # A missing image's row is NaN, not the values passed in.
+    assert np.isnan(features.matrix[2]).all() and np.all(features.matrix[3] == 2.0)
+    reopened = FeatureMatrix.open(tmp_path)
+    assert reopened.done.tolist() == [DONE, PENDING, MISSING, DONE]
+
+
+def test_unreadable_images_give_nan_rows(tmp_path):
+    good = tmp_path / "good.png"
+    _embryo(good)
+    corrupt = tmp_path / "corrupt.png"
+    corrupt.write_bytes(b"not an image")
+    values, ok = describe_images([good, corrupt, tmp_path / "missing.png"], SMALL)
+    assert ok.tolist() == [True, False, False]
+
+    store_path = tmp_path / "results.store"
+    with ResultStore(store_path) as store:
+        store.extend({"image_name": path.name, "image_path": str(path)} for path in (good, corrupt))
+    stats = extract_store_features(store_path, config=SMALL, workers=1)
+    assert (stats.computed, stats.missing, stats.already_done) == (1, 1, 0)
+    features = FeatureMatrix.open(store_path)
+    assert features.done.tolist() == [DONE, MISSING]
+    assert np.isfinite(features.matrix[0]).all() and np.isnan(features.matrix[1]).all()
+
+    # Rows the store gains later are all that a second run computes.
+    with ResultStore(store_path) as store:
+        store.append({"image_name": "again.png", "image_path": str(good)})
+    stats = extract_store_features(store_path, config=SMALL, workers=1)
+    assert (stats.rows, stats.computed, stats.missing, stats.already_done) == (3, 1, 0, 2)
+    features = FeatureMatrix.open(store_path)
+    assert features.done.tolist() == [DONE, MISSING, DONE]
+    assert np.array_equal(features.matrix[2], features.matrix[0])
@@ -0,0 +1,54 @@
+import numpy as np
+import pytest
+
+from embryograding.interobserver import fleiss_kappa, krippendorff_alpha
+
+# Fleiss (1971), as tabulated on Wikipedia: 10 items, 14 raters, 5 categories.
+FLEISS_COUNTS = [
+    [0, 0, 0, 0, 14],
+    [0, 2, 6, 4, 2],
+    [0, 0, 3, 5, 6],
+    [0, 3, 9, 2, 0],
+    [2, 2, 8, 1, 1],
+    [7, 7, 0, 0, 0],
+    [3, 2, 6, 3, 0],
+    [2, 5, 3, 2, 2],
+    [6, 5, 2, 1, 0],
+    [0, 2, 2, 3, 7],
+]
+
+# Krippendorff, "Computing Krippendorff's Alpha-Reliability" (2011): four
+# observers, twelve units, values 1-5, with missing ratings.
+KRIPPENDORFF_RATINGS = [
+    [1, 2, 3, 3, 2, 1, 4, 1, 2, None, None, None],
+    [1, 2, 3, 3, 2, 2, 4, 1, 2, 5, None, 3],
+    [None, 3, 3, 3, 2, 3, 4, 2, 2, 5, 1, None],
+    [1, 2, 3, 3, 2, 4, 4, 1, 2, 5, 1, None],
+]
+
+
+def _counts(ratings, categories=5):
+    counts = np.zeros((len(ratings[0]), categories), dtype=int)
+    for observer in ratings:
+        for unit, value in enumerate(observer):
+            if value is not None:
+                counts[unit, value - 1] += 1
+    return counts
+
+
+def test_fleiss_kappa_reference_value():
+    assert fleiss_kappa(FLEISS_COUNTS) == pytest.approx(0.210, abs=5e-4)
+
+
+@pytest.mark.parametrize("level, expected", [("nominal", 0.743), ("ordinal", 0.815), ("interval", 0.849)])
+def test_krippendorff_alpha_reference_values(level, expected):
+    assert krippendorff_alpha(_counts(KRIPPENDORFF_RATINGS), level) == pytest.approx(expected, abs=5e-4)
+
+
+def test_degenerate_inputs():
+    # Single ratings carry no agreement information; one category leaves nothing to agree on.
+    assert np.isnan(fleiss_kappa([[1, 0], [0, 1]]))
+    assert np.isnan(fleiss_kappa([[3, 0], [2, 0]]))
+    assert np.isnan(krippendorff_alpha([[3, 0], [2, 0]], "nominal"))
+    with pytest.raises(ValueError):
+        krippendorff_alpha(FLEISS_COUNTS, "ratio")
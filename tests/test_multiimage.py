@@ -0,0 +1,89 @@
+import asyncio
+
+from embryograding import BatchGrader, GeminiClient, MockGeminiServer, ResponseCache, iter_jobs
+from embryograding.cache import cache_key
+
+
+def _images(directory, count):
+    directory.mkdir()
+    for i in range(count):
+        # The mock grades by content hash, so any distinct bytes will do.
+        (directory / f"D5_{i}.png").write_bytes(f"image {i}".encode())
+    return directory
+
+
+async def _grade(source, cache, images_per_request, **server_options):
+    rows = []
+    async with MockGeminiServer(seed=0, **server_options) as server:
+        async with GeminiClient("mock-key", api_root=server.api_root) as client:
+            grader = BatchGrader(client, concurrency=4, cache=cache, images_per_request=images_per_request)
+            stats = await grader.run(iter_jobs(source), rows.append)
+    return grader, stats, rows, server
+
+
+def test_block_answers_are_cached_apart_from_single_image_answers(tmp_path):
+    source = _images(tmp_path / "images", 4)
+    with ResponseCache(tmp_path / "cache.sqlite") as cache:
+        grader, stats, rows, server = asyncio.run(_grade(source, cache, 4))
+        assert server.stats.requests == 1 and stats.failed == 0
+        for path in source.iterdir():
+            image = path.read_bytes()
+            assert cache.get(cache_key(image, grader.prompt, grader.client.model, grader.generation_config)) is None
+            block_key = cache_key(image, grader.batcher.prompt, grader.client.model, grader.batcher.generation_config)
+            assert cache.get(block_key) is not None
+
+        # A multi-image rerun is served from the cache.
+        _, _, rows, server = asyncio.run(_grade(source, cache, 4))
+        assert server.stats.requests == 0 and all(row["cached"] for row in rows)
+
+        # A single-image run does not see the block answers.
+        _, _, rows, server = asyncio.run(_grade(source, cache, 1))
+        assert server.stats.requests == 4 and not any(row["cached"] for row in rows)
+
+
+class MalformedBlockServer(MockGeminiServer):
+    """Leaves the ICM line out of image 2's block in multi-image answers."""
+
+    def respond(self, body):
+        data = super().respond(body)
+        part = data["candidates"][0]["content"]["parts"][0]
+        head, found, tail = part["text"].partition("Image: 2\n")
+        if found:
+            block, *rest = tail.split("\n\n", 1)
+            block = "\n".join(line for line in block.splitlines() if not line.startswith("ICM:"))
+            part["text"] = head + found + "\n\n".join([block, *rest])
+        return data
+
+
+async def _grade_with(server, source, images_per_request):
+    rows = []
+    async with server:
+        async with GeminiClient("mock-key", api_root=server.api_root) as client:
+            grader = BatchGrader(client, concurrency=4, images_per_request=images_per_request)
+            stats = await grader.run(iter_jobs(source), rows.append)
+    return grader, stats, {row["image_name"]: row for row in rows}
+
+
+def test_malformed_block_is_graded_again_alone(tmp_path):
+    source = _images(tmp_path / "images", 4)
+    grader, stats, rows = asyncio.run(_grade_with(MalformedBlockServer(seed=0), source, 4))
+    _, _, alone = asyncio.run(_grade_with(MockGeminiServer(seed=0), source, 1))
+
+    assert stats.completed == 4 and stats.failed == 0
+    assert grader.batcher.stats.requests == 1 and grader.batcher.stats.fallbacks == 1
+    # The image in the second slot of the request was graded on its own.
+    retried = [name for name, row in rows.items() if row["request_images"] == 1]
+    assert len(retried) == 1
+    assert all(row["icm_quality"] in {"A", "B", "C", "N/A"} for row in rows.values())
+    # Its row carries its share of the multi-image request on top of its own.
+    assert rows[retried[0]]["input_tokens"] > alone[retried[0]]["input_tokens"]
+
+
+def test_every_image_falls_back_when_no_block_comes_back(tmp_path):
+    source = _images(tmp_path / "images", 4)
+    server = MockGeminiServer(seed=0, drop_block_rate=1.0)
+    grader, stats, rows = asyncio.run(_grade_with(server, source, 4))
+    assert stats.completed == 4 and stats.failed == 0
+    assert server.stats.requests == 5
+    assert grader.batcher.stats.fallbacks == 4
+    assert all(row["request_images"] == 1 for row in rows.values())
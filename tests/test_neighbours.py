@@ -0,0 +1,78 @@
+import numpy as np
+import pytest
+
+from embryograding.neighbours import NeighbourIndex, similar
+from embryograding.store import ResultStore
+
+
+def _vectors(count=3000, dim=16, seed=0):
+    """Gaussian blobs with unequal column scales, like raw descriptors."""
+    rng = np.random.default_rng(seed)
+    centres = rng.normal(0, 4, (20, dim))
+    x = centres[rng.integers(0, len(centres), count)] + rng.normal(0, 1, (count, dim))
+    return (x * rng.uniform(0.1, 10, dim)).astype(np.float32)
+
+
+def _true_top(index, vectors, query, k):
+    x = index.standardise(vectors)
+    d = ((x - index.standardise(query)) ** 2).sum(axis=1)
+    return np.argsort(d, kind="stable")[:k], np.sqrt(np.sort(d)[:k])
+
+
+def test_exact_search_returns_the_true_top_k(tmp_path):
+    vectors = _vectors(500)
+    ids = np.arange(len(vectors)) + 1000
+    index = NeighbourIndex.build(tmp_path / "index", vectors, ids, kind="exact")
+    for query in vectors[:20] + 0.5:
+        rows, distances = index.search(query, k=10)
+        top, top_distances = _true_top(index, vectors, query, 10)
+        assert rows.tolist() == (top + 1000).tolist()
+        assert distances == pytest.approx(top_distances, rel=1e-4, abs=1e-4)
+
+
+def test_ivfpq_recall_against_exact_search(tmp_path):
+    vectors = _vectors()
+    exact = NeighbourIndex.build(tmp_path / "exact", vectors, kind="exact")
+    ivfpq = NeighbourIndex.build(tmp_path / "ivfpq", vectors, kind="ivfpq", seed=0)
+    queries = np.random.default_rng(1).choice(len(vectors), 50, replace=False)
+    found = 0
+    for query in vectors[queries]:
+        truth, _ = exact.search(query, k=10)
+        rows, distances = ivfpq.search(query, k=10)
+        assert np.all(np.diff(distances) >= 0)
+        found += len(set(truth.tolist()) & set(rows.tolist()))
+    assert found / (10 * len(queries)) >= 0.9
+
+
+@pytest.mark.parametrize("kind", ["exact", "ivfpq"])
+def test_reopened_index_gives_the_same_results(tmp_path, kind):
+    vectors = _vectors(2000)
+    built = NeighbourIndex.build(tmp_path / "index", vectors, kind=kind)
+    reopened = NeighbourIndex(tmp_path / "index")
+    assert (reopened.kind, len(reopened)) == (kind, len(vectors))
+    for query in vectors[:10]:
+        rows, distances = built.search(query, k=5)
+        again, again_distances = reopened.search(query, k=5)
+        assert again.tolist() == rows.tolist()
+        assert again_distances.tolist() == distances.tolist()
+
+
+def test_empty_index(tmp_path):
+    index = NeighbourIndex.build(tmp_path / "index", np.zeros((0, 4), dtype=np.float32))
+    rows, distances = NeighbourIndex(tmp_path / "index").search(np.ones(4), k=3)
+    assert len(index) == 0 and rows.size == 0 and distances.size == 0
+
+
+def test_similar_excludes_the_query_row(tmp_path):
+    store_path = tmp_path / "results.store"
+    vectors = np.arange(12, dtype=np.float32).reshape(6, 2) ** 1.5
+    with ResultStore(store_path) as store:
+        store.extend(
+            {"image_name": f"D5_{i}.jpg", "gardner_grade": "4AA", "image_path": f"images/D5_{i}.jpg"}
+            for i in range(len(vectors))
+        )
+    index = NeighbourIndex.build(store_path / "index", vectors, kind="exact")
+    neighbours = similar(store_path, vectors[2], k=2, index=index, exclude=2)
+    assert [n.row for n in neighbours] == [1, 3]
+    assert [n.image_name for n in neighbours] == ["D5_1.jpg", "D5_3.jpg"]
+    assert similar(store_path, vectors[2], k=1, index=index)[0].row == 2
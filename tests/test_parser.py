@@ -0,0 +1,42 @@
+import json
+
+from embryograding.mockserver import CANNED_JSON, CANNED_RESPONSES
+from embryograding.parser import parse_json_response, parse_response, split_json_response, split_response
+
+
+def test_split_response_cuts_blocks_at_image_headers():
+    text = (
+        "Here are the grades.\n\n"
+        f"Image: 1\n{CANNED_RESPONSES[0]}\n\n"
+        f"**Image 2:**\n{CANNED_RESPONSES[1]}\n\n"
+        f"### Image #3\n{CANNED_RESPONSES[3]}"
+    )
+    blocks = split_response(text, ["1", "2", "3"])
+    assert blocks == {"1": CANNED_RESPONSES[0], "2": CANNED_RESPONSES[1], "3": CANNED_RESPONSES[3]}
+    assert parse_response(blocks["2"]).grade == "4AB"
+
+
+def test_split_response_ignores_unknown_identifiers_and_keeps_the_first_repeat():
+    text = (
+        f"Image: 1\n{CANNED_RESPONSES[0]}\nImage quality is good.\n"
+        f"Image: 7\nnot asked for\n"
+        f"Image: 1\n{CANNED_RESPONSES[2]}"
+    )
+    blocks = split_response(text, ["1", "2"])
+    # Neither "Image quality" nor an identifier that was not asked for opens a block.
+    assert blocks == {"1": f"{CANNED_RESPONSES[0]}\nImage quality is good.\nImage: 7\nnot asked for"}
+
+
+def test_split_json_response_strips_the_image_field():
+    answers = [{"image": "2", **json.loads(CANNED_JSON[1])}, {"image": 1, **json.loads(CANNED_JSON[0])}]
+    blocks = split_json_response(json.dumps(answers), ["1", "2"])
+    assert set(blocks) == {"1", "2"}
+    assert json.loads(blocks["1"]) == json.loads(CANNED_JSON[0])
+    assert parse_json_response(blocks["2"]).grade == "4AB"
+
+
+def test_split_json_response_without_an_array_gives_no_blocks():
+    assert split_json_response(CANNED_JSON[0], ["1"]) == {}
+    truncated = json.dumps([{"image": "1", **json.loads(CANNED_JSON[0])}])[:-20]
+    assert split_json_response(truncated, ["1"]) == {}
+    assert split_json_response(json.dumps([{"image": "9"}, "text"]), ["1"]) == {}
@@ -0,0 +1,48 @@
+import math
+
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image  # noqa: E402
+
+from embryograding.prefilter import FEATURE_NAMES, BlastocystModel, assess, score_images, train  # noqa: E402
+
+
+def _model(threshold=0.5):
+    return BlastocystModel(
+        weights=[0.0] * len(FEATURE_NAMES),
+        bias=0.0,
+        mean=[0.0] * len(FEATURE_NAMES),
+        scale=[1.0] * len(FEATURE_NAMES),
+        threshold=threshold,
+    )
+
+
+def test_unreadable_images_score_none(tmp_path):
+    good = tmp_path / "D5_1.png"
+    Image.fromarray(np.full((64, 64), 128, dtype=np.uint8)).save(good)
+    corrupt = tmp_path / "D5_2.png"
+    corrupt.write_bytes(b"not an image")
+    scores = score_images([good, corrupt], _model())
+    assert scores[0] == pytest.approx(0.5)
+    assert scores[1] is None
+
+
+def test_assess_sends_and_counts_unreadable_images():
+    report = assess([0.1, math.nan, 0.9], 0.5, ["D5_1.jpg", "D5_2.jpg", "D3_3.jpg"], ["1", "1", "0"])
+    assert report.images == 3
+    assert report.skipped == 1
+    assert report.unreadable == 1
+    assert report.stage_false_negatives == 1
+    assert report.class_false_negatives == 1
+
+
+def test_train_leaves_out_unreadable_rows():
+    rng = np.random.default_rng(0)
+    features = rng.normal(size=(40, len(FEATURE_NAMES)))
+    labels = features[:, 0] > 0
+    features[3] = np.nan
+    model = train(features, labels)
+    assert model.trained_on == 39
+    assert all(math.isfinite(w) for w in model.weights)
@@ -0,0 +1,83 @@
+import csv
+import re
+
+import pytest
+
+from embryograding.__main__ import main
+from embryograding.report import write_report
+
+GRADES = ["3AA", "4AB", "2BC", "N/A"]
+
+
+def _rows(count, start=0):
+    return [
+        {
+            "image_name": f"D5_{i}.jpg",
+            "image_path": f"missing/D5_{i}.jpg",
+            "gardner_grade": GRADES[i % len(GRADES)],
+            "quality_score": "Good",
+            "explanation": f"Embryo {i}.",
+        }
+        for i in range(start, start + count)
+    ]
+
+
+def _snapshot(directory):
+    files = {}
+    for path in sorted(directory.rglob("*")):
+        if path.is_file():
+            text = path.read_text(encoding="utf-8")
+            # The landing page says when it was generated.
+            files[path.relative_to(directory).as_posix()] = re.sub(r"Date Generated</th><td>[^<]*", "", text)
+    return files
+
+
+def test_incremental_update_matches_a_full_rebuild(tmp_path):
+    rows = _rows(45)
+    write_report(rows, tmp_path / "updated", workers=1, page_size=10)
+
+    rows[3] = {**rows[3], "gardner_grade": "5AA"}
+    del rows[37]
+    rows += _rows(2, start=100)
+    stats = write_report(rows, tmp_path / "updated", workers=1, page_size=10, incremental=True)
+    write_report(rows, tmp_path / "full", workers=1, page_size=10)
+
+    # Pages 1, 4 and 5 change: the edited card, then the cards that moved up
+    # after the deleted one and the appended ones. Pages 2 and 3 are kept.
+    assert stats.cards == 46 and stats.pages == 5
+    assert stats.pages_written == 3 and stats.rendered == 1 + 46 - 37
+    assert _snapshot(tmp_path / "updated") == _snapshot(tmp_path / "full")
+
+
+def test_interrupted_rebuild_leaves_the_previous_report(tmp_path):
+    write_report(_rows(45), tmp_path, workers=1, page_size=10)
+    before = _snapshot(tmp_path)
+
+    def interrupted():
+        for number, row in enumerate(_rows(45, start=1000), 1):
+            if number == 12:
+                raise KeyboardInterrupt
+            yield row
+
+    with pytest.raises(KeyboardInterrupt):
+        write_report(interrupted(), tmp_path, workers=1, page_size=10)
+    assert _snapshot(tmp_path) == before
+    assert not list(tmp_path.glob(".*.tmp"))
+    assert "<td>45</td>" in before["verification_report.html"]
+
+
+def _write_csv(path, rows):
+    with path.open("w", newline="", encoding="utf-8") as fh:
+        writer = csv.DictWriter(fh, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+
+
+def test_report_command_shows_the_image_count(tmp_path):
+    rows = _rows(15)
+    rows[2]["explanation"] = "Spans\ntwo lines."
+    _write_csv(tmp_path / "results.csv", rows)
+    out = tmp_path / "report"
+    assert main(["report", str(tmp_path / "results.csv"), "-o", str(out), "--page-size", "0", "--workers", "1"]) == 0
+    html = (out / "verification_report.html").read_text(encoding="utf-8")
+    assert re.search(r"<th>Total Images Analyzed</th><td>15</td>", html)
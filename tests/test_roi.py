@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+pytest.importorskip("PIL")
+from PIL import Image, ImageDraw  # noqa: E402
+
+from embryograding.roi import detect_rois  # noqa: E402
+
+
+def _embryo(path, size=200):
+    im = Image.fromarray(np.full((size, size), 120, dtype=np.uint8))
+    ImageDraw.Draw(im).ellipse((40, 40, 160, 160), fill=150, outline=220, width=4)
+    im.save(path)
+
+
+def test_detect_rois_survives_unreadable_images(tmp_path):
+    good = tmp_path / "good.jpg"
+    _embryo(good)
+    corrupt = tmp_path / "corrupt.jpg"
+    corrupt.write_bytes(b"\xff\xd8 not really a jpeg")
+    missing = tmp_path / "missing.jpg"
+    boxes = detect_rois([good, corrupt, missing, good])
+    assert boxes[1] is None and boxes[2] is None
+    assert boxes[0] is not None and boxes[0] == boxes[3]
+
+
+def test_detect_rois_with_only_unreadable_images(tmp_path):
+    corrupt = tmp_path / "corrupt.png"
+    corrupt.write_bytes(b"not an image")
+    assert detect_rois([corrupt, tmp_path / "missing.png"]) == [None, None]
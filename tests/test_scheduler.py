@@ -0,0 +1,84 @@
+import asyncio
+import time
+
+import pytest
+
+from embryograding import GeminiClient, MockGeminiServer, RequestScheduler
+from embryograding.client import GeminiAPIError
+
+
+class ScriptedServer(MockGeminiServer):
+    """Answers the first requests with the given error statuses, then as usual."""
+
+    def __init__(self, statuses, **options):
+        super().__init__(**options)
+        self.statuses = list(statuses)
+
+    async def _dispatch(self, request_line, body):
+        if self.statuses:
+            status = self.statuses.pop(0)
+            self.stats.requests += 1
+            self.stats.throttled += status == 429
+            return status, {"error": {"code": status, "message": "scripted", "status": "ERROR"}}
+        return await super()._dispatch(request_line, body)
+
+
+BODY = {"contents": [{"parts": [{"text": "Grade this embryo."}]}]}
+
+
+async def _submit(server, scheduler, requests=1):
+    async with server:
+        async with GeminiClient("mock-key", api_root=server.api_root) as client:
+            return await asyncio.gather(
+                *(scheduler.submit(lambda: client.generate_content(BODY)) for _ in range(requests))
+            )
+
+
+def test_throttling_and_unavailable_are_retried():
+    server = ScriptedServer([429, 503, 429])
+    scheduler = RequestScheduler(initial_concurrency=8, base_delay=0.01)
+    asyncio.run(_submit(server, scheduler))
+    stats = scheduler.stats
+    assert server.stats.requests == 4
+    assert (stats.requests, stats.succeeded, stats.failed) == (4, 1, 0)
+    assert stats.retries == 3
+    assert stats.throttled == 2
+
+
+def test_retry_after_is_honoured():
+    server = ScriptedServer([429], retry_after=0.3)
+    scheduler = RequestScheduler(base_delay=0.001)
+    started = time.monotonic()
+    asyncio.run(_submit(server, scheduler))
+    assert time.monotonic() - started >= 0.3
+    assert scheduler.stats.retries == 1
+
+
+def test_throttling_shrinks_the_concurrency_limit():
+    server = ScriptedServer([429])
+    scheduler = RequestScheduler(initial_concurrency=8, base_delay=0.01, backoff_factor=0.5)
+    asyncio.run(_submit(server, scheduler))
+    # Halved to 4, then one success adds 1/4.
+    assert scheduler.stats.concurrency_limit == pytest.approx(4.25)
+
+
+def test_client_errors_are_not_retried():
+    server = ScriptedServer([400])
+    scheduler = RequestScheduler(base_delay=0.01)
+    with pytest.raises(GeminiAPIError) as info:
+        asyncio.run(_submit(server, scheduler))
+    assert info.value.status == 400
+    assert server.stats.requests == 1
+    stats = scheduler.stats
+    assert (stats.requests, stats.failed, stats.retries, stats.throttled) == (1, 1, 0, 0)
+    assert stats.concurrency_limit == 4
+
+
+def test_quota_rejections_under_load_are_absorbed():
+    server = MockGeminiServer(max_concurrent=2, retry_after=0.01, latency=0.02, seed=0)
+    scheduler = RequestScheduler(initial_concurrency=8, base_delay=0.01)
+    results = asyncio.run(_submit(server, scheduler, requests=16))
+    stats = scheduler.stats
+    assert len(results) == 16 and stats.succeeded == 16 and stats.failed == 0
+    assert stats.throttled == server.stats.throttled > 0
+    assert stats.retries == stats.throttled
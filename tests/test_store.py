@@ -0,0 +1,28 @@
+from embryograding import store as store_module
+from embryograding.store import ResultStore
+
+
+def _row(i: int) -> dict:
+    # Row 0's explanation is part of its response (one blob); every later
+    # row has two blobs of its own, so the cache fills up between a row's
+    # response and its explanation.
+    response = f"Grade: 4AA\nExpansion: 4\nICM: A\nTE: A\nQuality: Good\nresponse {i}"
+    return {
+        "image_name": f"D5_{i:05d}.jpg",
+        "gardner_grade": "4AA",
+        "full_response": response,
+        "explanation": f"response {i}" if i == 0 else f"explanation {i}",
+        "image_path": f"images/D5_{i:05d}.jpg",
+    }
+
+
+def test_rows_streams_more_distinct_blobs_than_the_cache_holds(tmp_path):
+    count = store_module._BLOB_CACHE_SIZE + 10
+    with ResultStore(tmp_path / "results.store") as store:
+        store.extend(_row(i) for i in range(count))
+        store.flush()
+        rows = list(store.rows(chunk_size=1000))
+    assert len(rows) == count
+    for i, row in enumerate(rows):
+        assert row["full_response"].endswith(f"response {i}")
+        assert row["explanation"] == _row(i)["explanation"]